@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from profiling import peak_rss_mb
+from synth_corpus import write_corpus
+
+# ===================================================================
+# -------- ベンチマーク (bench_baseline.json) ----------
+# ===================================================================
+#
+#   python benchmarks.py run --sizes 10k,1m            # 計測して bench_results.json に保存
+#   python benchmarks.py baseline --sizes 10k,1m       # 計測して基準 (bench_baseline.json) として保存
+#   python benchmarks.py compare                       # 基準と同じ条件で計測し、遅くなった項目があれば終了コード 1
+#   python benchmarks.py compare bench_results.json    # 保存済みの結果を基準と比べる
+#
+# 基準は計測した環境に依存するのでリポジトリには含めない（.gitignore 済み）。
+# 比べる環境で最初に一度 baseline を実行して作成し、性能に関わる変更の前後で compare を実行する。
+# 10M 行は時間がかかるため既定では計測しない（計測する場合は --sizes 10k,1m,10m を指定する）
+#
+# 各段階 (抽出・TLD学習・分類・分析・位置別頻度・原因の割合) を合成した 10k / 1M / 10M 行の入力で、
+# 生成 (generate_ranked) を長さ 5〜60 文字のドメインで計測する。
+# 段階ごとに別プロセスで実行するので、ピークメモリの増分はその段階だけのものになる
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_FILE = os.path.join(REPO_DIR, "filtered_address.csv")
+MODEL_FILE = os.path.join(REPO_DIR, "model.bin")
+
+BENCH_FORMAT = 2  # 2: 入力を synth_corpus で作成
+BASELINE_FILE = "bench_baseline.json"
+RESULTS_FILE = "bench_results.json"
+
+BENCH_SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+DEFAULT_SIZES = "10k,1m"
+STAGES = ["ingest", "learn", "classify", "analyze", "positional", "ratios"]
+GENERATE_LENGTHS = [5, 10, 20, 30, 40, 50, 60]
+GENERATE_DOMAINS_PER_LENGTH = 50
+GENERATE_TLDS = [".com", ".net", ".jp", ".co.jp", ".ne.jp"]
+
+TOLERANCE = 0.10       # 基準よりこの割合以上悪化したら回帰とみなす
+TIME_FLOOR_S = 0.005   # これより小さい時間差は誤差として扱う
+MEMORY_FLOOR_MB = 5.0  # これより小さいメモリ差は誤差として扱う
+
+INPUT_FILE = "input.csv"
+DL4_FILE = "filtered_domain_typos_dl4.csv"
+CAUSES_FILE = "domaintypos_dl4_causes2.csv"
+
+
+def make_synthetic_input(path: str, rows: int, seed: int = 0, template_path: str = TEMPLATE_FILE) -> None:
+    """学習済みモデルから rows 行の入力を作る（利用者・ドメインの分布は同梱データに合わせる）"""
+    write_corpus(path, rows, seed=seed, model_path=MODEL_FILE, seed_csv=template_path)
+
+def random_domain(rng: random.Random, length: int) -> str:
+    """TLDを含めて length 文字のドメイン"""
+    tld = rng.choice([t for t in GENERATE_TLDS if len(t) < length])
+    label = [rng.choice(string.ascii_lowercase + string.digits) for _ in range(length - len(tld))]
+    for i in range(1, len(label) - 1):
+        if rng.random() < 0.05:
+            label[i] = '-'
+    return "".join(label) + tld
+
+def _count_rows(path: str) -> int:
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return sum(1 for _ in f) - 1
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if len(values) < 2:
+        return {"p50": values[0], "p90": values[0], "p99": values[0]} if values else {}
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": q[49], "p90": q[89], "p99": q[98]}
+
+# -------------------------------------------------------------------
+# 子プロセスで実行する計測
+# -------------------------------------------------------------------
+
+def _stage_worker(stage: str, workdir: str, repeat: int, queue) -> None:
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import typo_ranking as tr
+        confusions = tr.learn_tld_confusions(DL4_FILE) if stage in ("classify", "analyze", "positional") else None
+
+    funcs = {
+        "ingest": lambda: tr.filter_domain_differences_with_mismatch(INPUT_FILE, DL4_FILE, 4),
+        "learn": lambda: tr.learn_tld_confusions(DL4_FILE),
+        "classify": lambda: tr.append_typo_causes(DL4_FILE, CAUSES_FILE, confusions=confusions),
+        "analyze": lambda: tr.analyze_for_ranking(CAUSES_FILE, confusions=confusions),
+        "positional": lambda: tr.calculate_positional_freqs(CAUSES_FILE, confusions=confusions),
+        "ratios": lambda: tr.get_cause_ratios(CAUSES_FILE),
+    }
+    rss_before = peak_rss_mb()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            funcs[stage]()
+        times.append(time.perf_counter() - start)
+    rss_after = peak_rss_mb()
+
+    rows = _count_rows(INPUT_FILE if stage == "ingest" else DL4_FILE)
+    median = statistics.median(times)
+    queue.put({
+        "kind": "stage",
+        "rows": rows,
+        "times_s": times,
+        "median_s": median,
+        "throughput_rows_s": rows / median if median > 0 else None,
+        "peak_rss_mb": rss_after,
+        "peak_rss_growth_mb": None if rss_after is None else rss_after - rss_before,
+    })
+
+def _generate_worker(lengths: List[int], per_length: int, seed: int, queue) -> None:
+    sys.path.insert(0, REPO_DIR)
+    from typo_runtime import TypoRuntime
+
+    runtime = TypoRuntime.load(MODEL_FILE)
+    rng = random.Random(seed)
+    results = {}
+    for length in lengths:
+        domains = [random_domain(rng, length) for _ in range(per_length)]
+        runtime.generate(domains[0], 20)  # 初回の準備を計測から外す
+        rss_before = peak_rss_mb()
+        latencies = []
+        candidates = 0
+        for domain in domains:
+            start = time.perf_counter()
+            candidates += len(runtime.generate(domain, top_n=10 ** 9))
+            latencies.append((time.perf_counter() - start) * 1000)
+        rss_after = peak_rss_mb()
+        total_s = sum(latencies) / 1000
+        results[f"generate/len{length}"] = {
+            "kind": "generate",
+            "domains": per_length,
+            **{f"{k}_ms": v for k, v in percentiles(latencies).items()},
+            "mean_ms": statistics.fmean(latencies),
+            "throughput_domains_s": per_length / total_s if total_s > 0 else None,
+            "candidates_per_domain": candidates / per_length,
+            "peak_rss_mb": rss_after,
+            "peak_rss_growth_mb": None if rss_after is None else rss_after - rss_before,
+        }
+    queue.put(results)
+
+def _in_subprocess(target, *args) -> Any:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(*args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+# -------------------------------------------------------------------
+# 実行・保存・比較
+# -------------------------------------------------------------------
+
+def run_suite(sizes: List[str], stages: List[str] = STAGES, generate: bool = True, seed: int = 0,
+              per_length: int = GENERATE_DOMAINS_PER_LENGTH) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        rows = BENCH_SIZES[size]
+        repeat = max(1, min(5, 100_000 // rows))
+        with tempfile.TemporaryDirectory(prefix=f"bench-{size}-") as workdir:
+            print(f"[INFO] {size} ({rows:,}行) の入力を作成しています...")
+            make_synthetic_input(os.path.join(workdir, INPUT_FILE), rows, seed)
+            # 後段の入力は前段の出力なので、指定が無くても前段は実行する（計測結果は指定した段階だけ残す）
+            needed = STAGES[:max(STAGES.index(s) for s in stages) + 1]
+            for stage in needed:
+                result = _in_subprocess(_stage_worker, stage, workdir, repeat if stage in stages else 1)
+                if stage in stages:
+                    results[f"{stage}/{size}"] = result
+                    print(f"  {stage + '/' + size:<18} {result['median_s']:8.3f}秒  {result['throughput_rows_s'] or 0:12,.0f}行/秒")
+
+    if generate:
+        print(f"[INFO] 生成の計測（長さ {GENERATE_LENGTHS[0]}〜{GENERATE_LENGTHS[-1]} 文字、各 {per_length}件）...")
+        for key, result in _in_subprocess(_generate_worker, GENERATE_LENGTHS, per_length, seed).items():
+            results[key] = result
+            print(f"  {key:<18} p50 {result['p50_ms']:7.2f}ms  p99 {result['p99_ms']:7.2f}ms  候補 {result['candidates_per_domain']:.0f}件")
+
+    return {
+        "format": BENCH_FORMAT,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "sizes": sizes,
+        "seed": seed,
+        "results": results,
+    }
+
+def save_results(report: Dict[str, Any], path: str) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[INFO] 計測結果を保存しました: {path}")
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    if report.get("format") != BENCH_FORMAT:
+        raise ValueError(f"未対応の形式です: {path}")
+    return report
+
+# 比較する指標: (指標名, 誤差として扱う差)。いずれも値が大きいほど悪い
+COMPARED_METRICS = {
+    "stage": [("median_s", TIME_FLOOR_S), ("peak_rss_growth_mb", MEMORY_FLOOR_MB)],
+    "generate": [("p50_ms", TIME_FLOOR_S * 1000), ("p99_ms", TIME_FLOOR_S * 1000), ("peak_rss_growth_mb", MEMORY_FLOOR_MB)],
+}
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = TOLERANCE) -> List[Dict[str, Any]]:
+    """両方にある項目の指標を比べ、{key, metric, base, new, change, regression} の一覧を返す"""
+    rows = []
+    for key, base in baseline["results"].items():
+        new = current["results"].get(key)
+        if new is None:
+            continue
+        for metric, floor in COMPARED_METRICS[base["kind"]]:
+            b, n = base.get(metric), new.get(metric)
+            if b is None or n is None:
+                continue
+            change = (n - b) / b if b else 0.0
+            rows.append({"key": key, "metric": metric, "base": b, "new": n, "change": change,
+                         "regression": n - b > floor and change > tolerance})
+    return rows
+
+def print_comparison(rows: List[Dict[str, Any]], baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> None:
+    print(f"[INFO] 基準: {baseline['created']} ({baseline['machine']['platform']}) / 今回: {current['created']}  許容: {tolerance:.0%}")
+    if baseline["machine"] != current["machine"]:
+        print("[WARN] 基準と異なる環境での計測です。差は参考値として扱ってください。")
+    for r in rows:
+        mark = "  [回帰]" if r["regression"] else ""
+        print(f"  {r['key']:<18} {r['metric']:<20} {r['base']:10.3f} → {r['new']:10.3f}  ({r['change']:+.1%}){mark}")
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="段階ごとの処理時間・メモリと生成のレイテンシを計測する")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "baseline"):
+        p = sub.add_parser(name)
+        p.add_argument("--sizes", default=DEFAULT_SIZES, help=f"入力の行数 ({', '.join(BENCH_SIZES)})")
+        p.add_argument("--stages", default=",".join(STAGES))
+        p.add_argument("--no-generate", action="store_true")
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--out", default=BASELINE_FILE if name == "baseline" else RESULTS_FILE)
+    p = sub.add_parser("compare")
+    p.add_argument("results", nargs="?", help="保存済みの結果（省略時は基準と同じ条件で計測する）")
+    p.add_argument("--baseline", default=BASELINE_FILE)
+    p.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    if args.command in ("run", "baseline"):
+        sizes = [s for s in args.sizes.split(",") if s]
+        stages = [s for s in args.stages.split(",") if s]
+        unknown = [s for s in sizes if s not in BENCH_SIZES] + [s for s in stages if s not in STAGES]
+        if unknown:
+            print(f"[ERROR] 不明な指定です: {', '.join(unknown)}")
+            sys.exit(1)
+        save_results(run_suite(sizes, stages, not args.no_generate, args.seed), args.out)
+    else:
+        try:
+            baseline = load_results(args.baseline)
+            if args.results:
+                current = load_results(args.results)
+            else:
+                stages = sorted({k.split('/')[0] for k in baseline["results"]} & set(STAGES), key=STAGES.index)
+                generate = any(r["kind"] == "generate" for r in baseline["results"].values())
+                current = run_suite(baseline["sizes"] if stages else [], stages or STAGES, generate, baseline["seed"])
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] 計測結果を読み込めませんでした: {e}")
+            if not os.path.exists(args.baseline):
+                print("[INFO] 基準が無い場合は、先に python benchmarks.py baseline で作成してください。")
+            sys.exit(1)
+        rows = compare(baseline, current, args.tolerance)
+        print_comparison(rows, baseline, current, args.tolerance)
+        regressions = [r for r in rows if r["regression"]]
+        if regressions:
+            print(f"[ERROR] {len(regressions)}件の指標が基準より悪化しました。")
+            sys.exit(1)
+        print("[SUCCESS] 基準からの悪化はありませんでした。")
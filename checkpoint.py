@@ -0,0 +1,94 @@
+import os
+import pickle
+from typing import Any, Dict, List, Optional, Tuple
+
+from stage_cache import file_sha256
+
+# ===================================================================
+# -------- 長い集計処理のチェックポイント (.checkpoints/) ----------
+# ===================================================================
+#
+# 全履歴の再構築では、分類 (append_typo_causes) や分析のループが何時間もかかる。
+# 一定行数ごとに「どの行まで終えたか (入力の行オフセット)」と途中結果を追記しておき、
+# 中断後に同じ入力で実行し直すと、最後のチェックポイントの続きから処理する。
+# 途中結果は実行順のまま保存するので、再開した場合も中断しなかった場合と同じ出力になる
+#
+#   .checkpoints/<名前>.ckpt : 見出し (入力のハッシュ・パラメータ) に続けて、チェックポイントを pickle で追記したもの
+#       rows  : その区間の行ごとの結果（再開時に順に連結する）
+#       state : その時点の集計状態（件数の辞書など。最後のものだけ使う）
+
+CHECKPOINT_DIR = ".checkpoints"
+CHECKPOINT_FORMAT = 1
+CHECKPOINT_ROWS = 50_000  # 何行ごとに保存するか
+
+
+class Checkpoint:
+    """入力ファイル1つに対する行単位の処理の途中経過を保存し、中断後に続きから再開できるようにする"""
+
+    def __init__(self, name: str, source: str, params: Optional[Dict[str, Any]] = None, directory: str = CHECKPOINT_DIR):
+        self.path = os.path.join(directory, f"{name}.ckpt")
+        self.source = source
+        self.params = params or {}
+        self._header: Optional[Dict[str, Any]] = None
+
+    def _make_header(self) -> Dict[str, Any]:
+        # 入力の内容が変わったら、保存済みの途中経過は使わない
+        if self._header is None:
+            self._header = {"format": CHECKPOINT_FORMAT, "source": os.path.abspath(self.source),
+                            "sha256": file_sha256(self.source), "params": self.params}
+        return self._header
+
+    def resume(self) -> Tuple[int, List[Any], Any]:
+        """(処理済みの行数, それまでの行ごとの結果, 最後の集計状態) を返す。途中経過が無ければ (0, [], None)"""
+        if not os.path.exists(self.path):
+            return 0, [], None
+
+        offset, rows, state = 0, [], None
+        with open(self.path, 'rb') as f:
+            try:
+                valid = pickle.load(f) == self._make_header()
+            except (EOFError, pickle.UnpicklingError, ValueError):
+                valid = False
+
+            good_end = f.tell()
+            while valid:
+                try:
+                    record = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError, ValueError):
+                    break  # 書き込み途中で止まった最後の記録は捨てる
+                if record["start"] != offset:
+                    break
+                offset = record["end"]
+                rows.extend(record["rows"])
+                if record["state"] is not None:
+                    state = record["state"]
+                good_end = f.tell()
+
+        if not valid:
+            # 入力が前回と異なる（または見出しが壊れている）ので最初からやり直す
+            self.clear()
+            return 0, [], None
+
+        # 壊れた末尾を切り詰めて、続きを追記できるようにする
+        with open(self.path, 'r+b') as f:
+            f.truncate(good_end)
+        if offset:
+            print(f"[INFO] チェックポイントから再開します: {self.path}（{offset:,}行目まで処理済み）")
+        return offset, rows, state
+
+    def save(self, start: int, end: int, rows: List[Any] = (), state: Any = None) -> None:
+        """行 [start, end) の結果 rows と、end 行目まで処理した時点の集計状態 state を追記する"""
+        is_new = not os.path.exists(self.path)
+        if is_new:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'ab') as f:
+            if is_new:
+                pickle.dump(self._make_header(), f)
+            pickle.dump({"start": start, "end": end, "rows": list(rows), "state": state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self) -> None:
+        """完了したら途中経過を消す"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
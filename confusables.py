@@ -0,0 +1,59 @@
+import os
+from typing import Dict, List, Iterator, Tuple
+
+# ===================================================================
+# -------- IDNホモグラフ（confusables索引）----------
+# ===================================================================
+
+CONFUSABLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "confusables.txt")
+
+def load_confusables_index(path: str = CONFUSABLES_FILE) -> Dict[str, List[str]]:
+    """confusables.txt を読み込み、{ASCII文字: [見た目が同じUnicode文字, ...]} の索引を作る"""
+    index: Dict[str, List[str]] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            fields = [field.strip() for field in line.split(';')]
+            if len(fields) < 2:
+                continue
+
+            src = ''.join(chr(int(cp, 16)) for cp in fields[0].split())
+            tgt = ''.join(chr(int(cp, 16)) for cp in fields[1].split()).lower()
+
+            # 1文字 → 半角英数字1文字 の対応のみ生成に使う
+            if len(src) != 1 or len(tgt) != 1 or not (tgt.isascii() and tgt.isalnum()):
+                continue
+
+            # IDNA正規化で元のASCIIに戻る文字・IDNAで使えない文字は登録できないので除外
+            try:
+                if src.encode('idna').decode('ascii') == tgt:
+                    continue
+            except UnicodeError:
+                continue
+
+            chars = index.setdefault(tgt, [])
+            if src not in chars:
+                chars.append(src)
+    return index
+
+def generate_idn_homographs(domain: str, confusables_index: Dict[str, List[str]]) -> Iterator[Tuple[str, str, int, str, str]]:
+    """
+    ベース部分（最初のラベル）の1文字を見た目が同じUnicode文字に置き換えたIDNドメインを生成する
+    yield: (punycode表記, Unicode表記, 置換位置, 元の文字, 置換後の文字)
+    """
+    # typo_generator_ranked と同じく、最初のドットより後ろはTLDとして扱い置換しない
+    base_len = domain.find('.')
+    if base_len == -1:
+        base_len = len(domain)
+
+    for i in range(base_len):
+        c = domain[i].lower()
+        for g in confusables_index.get(c, ()):
+            unicode_domain = domain[:i] + g + domain[i+1:]
+            try:
+                ascii_domain = unicode_domain.encode('idna').decode('ascii')
+            except UnicodeError:
+                continue
+            yield ascii_domain, unicode_domain, i, c, g
@@ -0,0 +1,115 @@
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union
+
+from typo_runtime import damerau_levenshtein_distance
+
+# ===================================================================
+# -------- 削除近傍索引（symmetric delete）----------
+# ===================================================================
+#
+# 登録した語それぞれから最大 max_distance 文字を削除した文字列を索引にしておき、問い合わせ語から同じく
+# 削除した文字列と一致するものだけを候補にする。DL距離 (OSA) が max_distance 以下の語は必ず候補に入る
+# （置換・挿入・削除・隣接の入れ替えは、どれも両側から1文字ずつ削除すれば一致する）ので、全件と比較せずに済む。
+# 候補は damerau_levenshtein_distance で確かめてから返す
+#
+# 索引のキーは削除後の文字列そのものではなくハッシュ値（文字列を持たないぶん、10万語でもメモリが数分の1で済む）。
+# ハッシュが衝突しても候補が増えるだけで、距離の確認で除かれる
+#
+#   index = DeletionIndex(["example.co.jp", "example.com"], max_distance=2)
+#   index.search("exmaple.co.jp")   # [("example.co.jp", 1), ("example.com", 2)]
+
+Entry = Union[int, Tuple[int, ...]]  # 語の番号（同じキーに複数の語があればタプル）
+
+
+def deletion_list(word: str, max_distance: int) -> List[str]:
+    """word から 0〜max_distance 文字を削除した文字列（削除する位置の組ごとに1つ。同じ文字列が重複することがある）"""
+    result = [word]
+    level = [(word, 0)]
+    for _ in range(max_distance):
+        # 削除位置を昇順に限ると、同じ位置の組を2回作らない
+        level = [(w[:i] + w[i+1:], i) for w, start in level for i in range(start, len(w))]
+        result.extend([w for w, _ in level])
+    return result
+
+def deletions(word: str, max_distance: int) -> Set[str]:
+    """word から 0〜max_distance 文字を削除した文字列の集合（word 自身を含む）"""
+    return set(deletion_list(word, max_distance))
+
+
+class DeletionIndex:
+    """DL距離が max_distance 以下の語を引く索引"""
+
+    def __init__(self, words: Iterable[str] = (), max_distance: int = 2):
+        self.max_distance = max_distance
+        self.words: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._index: Dict[int, Entry] = {}
+        self.min_length = self.max_length = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.words)
+
+    def add(self, word: str) -> int:
+        """語を登録して番号を返す（登録済みなら既存の番号）"""
+        if word in self._ids:
+            return self._ids[word]
+        word_id = len(self.words)
+        self.words.append(word)
+        self._ids[word] = word_id
+        self.min_length = min(self.min_length, len(word)) if word_id else len(word)
+        self.max_length = max(self.max_length, len(word))
+
+        index = self._index
+        for key in map(hash, deletions(word, self.max_distance)):
+            entry = index.get(key)
+            if entry is None:
+                index[key] = word_id
+            elif isinstance(entry, int):
+                index[key] = (entry, word_id)
+            else:
+                index[key] = entry + (word_id,)
+        return word_id
+
+    def in_range(self, query: str) -> bool:
+        """長さだけで候補が無いと分かる語を除く（削除文字列を作る前の足切り）"""
+        return self.min_length - self.max_distance <= len(query) <= self.max_length + self.max_distance
+
+    def candidates(self, query: str, max_distance: int = None) -> Set[int]:
+        """削除文字列が一致する語の番号（距離は未確認）"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        found: Set[int] = set()
+        get = self._index.get
+        # 問い合わせ側は重複を除かずに引く（集合を作るより速い）
+        for entry in map(get, map(hash, deletion_list(query, max_distance))):
+            if entry is None:
+                continue
+            if entry.__class__ is int:
+                found.add(entry)
+            else:
+                found.update(entry)
+        return found
+
+    def search(self, query: str, max_distance: int = None) -> List[Tuple[str, int]]:
+        """DL距離が max_distance 以下の語を (語, 距離) の距離・語の順で返す（query と同じ語は距離0）"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        if not self.in_range(query):
+            return []
+        hits = []
+        for word_id in self.candidates(query, max_distance):
+            word = self.words[word_id]
+            if abs(len(word) - len(query)) > max_distance:
+                continue
+            distance = damerau_levenshtein_distance(word, query)
+            if distance <= max_distance:
+                hits.append((word, distance))
+        hits.sort(key=lambda h: (h[1], h[0]))
+        return hits
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple
+
+from deletion_index import DeletionIndex
+from intermediate_io import extract_domain
+from typo_runtime import DEFAULT_MODEL_FILE, TypoRuntime
+
+# ===================================================================
+# -------- 「もしかして」: 入力された宛先ドメインから意図したドメインを推定 ----------
+# ===================================================================
+#
+# 生成 (generate_ranked) の逆向き。既知の正しいドメイン（アドレス帳・送信実績）の一覧を索引にしておき、
+# 入力されたドメインがそのどれかのタイポとしてモデルに生成されるなら、スコアの高い順に候補を返す。
+# モデルが生成するのは DL=1 のミス（入れ替えを含む）と TLDの取り違えなので、候補は
+#   - 削除近傍索引 (deletion_index.py, 距離1) で引いた DL=1 のドメイン
+#   - 入力のTLDより前の部分が一致するドメイン（TLDの取り違え）
+# に限られる。各候補は TypoRuntime.score_candidate（原因の判定は1組分だけ）でスコアを付け、
+# モデルが生成しない組は除く。10万件の一覧で1回あたり1ミリ秒未満 (--bench で確認)
+#
+#   python did_you_mean.py exmaple.co.jp taro@gmial.com            # filtered_address.csv の正しい宛先を一覧として使う
+#   python did_you_mean.py --directory domains.txt exmaple.com
+#   python did_you_mean.py --bench 100000                          # 合成した10万件の一覧で応答時間を計測
+
+DIRECTORY_FILE = "filtered_address.csv"
+DEFAULT_SUGGESTIONS = 3
+BENCH_QUERIES = 5_000
+
+
+class Suggestion(NamedTuple):
+    domain: str      # 意図したと推定されるドメイン
+    score: float     # そのドメインに対する入力のモデルのスコア
+    causes: str
+    distance: int
+    frequency: int   # 一覧での出現回数（同点時に多い方を先にする）
+
+
+def load_directory(path: str) -> Counter:
+    """既知のドメインと出現回数。CSV なら correct_address 列、それ以外は1行1ドメイン（またはアドレス）"""
+    domains: Counter = Counter()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(f):
+                domain = extract_domain(row.get("correct_address", "")).strip().lower()
+                if domain:
+                    domains[domain] += 1
+        else:
+            for line in f:
+                entry = line.split('#', 1)[0].strip().lower()
+                domain = extract_domain(entry) if '@' in entry else entry
+                if domain:
+                    domains[domain] += 1
+    return domains
+
+
+class DidYouMean:
+    """既知のドメインの一覧に対する「もしかして」の索引"""
+
+    def __init__(self, directory: Dict[str, int], runtime: TypoRuntime):
+        self.runtime = runtime
+        self.frequency = dict(directory)
+        self.index = DeletionIndex(self.frequency, max_distance=1)
+        # TLDの取り違え: TLDより前の部分 -> その部分を持つドメイン
+        self.by_base: Dict[str, List[str]] = {}
+        for domain in self.frequency:
+            base, _ = runtime.confusions.split(domain)
+            self.by_base.setdefault(base, []).append(domain)
+
+    def __len__(self) -> int:
+        return len(self.frequency)
+
+    def _candidates(self, typed: str) -> Iterable[str]:
+        found = {domain for domain, _ in self.index.search(typed, 1)}
+        # 取り違え後のTLDの区切りがどこかは分からないので、ドットの位置ごとに前の部分を引く
+        dot = typed.find('.')
+        while dot > 0:
+            found.update(self.by_base.get(typed[:dot], ()))
+            dot = typed.find('.', dot + 1)
+        found.discard(typed)
+        return found
+
+    def suggest(self, typed: str, top: int = DEFAULT_SUGGESTIONS) -> List[Suggestion]:
+        """typed が既知のドメインのタイポとして生成されるなら、意図したドメインの候補をスコアの高い順に返す"""
+        typed = typed.strip().lower().rstrip('.')
+        if not typed or typed in self.frequency:
+            return []  # 既知のドメインはそのまま
+        suggestions = []
+        for domain in self._candidates(typed):
+            scored = self.runtime.score_candidate(domain, typed)
+            if scored is not None:
+                suggestions.append(Suggestion(domain, scored["score"], scored["causes"], scored["distance"], self.frequency[domain]))
+        suggestions.sort(key=lambda s: (-s.score, -s.frequency, s.distance, s.domain))
+        return suggestions[:top]
+
+# -------------------------------------------------------------------
+# 応答時間の計測
+# -------------------------------------------------------------------
+
+def benchmark(size: int, runtime: TypoRuntime, queries: int = BENCH_QUERIES, seed: int = 0) -> Dict[str, float]:
+    """size 件の合成ドメインで索引を作り、モデルが生成したタイポ（と無関係な入力）で suggest の時間を測る"""
+    from benchmarks import percentiles, random_domain
+    rng = random.Random(seed)
+    directory: Counter = Counter()
+    while len(directory) < size:
+        directory[random_domain(rng, rng.randint(8, 24))] += 1
+
+    start = time.perf_counter()
+    dym = DidYouMean(directory, runtime)
+    build_s = time.perf_counter() - start
+
+    domains = list(directory)
+    cases = []
+    for _ in range(queries):
+        if rng.random() < 0.8:
+            intended = rng.choice(domains)
+            typo = rng.choice(runtime.generate(intended, 30, idn=False))["typo"]
+            cases.append((typo, intended))
+        else:
+            cases.append((random_domain(rng, rng.randint(8, 24)), None))
+
+    times, top1, top3, typos = [], 0, 0, 0
+    for typed, intended in cases:
+        t0 = time.perf_counter()
+        suggestions = dym.suggest(typed)
+        times.append((time.perf_counter() - t0) * 1000)
+        if intended is not None and typed not in directory:
+            typos += 1
+            names = [s.domain for s in suggestions]
+            top1 += names[:1] == [intended]
+            top3 += intended in names
+    return {"build_s": build_s, **{f"{k}_ms": v for k, v in percentiles(times).items()}, "max_ms": max(times),
+            "top1": top1 / typos if typos else 0.0, "top3": top3 / typos if typos else 0.0}
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="入力された宛先ドメインから、意図したドメインの候補を示す")
+    parser.add_argument("typed", nargs="*", help="入力されたドメインまたはメールアドレス（省略すると標準入力から1行ずつ）")
+    parser.add_argument("--directory", default=DIRECTORY_FILE, help="既知のドメインの一覧（.csv は correct_address 列）")
+    parser.add_argument("--top", type=int, default=DEFAULT_SUGGESTIONS)
+    parser.add_argument("--model", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--bench", type=int, metavar="N", help="合成した N 件の一覧で応答時間を計測する")
+    args = parser.parse_args()
+
+    try:
+        runtime = TypoRuntime.load(args.model)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] モデルを読み込めませんでした: {e}")
+        sys.exit(1)
+
+    if args.bench:
+        r = benchmark(args.bench, runtime)
+        print(f"[INFO] {args.bench:,}件の索引を {r['build_s']:.1f}秒で作成")
+        print(f"[INFO] 応答時間: p50 {r['p50_ms']:.3f}ms / p90 {r['p90_ms']:.3f}ms / p99 {r['p99_ms']:.3f}ms / 最大 {r['max_ms']:.3f}ms")
+        print(f"[INFO] 意図したドメインが 1位: {r['top1']:.1%} / {DEFAULT_SUGGESTIONS}位以内: {r['top3']:.1%}")
+        sys.exit(0)
+
+    try:
+        directory = load_directory(args.directory)
+    except OSError as e:
+        print(f"[ERROR] 一覧を読み込めませんでした: {e}")
+        sys.exit(1)
+    dym = DidYouMean(directory, runtime)
+    print(f"[INFO] 既知のドメイン {len(dym):,}件")
+
+    for typed in args.typed or (line.strip() for line in sys.stdin):
+        if not typed:
+            continue
+        local, _, domain = typed.rpartition('@')
+        suggestions = dym.suggest(domain, args.top)
+        if not suggestions:
+            print(f"{typed}: 候補なし")
+            continue
+        for s in suggestions:
+            address = f"{local}@{s.domain}" if local else s.domain
+            print(f"{typed}: もしかして {address}  (スコア {s.score:.7f}, {s.causes})")
@@ -0,0 +1,499 @@
+import argparse
+import asyncio
+import random
+import socket
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# ===================================================================
+# -------- タイポ候補の名前解決 (asyncio / UDP) ----------
+# ===================================================================
+#
+# 候補ドメインごとに A / AAAA / MX を問い合わせ、既に誰かが使っている（メールを受け取れる）かを調べる。
+#   - 同時に処理する候補数の上限 (concurrency)
+#   - DNSサーバーごとの問い合わせ間隔 (rate: 1秒あたりの問い合わせ数)
+#   - タイムアウト・SERVFAIL は次のサーバーで再試行（間隔を倍にしていく）
+#   - 応答は TTL の間キャッシュする（NXDOMAIN などの否定応答は SOA の最小TTL、上限 NEGATIVE_TTL）
+# 外部ライブラリは使わず、問い合わせ・応答の組み立てと解析もここで行う。
+# StubDnsServer はローカルで動く応答用サーバー（ゾーンを辞書で渡す）で、確認・試験に使う
+#
+#   python dns_resolver.py treasurefactory.co.jp --top 30                  # /etc/resolv.conf のサーバーを使う
+#   python dns_resolver.py treasurefactory.co.jp --server 127.0.0.1:5353
+#   python dns_resolver.py treasurefactory.co.jp --stub zone.txt           # ゾーンファイルのスタブサーバーを立てて解決する
+#
+#   statuses = asyncio.run(DnsResolver(["127.0.0.1:5353"]).resolve_many(domains))
+#   annotate_rankings(rows, statuses)   # 順位表の各行に "dns" を付ける
+
+DNS_PORT = 53
+DNS_CONCURRENCY = 100      # 同時に解決する候補の数
+DNS_RATE_PER_SERVER = 50.0  # サーバーごとの1秒あたりの問い合わせ数
+DNS_TIMEOUT = 2.0          # 1回の問い合わせの待ち時間（秒）
+DNS_RETRIES = 2            # タイムアウト・SERVFAIL の再試行回数
+DNS_BACKOFF = 0.2          # 再試行までの待ち時間（秒、再試行ごとに倍）
+NEGATIVE_TTL = 300         # 否定応答をキャッシュする時間の上限（秒）
+FALLBACK_SERVERS = ["1.1.1.1", "8.8.8.8"]
+
+QTYPE_A, QTYPE_NS, QTYPE_CNAME, QTYPE_SOA, QTYPE_MX, QTYPE_AAAA = 1, 2, 5, 6, 15, 28
+QTYPE_NAMES = {QTYPE_A: "A", QTYPE_NS: "NS", QTYPE_CNAME: "CNAME", QTYPE_SOA: "SOA", QTYPE_MX: "MX", QTYPE_AAAA: "AAAA"}
+RCODE_NOERROR, RCODE_SERVFAIL, RCODE_NXDOMAIN = 0, 2, 3
+
+# 候補の状態（順位表に付ける "status"）
+STATUS_MX = "MXあり"          # メールを受け取れる
+STATUS_ADDRESS = "A/AAAAのみ"  # Web等で使われている（MXが無くてもAに配送される場合がある）
+STATUS_NO_RECORDS = "レコードなし"
+STATUS_NXDOMAIN = "NXDOMAIN"
+STATUS_ERROR = "エラー"
+
+
+class DnsRecord(NamedTuple):
+    name: str
+    qtype: int
+    ttl: int
+    data: Any   # A/AAAA: アドレス文字列、MX: (優先度, ホスト名)、CNAME/NS: ホスト名、SOA: 最小TTL
+
+
+class DnsAnswer(NamedTuple):
+    rcode: int
+    records: List[DnsRecord]
+    negative_ttl: Optional[int]  # 権威部の SOA から求めた否定応答のTTL
+
+
+class DnsError(Exception):
+    """再試行しても応答が得られなかった"""
+
+# -------------------------------------------------------------------
+# 問い合わせ・応答の組み立てと解析 (RFC 1035)
+# -------------------------------------------------------------------
+
+def encode_name(name: str) -> bytes:
+    out = bytearray()
+    for label in name.rstrip('.').split('.'):
+        raw = label.encode('ascii') if label.isascii() else label.encode('idna')
+        if not raw or len(raw) > 63:
+            raise ValueError(f"ラベルの長さが不正です: {name}")
+        out += bytes([len(raw)]) + raw
+    return bytes(out) + b'\x00'
+
+def build_query(qid: int, name: str, qtype: int, recursion: bool = True) -> bytes:
+    flags = 0x0100 if recursion else 0
+    return struct.pack(">HHHHHH", qid, flags, 1, 0, 0, 0) + encode_name(name) + struct.pack(">HH", qtype, 1)
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    labels, end, jumps = [], None, 0
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:  # 圧縮ポインタ
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            jumps += 1
+            if jumps > 64:
+                raise ValueError("名前の圧縮ポインタが循環しています")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    return '.'.join(labels).lower(), end if end is not None else offset
+
+def _parse_rdata(data: bytes, qtype: int, offset: int, length: int) -> Any:
+    if qtype == QTYPE_A and length == 4:
+        return socket.inet_ntop(socket.AF_INET, data[offset:offset + 4])
+    if qtype == QTYPE_AAAA and length == 16:
+        return socket.inet_ntop(socket.AF_INET6, data[offset:offset + 16])
+    if qtype == QTYPE_MX:
+        return struct.unpack(">H", data[offset:offset + 2])[0], _read_name(data, offset + 2)[0]
+    if qtype in (QTYPE_CNAME, QTYPE_NS):
+        return _read_name(data, offset)[0]
+    if qtype == QTYPE_SOA:
+        return struct.unpack(">I", data[offset + length - 4:offset + length])[0]  # MINIMUM
+    return data[offset:offset + length]
+
+def parse_response(data: bytes) -> Tuple[int, bool, DnsAnswer]:
+    """(問い合わせID, 切り詰められたか, 応答)"""
+    qid, flags, qdcount, ancount, nscount, arcount = struct.unpack(">HHHHHH", data[:12])
+    offset = 12
+    for _ in range(qdcount):
+        offset = _read_name(data, offset)[1] + 4
+
+    records, negative_ttl = [], None
+    for section in range(2):
+        for _ in range(ancount if section == 0 else nscount):
+            name, offset = _read_name(data, offset)
+            rtype, _, ttl, length = struct.unpack(">HHIH", data[offset:offset + 10])
+            offset += 10
+            value = _parse_rdata(data, rtype, offset, length)
+            offset += length
+            if section == 0:
+                records.append(DnsRecord(name, rtype, ttl, value))
+            elif rtype == QTYPE_SOA:
+                negative_ttl = min(ttl, value)
+    return qid, bool(flags & 0x0200), DnsAnswer(flags & 0x000F, records, negative_ttl)
+
+# -------------------------------------------------------------------
+# 送受信・流量制限・キャッシュ
+# -------------------------------------------------------------------
+
+def parse_server(text: str) -> Tuple[str, int]:
+    """'1.1.1.1' / '127.0.0.1:5353' / '[::1]:5353' -> (ホスト, ポート)"""
+    if text.startswith('['):
+        host, _, port = text[1:].partition(']')
+        return host, int(port.lstrip(':') or DNS_PORT)
+    if text.count(':') == 1:
+        host, port = text.split(':')
+        return host, int(port)
+    return text, DNS_PORT
+
+def system_servers(path: str = "/etc/resolv.conf") -> List[str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            servers = [line.split()[1] for line in f if line.startswith("nameserver") and len(line.split()) > 1]
+    except OSError:
+        servers = []
+    return servers or FALLBACK_SERVERS
+
+
+class RateLimiter:
+    """1秒あたり rate 回まで（問い合わせの送信時刻を等間隔にずらす）"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class _UdpClient(asyncio.DatagramProtocol):
+    """サーバー1つへのUDPソケット。問い合わせIDで応答を待ち合わせる"""
+
+    def __init__(self):
+        self.transport = None
+        self.pending: Dict[int, asyncio.Future] = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        future = self.pending.pop(struct.unpack(">H", data[:2])[0], None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self.pending.clear()
+
+
+class TtlCache:
+    """(名前, 種類) -> 応答。TTL を過ぎたものは無いものとして扱う"""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, int], Tuple[float, DnsAnswer]] = {}
+
+    def get(self, key: Tuple[str, int]) -> Optional[DnsAnswer]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def put(self, key: Tuple[str, int], answer: DnsAnswer) -> None:
+        if answer.records:
+            ttl = min(r.ttl for r in answer.records)
+        else:
+            ttl = min(answer.negative_ttl if answer.negative_ttl is not None else NEGATIVE_TTL, NEGATIVE_TTL)
+        if ttl > 0:
+            self._entries[key] = (time.monotonic() + ttl, answer)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DnsResolver:
+    """候補ドメインを並行して解決する（サーバーごとの流量制限・再試行・TTLキャッシュ付き）"""
+
+    def __init__(self, servers: Optional[Iterable[str]] = None, concurrency: int = DNS_CONCURRENCY,
+                 rate: float = DNS_RATE_PER_SERVER, timeout: float = DNS_TIMEOUT, retries: int = DNS_RETRIES,
+                 backoff: float = DNS_BACKOFF):
+        self.servers = [parse_server(s) for s in (servers or system_servers())]
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = TtlCache()
+        self.stats = {"queries": 0, "cache_hits": 0, "retries": 0, "failures": 0}
+        self._limiters = [RateLimiter(rate) for _ in self.servers]
+        self._clients: List[Optional[_UdpClient]] = [None] * len(self.servers)
+        self._inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._next_server = 0
+
+    async def _client(self, index: int) -> _UdpClient:
+        client = self._clients[index]
+        if client is None or client.transport is None or client.transport.is_closing():
+            loop = asyncio.get_running_loop()
+            _, client = await loop.create_datagram_endpoint(_UdpClient, remote_addr=self.servers[index])
+            self._clients[index] = client
+        return client
+
+    async def _send(self, index: int, name: str, qtype: int) -> DnsAnswer:
+        await self._limiters[index].wait()
+        client = await self._client(index)
+        qid = random.getrandbits(16)
+        while qid in client.pending:
+            qid = random.getrandbits(16)
+        future = asyncio.get_running_loop().create_future()
+        client.pending[qid] = future
+        self.stats["queries"] += 1
+        try:
+            client.transport.sendto(build_query(qid, name, qtype))
+            data = await asyncio.wait_for(future, self.timeout)
+        finally:
+            client.pending.pop(qid, None)
+        _, truncated, answer = parse_response(data)
+        if truncated:
+            answer = await self._send_tcp(index, name, qtype)
+        return answer
+
+    async def _send_tcp(self, index: int, name: str, qtype: int) -> DnsAnswer:
+        # 応答が512バイトに収まらなかった場合は TCP で問い合わせ直す
+        host, port = self.servers[index]
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+        try:
+            query = build_query(random.getrandbits(16), name, qtype)
+            writer.write(struct.pack(">H", len(query)) + query)
+            length = struct.unpack(">H", await asyncio.wait_for(reader.readexactly(2), self.timeout))[0]
+            return parse_response(await asyncio.wait_for(reader.readexactly(length), self.timeout))[2]
+        finally:
+            writer.close()
+
+    async def _query_uncached(self, name: str, qtype: int) -> DnsAnswer:
+        delay = self.backoff
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            index = self._next_server
+            self._next_server = (self._next_server + 1) % len(self.servers)
+            try:
+                answer = await self._send(index, name, qtype)
+                if answer.rcode != RCODE_SERVFAIL:
+                    return answer
+                last_error = DnsError(f"SERVFAIL ({self.servers[index][0]})")
+            except (asyncio.TimeoutError, OSError, ValueError, struct.error) as e:
+                last_error = e
+            if attempt < self.retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+        self.stats["failures"] += 1
+        raise DnsError(f"{name} {QTYPE_NAMES.get(qtype, qtype)}: {type(last_error).__name__} {last_error}")
+
+    async def query(self, name: str, qtype: int) -> DnsAnswer:
+        """name の qtype レコード（キャッシュ・同じ問い合わせの相乗りを含む）"""
+        key = (name.lower().rstrip('.'), qtype)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+        if key in self._inflight:
+            self.stats["cache_hits"] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            answer = await self._query_uncached(*key)
+            self.cache.put(key, answer)
+            future.set_result(answer)
+            return answer
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 相乗りが無い場合の「取得されない例外」の警告を抑える
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def resolve(self, domain: str) -> Dict[str, Any]:
+        """domain の A / AAAA / MX と状態"""
+        answers = await asyncio.gather(*(self.query(domain, qtype) for qtype in (QTYPE_A, QTYPE_AAAA, QTYPE_MX)),
+                                       return_exceptions=True)
+        errors = [a for a in answers if isinstance(a, BaseException)]
+        ok = [a for a in answers if not isinstance(a, BaseException)]
+        if any(a.rcode == RCODE_NXDOMAIN for a in ok):
+            return {"status": STATUS_NXDOMAIN, "a": [], "aaaa": [], "mx": []}
+
+        def values(answer, qtype):
+            if isinstance(answer, BaseException):
+                return []
+            return [r.data for r in answer.records if r.qtype == qtype]
+
+        a, aaaa = values(answers[0], QTYPE_A), values(answers[1], QTYPE_AAAA)
+        mx = [host for _, host in sorted(values(answers[2], QTYPE_MX))]
+        if mx:
+            status = STATUS_MX
+        elif a or aaaa:
+            status = STATUS_ADDRESS
+        elif errors:
+            status = STATUS_ERROR
+        else:
+            status = STATUS_NO_RECORDS
+        result = {"status": status, "a": a, "aaaa": aaaa, "mx": mx}
+        if errors:
+            result["error"] = str(errors[0])
+        return result
+
+    async def resolve_many(self, domains: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """domains（重複は1回だけ）を concurrency 件ずつ並行して解決する"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(domain):
+            async with semaphore:
+                return domain, await self.resolve(domain)
+
+        try:
+            return dict(await asyncio.gather(*(one(d) for d in dict.fromkeys(domains))))
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        for client in self._clients:
+            if client is not None and client.transport is not None:
+                client.transport.close()
+        self._clients = [None] * len(self.servers)
+
+
+def annotate_rankings(rows: List[Dict[str, Any]], statuses: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """順位表の各行に名前解決の結果 "dns" を付けたものを返す"""
+    return [{**r, "dns": statuses.get(r["typo"], {"status": STATUS_ERROR, "a": [], "aaaa": [], "mx": []})} for r in rows]
+
+# -------------------------------------------------------------------
+# ローカルのスタブサーバー（確認・試験用）
+# -------------------------------------------------------------------
+
+def _encode_rdata(qtype: int, value: Any) -> bytes:
+    if qtype == QTYPE_A:
+        return socket.inet_pton(socket.AF_INET, value)
+    if qtype == QTYPE_AAAA:
+        return socket.inet_pton(socket.AF_INET6, value)
+    if qtype == QTYPE_MX:
+        return struct.pack(">H", value[0]) + encode_name(value[1])
+    return encode_name(value)
+
+def load_zone(path: str) -> Dict[Tuple[str, int], List[Tuple[Any, int]]]:
+    """'名前 種類 値 [TTL]' の行（MX の値は '優先度:ホスト'）。# 以降はコメント"""
+    types = {v: k for k, v in QTYPE_NAMES.items()}
+    zone: Dict[Tuple[str, int], List[Tuple[Any, int]]] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.split('#', 1)[0].split()
+            if len(fields) < 3:
+                continue
+            name, qtype, value = fields[0].lower().rstrip('.'), types[fields[1].upper()], fields[2]
+            if qtype == QTYPE_MX:
+                pref, _, host = value.partition(':')
+                value = (int(pref), host)
+            zone.setdefault((name, qtype), []).append((value, int(fields[3]) if len(fields) > 3 else 300))
+    return zone
+
+
+class StubDnsServer(asyncio.DatagramProtocol):
+    """ゾーン（(名前, 種類) -> [(値, TTL)]）から応答するUDPサーバー。drop_rate の割合の問い合わせには応答しない"""
+
+    def __init__(self, zone: Dict[Tuple[str, int], List[Tuple[Any, int]]], drop_rate: float = 0.0, seed: int = 0):
+        self.zone = zone
+        self.names = {name for name, _ in zone}
+        self.drop_rate = drop_rate
+        self.received = 0
+        self._rng = random.Random(seed)
+        self.transport = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """起動して 'ホスト:ポート' を返す（port=0 なら空いているポート）"""
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        bound = self.transport.get_extra_info("sockname")
+        return f"{bound[0]}:{bound[1]}"
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        if self._rng.random() < self.drop_rate:
+            return
+        qid = struct.unpack(">H", data[:2])[0]
+        name, offset = _read_name(data, 12)
+        qtype = struct.unpack(">H", data[offset:offset + 2])[0]
+        question = data[12:offset + 4]
+
+        answers = self.zone.get((name, qtype), [])
+        rcode = RCODE_NOERROR if name in self.names else RCODE_NXDOMAIN
+        body = b''.join(b'\xc0\x0c' + struct.pack(">HHIH", qtype, 1, ttl, len(rdata)) + rdata
+                        for value, ttl in answers for rdata in [_encode_rdata(qtype, value)])
+        authority = b''
+        if not answers:
+            # 否定応答のTTLを伝える SOA（MINIMUM を 60 秒にする）
+            soa = encode_name("ns.stub") + encode_name("admin.stub") + struct.pack(">IIIII", 1, 3600, 600, 86400, 60)
+            authority = b'\xc0\x0c' + struct.pack(">HHIH", QTYPE_SOA, 1, 60, len(soa)) + soa
+        flags = 0x8180 | rcode
+        header = struct.pack(">HHHHHH", qid, flags, 1, len(answers), 1 if authority else 0, 0)
+        self.transport.sendto(header + question + body + authority, addr)
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    from typo_runtime import DEFAULT_MODEL_FILE, TypoRuntime
+
+    parser = argparse.ArgumentParser(description="タイポ候補の名前解決（A / AAAA / MX）")
+    parser.add_argument("domain")
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--model", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--server", action="append", help="DNSサーバー（ホスト[:ポート]、複数指定可）。省略時は /etc/resolv.conf")
+    parser.add_argument("--stub", metavar="ZONE", help="ゾーンファイルからローカルのスタブサーバーを起動して使う")
+    parser.add_argument("--concurrency", type=int, default=DNS_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DNS_RATE_PER_SERVER)
+    parser.add_argument("--timeout", type=float, default=DNS_TIMEOUT)
+    args = parser.parse_args()
+
+    try:
+        runtime = TypoRuntime.load(args.model)
+        zone = load_zone(args.stub) if args.stub else None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] 入力を読み込めませんでした: {e}")
+        sys.exit(1)
+    rows = runtime.generate(args.domain, args.top)
+
+    async def main():
+        stub = None
+        servers = args.server
+        if zone is not None:
+            stub = StubDnsServer(zone)
+            servers = [await stub.start()]
+        resolver = DnsResolver(servers, args.concurrency, args.rate, args.timeout)
+        try:
+            return await resolver.resolve_many(r["typo"] for r in rows), resolver.stats
+        finally:
+            if stub is not None:
+                stub.close()
+
+    start = time.perf_counter()
+    statuses, stats = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    for i, r in enumerate(annotate_rankings(rows, statuses)):
+        dns = r["dns"]
+        detail = ", ".join(dns["mx"] or dns["a"] or dns["aaaa"]) or dns.get("error", "")
+        print(f"{i+1:2}位 {r['typo']:<30} (スコア: {r['score']:.7f}) {dns['status']:<8} {detail}")
+    print(f"[INFO] {len(statuses)}件を {elapsed:.2f}秒で解決（問い合わせ {stats['queries']}回、"
+          f"キャッシュ {stats['cache_hits']}回、再試行 {stats['retries']}回、失敗 {stats['failures']}件）")
@@ -0,0 +1,476 @@
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# ===================================================================
+# -------- 基準出力 (golden/) との一致確認 ----------
+# ===================================================================
+#
+# 高速化（生成・スコア計算の書き換え、表の事前コンパイル等）で順位が黙って変わらないよう、
+# 現在の出力を golden/ に固定し、実装（エンジン）ごとの出力と比べる。
+#   causes.csv     : 原因分類の付いた CSV (domaintypos_dl4_causes2.csv)
+#   data.json      : Web用の重み・位置別頻度
+#   rankings.json  : GOLDEN_DOMAINS それぞれの typo_generator_ranked 上位 top_k 件
+#   manifest.json  : 入力のハッシュ・ドメイン一覧・top_k・固定したエンジン
+# エンジンは、ソースツリーを一時ディレクトリに写してスクリプトを実行し（既定はこのリポジトリ。
+# --repo で別の作業ツリーも指定できる）、順位は別プロセスで計算する。
+# 浮動小数は相対・絶対誤差 (FLOAT_REL_TOL / FLOAT_ABS_TOL) 以内なら一致とし、
+# 順位表ではスコアが誤差内で並ぶ候補（同点）の並び替えは差異としない
+#
+#   python golden_harness.py freeze                          # 基準エンジン (typo_ranking) の出力を golden/ に固定
+#   python golden_harness.py check --engine runtime,mmap     # golden/ と比べる（差異があれば終了コード 1）
+#   python golden_harness.py check --engine typo_ranking --repo ../optimized
+#   python golden_harness.py fuzz --engine mmap --n 300      # 乱数のドメインで基準エンジンと比べる
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(REPO_DIR, "golden")
+GOLDEN_FORMAT = 1
+
+INPUT_FILE = "filtered_address.csv"
+CAUSES_FILE = "domaintypos_dl4_causes2.csv"
+DATA_JSON_FILE = "data.json"
+MODEL_FILE = "model.bin"
+DATA_FILES = [INPUT_FILE, "filtered_domain_typos_dl4.csv", "tld_prices.json", "confusables.txt", "tld_registry.txt"]  # スクリプトの実行に必要な入力
+
+GOLDEN_DOMAINS = [
+    "treasurefactory.co.jp", "kotobukispirits.co.jp", "infroneer.com", "sanyo-shokai.co.jp",
+    "google.com", "yahoo.co.jp", "docomo.ne.jp", "ritsumei.ac.jp", "mitsui-matsushima.co.jp",
+    "abc.jp", "softbank.jp", "mail.net", "a1.jp", "example.org",
+]
+GOLDEN_TOP_K = 50
+
+FLOAT_REL_TOL = 1e-9
+FLOAT_ABS_TOL = 1e-12
+MAX_REPORTED = 10  # 成果物ごとに表示する差異の件数
+MAX_SHRUNK = 3     # ファジングで最小の例まで縮める件数（1段ごとに順位を計算し直すため時間がかかる）
+
+FUZZ_TLDS = ["com", "net", "org", "jp", "co.jp", "ne.jp", "or.jp", "ac.jp", "go.jp", "xyz"]
+FUZZ_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+class Engine(NamedTuple):
+    script: str                 # causes.csv と data.json を書き出すスクリプト
+    ranker: Optional[str]       # 順位を計算する関数 (RANKERS のキー)。None は順位を比べない
+    stdin: str = "\n"           # 対話入力への応答
+
+
+def _restore_model_globals(tr, meta: Dict[str, Any]) -> None:
+    # typo_ranking.py の実行部分と同じく、生成時のホモグリフはモデルの値を使う
+    tr.HOMOGLYPHS_FOR_GENERATOR = meta["homoglyphs_for_generator"]
+
+def _rank_typo_ranking(workdir: str) -> Callable[[str, int], List[Dict[str, Any]]]:
+    import typo_ranking as tr
+    from model_artifact import read_model
+    individual_weights, positional_freqs, meta = read_model(os.path.join(workdir, MODEL_FILE))
+    _restore_model_globals(tr, meta)
+    confusions = tr.TldConfusionModel.from_json(meta["tld_confusions"])
+    return lambda domain, top_k: tr.typo_generator_ranked(domain, individual_weights, positional_freqs, top_n=top_k,
+                                                          confusables_index=meta["confusables_index"], confusions=confusions)
+
+def _rank_runtime(workdir: str) -> Callable[[str, int], List[Dict[str, Any]]]:
+    from typo_runtime import TypoRuntime
+    return TypoRuntime.load(os.path.join(workdir, MODEL_FILE)).generate
+
+def _rank_mmap(workdir: str) -> Callable[[str, int], List[Dict[str, Any]]]:
+    from typo_runtime import TypoRuntime
+    return TypoRuntime.mapped(os.path.join(workdir, MODEL_FILE)).generate
+
+def _rank_ver3(workdir: str) -> Callable[[str, int], List[Dict[str, Any]]]:
+    import typo_generate_ver3 as ver3
+    individual_weights = ver3.analyze_for_ranking(CAUSES_FILE)[1]
+    positional_freqs = ver3.calculate_positional_freqs(CAUSES_FILE)
+    return lambda domain, top_k: ver3.typo_generator_ranked(domain, individual_weights, positional_freqs, top_n=top_k)
+
+RANKERS = {
+    "typo_ranking": _rank_typo_ranking,
+    "runtime": _rank_runtime,
+    "mmap": _rank_mmap,
+    "ver3": _rank_ver3,
+}
+
+ENGINES = {
+    "typo_ranking": Engine("typo_ranking.py", "typo_ranking"),   # 基準
+    "runtime": Engine("typo_ranking.py", "runtime"),             # model.bin だけで動く実行用モジュール
+    "mmap": Engine("typo_ranking.py", "mmap"),                   # model.bin を mmap したまま使う
+    "ver3": Engine("typo_generate_ver3.py", "ver3", stdin="treasurefactory.co.jp\n\n"),
+    "test": Engine("test.py", None),
+}
+REFERENCE_ENGINE = "typo_ranking"
+
+# -------------------------------------------------------------------
+# エンジンの実行
+# -------------------------------------------------------------------
+
+def prepare_workdir(workdir: str, engine: Engine, repo: str = REPO_DIR) -> None:
+    """repo のスクリプトと入力を workdir に写し、engine のスクリプトを実行して causes.csv と data.json を作る"""
+    for name in os.listdir(repo):
+        if name.endswith(".py") or name in DATA_FILES:
+            shutil.copy2(os.path.join(repo, name), workdir)
+    proc = subprocess.run([sys.executable, engine.script], cwd=workdir, input=engine.stdin,
+                          capture_output=True, text=True, encoding="utf-8")
+    if not os.path.exists(os.path.join(workdir, CAUSES_FILE)):
+        raise RuntimeError(f"{engine.script} が {CAUSES_FILE} を書き出しませんでした（終了コード {proc.returncode}）\n{proc.stderr[-2000:]}")
+
+def _rank_worker(ranker: str, workdir: str, domains: List[str], top_k: int, queue) -> None:
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    try:
+        import contextlib
+        import io
+        with contextlib.redirect_stdout(io.StringIO()):
+            rank = RANKERS[ranker](workdir)
+            queue.put({domain: rank(domain, top_k) for domain in domains})
+    except Exception as e:
+        queue.put(RuntimeError(f"{ranker}: {type(e).__name__}: {e}"))
+
+def rank_domains(ranker: str, workdir: str, domains: List[str], top_k: int) -> Dict[str, List[Dict[str, Any]]]:
+    """workdir のモジュールを別プロセスで読み込み、domains それぞれの上位 top_k 件を返す"""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_rank_worker, args=(ranker, workdir, domains, top_k, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+class EngineRuns:
+    """エンジンごとの作業ディレクトリ（同じスクリプトのエンジンは実行結果を共有する）"""
+
+    def __init__(self, repo: str = REPO_DIR):
+        self.repo = repo
+        self._tmp = tempfile.TemporaryDirectory(prefix="golden-")
+        self._workdirs: Dict[str, str] = {}
+
+    def workdir(self, name: str) -> str:
+        engine = ENGINES[name]
+        if engine.script not in self._workdirs:
+            workdir = os.path.join(self._tmp.name, os.path.splitext(engine.script)[0])
+            os.makedirs(workdir)
+            print(f"[INFO] {engine.script} を実行しています...")
+            prepare_workdir(workdir, engine, self.repo)
+            self._workdirs[engine.script] = workdir
+        return self._workdirs[engine.script]
+
+    def outputs(self, name: str, domains: List[str], top_k: int) -> Dict[str, Any]:
+        """エンジン name の causes.csv の行・data.json・順位表（対応しないものは None）"""
+        workdir = self.workdir(name)
+        data_path = os.path.join(workdir, DATA_JSON_FILE)
+        ranker = ENGINES[name].ranker
+        return {
+            "causes": read_csv_rows(os.path.join(workdir, CAUSES_FILE)),
+            "data": load_json(data_path) if os.path.exists(data_path) else None,
+            "rankings": rank_domains(ranker, workdir, domains, top_k) if ranker else None,
+        }
+
+    def close(self) -> None:
+        self._tmp.cleanup()
+
+# -------------------------------------------------------------------
+# 比較（浮動小数は誤差を許す）
+# -------------------------------------------------------------------
+
+def read_csv_rows(path: str) -> List[List[str]]:
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))
+
+def load_json(path: str) -> Any:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _as_float(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value and any(c.isdigit() for c in value):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+def values_match(expected: Any, actual: Any, rel_tol: float = FLOAT_REL_TOL, abs_tol: float = FLOAT_ABS_TOL) -> bool:
+    """数値同士（数値の文字列を含む）は誤差以内なら一致、それ以外は完全一致"""
+    if expected == actual:
+        return True
+    a, b = _as_float(expected), _as_float(actual)
+    if a is None or b is None or (isinstance(expected, str) != isinstance(actual, str)):
+        return False
+    return math.isclose(a, b, rel_tol=rel_tol, abs_tol=abs_tol)
+
+def diff_csv(expected: List[List[str]], actual: List[List[str]], **tol: float) -> List[str]:
+    if not expected or not actual:
+        return [] if expected == actual else ["片方が空です"]
+    if expected[0] != actual[0]:
+        return [f"列が異なります: {expected[0]} != {actual[0]}"]
+    diffs = []
+    if len(expected) != len(actual):
+        diffs.append(f"行数が異なります: {len(expected) - 1} != {len(actual) - 1}")
+    header = expected[0]
+    for i, (e_row, a_row) in enumerate(zip(expected[1:], actual[1:]), start=1):
+        for col, e, a in zip(header, e_row, a_row):
+            if not values_match(e, a, **tol):
+                diffs.append(f"{i}行目 {col}: {e!r} != {a!r}")
+    return diffs
+
+def diff_json(expected: Any, actual: Any, path: str = "", **tol: float) -> List[str]:
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        diffs = [f"{path}/{k}: 基準にのみ存在" for k in expected if k not in actual]
+        diffs += [f"{path}/{k}: 比較対象にのみ存在" for k in actual if k not in expected]
+        for k in expected:
+            if k in actual:
+                diffs += diff_json(expected[k], actual[k], f"{path}/{k}", **tol)
+        return diffs
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: 要素数が異なります ({len(expected)} != {len(actual)})"]
+        diffs = []
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            diffs += diff_json(e, a, f"{path}[{i}]", **tol)
+        return diffs
+    return [] if values_match(expected, actual, **tol) else [f"{path}: {expected!r} != {actual!r}"]
+
+def _tie_blocks(rows: List[Dict[str, Any]], **tol: float) -> List[Tuple[int, int]]:
+    """スコアが誤差以内で並ぶ連続した範囲 [start, end) の一覧"""
+    blocks, start = [], 0
+    for i in range(1, len(rows) + 1):
+        if i == len(rows) or not values_match(rows[start]["score"], rows[i]["score"], **tol):
+            blocks.append((start, i))
+            start = i
+    return blocks
+
+def diff_ranking(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]], **tol: float) -> List[str]:
+    """同点（スコアが誤差以内）の候補の並び替えは許し、候補の集合・スコア・その他の項目を比べる"""
+    if len(expected) != len(actual):
+        return [f"件数が異なります: {len(expected)} != {len(actual)}"]
+    diffs = []
+    blocks = _tie_blocks(expected, **tol)
+    for start, end in blocks:
+        e_block = {r["typo"]: r for r in expected[start:end]}
+        a_block = {r["typo"]: r for r in actual[start:end]}
+        if (start, end) == blocks[-1] and end == len(expected):
+            # 最後の同点の範囲は top_k で切られている場合があるので、スコアが同じなら別の候補でもよい
+            for r in actual[start:end]:
+                if r["typo"] not in e_block and not values_match(expected[start]["score"], r["score"], **tol):
+                    diffs.append(f"{start + 1}〜{end}位: {r['typo']} (スコア {r['score']}) は基準に無い候補です")
+        elif set(e_block) != set(a_block):
+            missing, extra = sorted(set(e_block) - set(a_block)), sorted(set(a_block) - set(e_block))
+            diffs.append(f"{start + 1}〜{end}位: 基準のみ {missing} / 比較対象のみ {extra}")
+            continue
+        for typo, e_row in e_block.items():
+            if typo in a_block:
+                diffs += [f"{typo}{d}" for d in diff_json(e_row, a_block[typo], **tol)]
+    return diffs
+
+def diff_rankings(expected: Dict[str, List], actual: Dict[str, List], **tol: float) -> List[str]:
+    diffs = []
+    for domain, rows in expected.items():
+        if domain not in actual:
+            diffs.append(f"{domain}: 順位表がありません")
+            continue
+        diffs += [f"{domain}: {d}" for d in diff_ranking(rows, actual[domain], **tol)]
+    return diffs
+
+def check_invariants(domain: str, rows: List[Dict[str, Any]], top_k: int) -> List[str]:
+    """どの実装でも成り立つべき性質"""
+    problems = []
+    if len(rows) > top_k:
+        problems.append(f"{top_k}件を超えています ({len(rows)}件)")
+    typos = [r["typo"] for r in rows]
+    if len(set(typos)) != len(typos):
+        problems.append("候補が重複しています")
+    if domain in typos:
+        problems.append("元のドメインが候補に含まれています")
+    keys = [(r["score"], -r["distance"]) for r in rows]
+    if any(a < b for a, b in zip(keys, keys[1:])):
+        problems.append("スコアの降順になっていません")
+    if any(',' in t or '/' in t for t in typos):
+        problems.append("',' または '/' を含む候補があります")
+    if any(not (isinstance(r["score"], (int, float)) and math.isfinite(r["score"])) for r in rows):
+        problems.append("スコアが有限の数値ではありません")
+    return problems
+
+# -------------------------------------------------------------------
+# 固定・確認・ファジング
+# -------------------------------------------------------------------
+
+def _golden_path(name: str) -> str:
+    return os.path.join(GOLDEN_DIR, name)
+
+def freeze(engine: str = REFERENCE_ENGINE, repo: str = REPO_DIR, domains: List[str] = GOLDEN_DOMAINS,
+           top_k: int = GOLDEN_TOP_K) -> None:
+    """engine の現在の出力を golden/ に書き出す"""
+    from stage_cache import file_sha256
+    runs = EngineRuns(repo)
+    try:
+        workdir = runs.workdir(engine)
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        shutil.copyfile(os.path.join(workdir, CAUSES_FILE), _golden_path("causes.csv"))
+        shutil.copyfile(os.path.join(workdir, DATA_JSON_FILE), _golden_path("data.json"))
+        rankings = rank_domains(ENGINES[engine].ranker, workdir, domains, top_k)
+    finally:
+        runs.close()
+
+    with open(_golden_path("rankings.json"), 'w', encoding='utf-8') as f:
+        json.dump(rankings, f, indent=1, ensure_ascii=False)
+    manifest = {
+        "format": GOLDEN_FORMAT,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "engine": engine,
+        "input_sha256": file_sha256(os.path.join(repo, INPUT_FILE)),
+        "domains": domains,
+        "top_k": top_k,
+    }
+    with open(_golden_path("manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    print(f"[SUCCESS] 基準出力を固定しました: {GOLDEN_DIR}/（{engine}、{len(domains)}ドメイン × 上位{top_k}件）")
+
+def load_golden() -> Dict[str, Any]:
+    manifest = load_json(_golden_path("manifest.json"))
+    if manifest.get("format") != GOLDEN_FORMAT:
+        raise ValueError(f"未対応の形式です: {_golden_path('manifest.json')}")
+    return {
+        "manifest": manifest,
+        "causes": read_csv_rows(_golden_path("causes.csv")),
+        "data": load_json(_golden_path("data.json")),
+        "rankings": load_json(_golden_path("rankings.json")),
+    }
+
+def _report(label: str, diffs: Optional[List[str]]) -> bool:
+    if diffs is None:
+        print(f"  {label:<14} 対象外")
+        return True
+    if not diffs:
+        print(f"  {label:<14} 一致")
+        return True
+    print(f"  {label:<14} 差異 {len(diffs)}件")
+    for d in diffs[:MAX_REPORTED]:
+        print(f"      {d}")
+    return False
+
+def check(engines: List[str], repo: str = REPO_DIR, **tol: float) -> bool:
+    """engines の出力を golden/ と比べる。すべて一致すれば True"""
+    golden = load_golden()
+    manifest = golden["manifest"]
+    runs = EngineRuns(repo)
+    ok = True
+    try:
+        for name in engines:
+            out = runs.outputs(name, manifest["domains"], manifest["top_k"])
+            print(f"[INFO] {name}:")
+            ok &= _report("causes.csv", diff_csv(golden["causes"], out["causes"], **tol))
+            ok &= _report("data.json", None if out["data"] is None else diff_json(golden["data"], out["data"], **tol))
+            ok &= _report("rankings", None if out["rankings"] is None else diff_rankings(golden["rankings"], out["rankings"], **tol))
+    finally:
+        runs.close()
+    return ok
+
+def random_domain(rng: random.Random) -> str:
+    """ハイフン・数字を含むラベルと、よくある TLD からなるドメイン"""
+    length = rng.choice([1, 2, 3, 5, 8, 12, 20, 30])
+    label = [rng.choice(FUZZ_ALPHABET) for _ in range(length)]
+    for i in range(1, length - 1):
+        if rng.random() < 0.08:
+            label[i] = '-'
+    if rng.random() < 0.1:
+        label = list("".join(label) + "." + "".join(rng.choice(FUZZ_ALPHABET) for _ in range(4)))  # サブドメイン付き
+    return "".join(label) + "." + rng.choice(FUZZ_TLDS)
+
+def _shrink_candidates(domain: str) -> List[str]:
+    """先頭のラベルを1文字削ったドメイン（TLD・サブドメインはそのまま、ラベルは空にしない）"""
+    label, rest = domain.split('.', 1)
+    smaller = (label[:i] + label[i + 1:] for i in range(len(label)))
+    return [f"{l}.{rest}" for l in dict.fromkeys(smaller) if l and not l.startswith('-') and not l.endswith('-')]
+
+def fuzz(engine: str, reference: str = REFERENCE_ENGINE, n: int = 200, seed: int = 0, top_k: int = GOLDEN_TOP_K,
+         repo: str = REPO_DIR, **tol: float) -> bool:
+    """乱数のドメインで engine と reference の順位表を比べ、性質も確かめる。差異は最小の例まで縮めて表示する"""
+    rng = random.Random(seed)
+    domains = list(dict.fromkeys(random_domain(rng) for _ in range(n)))
+    runs = EngineRuns(repo)
+    try:
+        ranker_e, workdir_e = ENGINES[engine].ranker, runs.workdir(engine)
+        ranker_r, workdir_r = ENGINES[reference].ranker, runs.workdir(reference)
+
+        def failures(batch: List[str]) -> Dict[str, List[str]]:
+            expected = rank_domains(ranker_r, workdir_r, batch, top_k)
+            actual = rank_domains(ranker_e, workdir_e, batch, top_k)
+            found = {}
+            for domain in batch:
+                problems = [f"性質: {p}" for p in check_invariants(domain, actual[domain], top_k)]
+                problems += diff_ranking(expected[domain], actual[domain], **tol)
+                if problems:
+                    found[domain] = problems
+            return found
+
+        found = failures(domains)
+        print(f"[INFO] {engine} と {reference} を {len(domains)}件のドメインで比較: 差異 {len(found)}件")
+        for i, (domain, problems) in enumerate(list(found.items())[:MAX_REPORTED]):
+            # 差異が残る範囲で1文字ずつ削り、最小の例にする
+            while i < MAX_SHRUNK:
+                smaller = failures(_shrink_candidates(domain))
+                if not smaller:
+                    break
+                domain, problems = min(smaller.items(), key=lambda item: len(item[0]))
+            print(f"  {domain}")
+            for p in problems[:MAX_REPORTED]:
+                print(f"      {p}")
+    finally:
+        runs.close()
+    return not found
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="基準出力 (golden/) との一致確認")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("freeze", "check", "fuzz"):
+        p = sub.add_parser(name)
+        p.add_argument("--repo", default=REPO_DIR, help="実行するソースツリー（既定はこのリポジトリ）")
+        p.add_argument("--rel-tol", type=float, default=FLOAT_REL_TOL)
+        p.add_argument("--abs-tol", type=float, default=FLOAT_ABS_TOL)
+    sub.choices["freeze"].add_argument("--engine", default=REFERENCE_ENGINE, choices=sorted(ENGINES))
+    sub.choices["check"].add_argument("--engine", default=REFERENCE_ENGINE, help=f"カンマ区切り ({', '.join(ENGINES)})")
+    sub.choices["fuzz"].add_argument("--engine", required=True, choices=sorted(ENGINES))
+    sub.choices["fuzz"].add_argument("--reference", default=REFERENCE_ENGINE, choices=sorted(ENGINES))
+    sub.choices["fuzz"].add_argument("--n", type=int, default=200)
+    sub.choices["fuzz"].add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    tol = {"rel_tol": args.rel_tol, "abs_tol": args.abs_tol}
+
+    if args.command == "freeze":
+        freeze(args.engine, args.repo)
+        sys.exit(0)
+
+    if args.command == "check":
+        engines = [e.strip() for e in args.engine.split(",") if e.strip()]
+        unknown = [e for e in engines if e not in ENGINES]
+        if unknown:
+            print(f"[ERROR] 不明なエンジン: {', '.join(unknown)}")
+            sys.exit(2)
+        try:
+            ok = check(engines, args.repo, **tol)
+        except FileNotFoundError as e:
+            print(f"[ERROR] 基準出力がありません（先に freeze を実行してください）: {e.filename}")
+            sys.exit(2)
+    else:
+        if ENGINES[args.engine].ranker is None or ENGINES[args.reference].ranker is None:
+            print("[ERROR] 順位を計算しないエンジンはファジングできません")
+            sys.exit(2)
+        ok = fuzz(args.engine, args.reference, args.n, args.seed, repo=args.repo, **tol)
+
+    print("[SUCCESS] 基準と一致しました" if ok else "[WARN] 基準と異なる出力があります")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,87 @@
+import os
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow  # 任意。無ければ中間ファイルは CSV のまま
+except ImportError:
+    pyarrow = None
+
+# ===================================================================
+# -------- 中間ファイル (filtered_domain_typos_dl4 / domaintypos_dl4_causes2) ----------
+# ===================================================================
+#
+# 形式は拡張子で決まる（.csv / .parquet）。
+#   CSV     : 従来どおり（ドメインは読むたびにメールアドレスから取り出す）
+#   Parquet : correct_domain / input_domain を辞書符号化 (category) した列として持ち、
+#             user_id 等は整数型に詰める。分析は必要な列（ドメイン2列 + cause）だけを読む
+
+INTERMEDIATE_FORMATS = ("csv", "parquet")
+DOMAIN_COLUMNS = ["correct_domain", "input_domain"]
+ADDRESS_COLUMNS = ["correct_address", "input_address"]
+CATEGORY_COLUMNS = DOMAIN_COLUMNS + ["cause", "correct_part", "mismatched_part"]
+INTEGER_COLUMNS = ["user_id", "step_id", "edit_distance"]
+
+
+def extract_domain(email):
+    """メールアドレスのドメイン部（@ が無ければ空文字）"""
+    return email.split('@')[1] if '@' in email else ''
+
+def resolve_format(fmt: str) -> str:
+    """指定の形式が使えなければ CSV にする（Parquet は pyarrow が必要）"""
+    if fmt not in INTERMEDIATE_FORMATS:
+        raise ValueError(f"未対応の中間ファイル形式です: {fmt} (利用可能: {', '.join(INTERMEDIATE_FORMATS)})")
+    if fmt == "parquet" and pyarrow is None:
+        print("[WARN] pyarrow が見つからないため、中間ファイルは CSV で出力します。")
+        return "csv"
+    return fmt
+
+def intermediate_path(path: str, fmt: str) -> str:
+    """'filtered_domain_typos_dl4.csv' -> 形式に合わせた拡張子のパス"""
+    return os.path.splitext(path)[0] + "." + fmt
+
+def is_parquet(path: str) -> bool:
+    return path.endswith(".parquet")
+
+def add_domain_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """correct_domain / input_domain が無ければメールアドレスから取り出して追加する"""
+    for domain_col, address_col in zip(DOMAIN_COLUMNS, ADDRESS_COLUMNS):
+        if domain_col not in df.columns:
+            df[domain_col] = df[address_col].astype(str).apply(extract_domain)
+    return df
+
+def compact_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """文字列の列を category（Parquet では辞書符号化）に、件数・ID を最小の整数型にする"""
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")  # 欠損がある列は浮動小数のまま
+    return df
+
+def write_intermediate(df: pd.DataFrame, path: str, **csv_kwargs) -> None:
+    """
+    中間ファイルを書き出す。CSV はドメイン列を含めない（従来と同じ内容）、
+    Parquet はドメイン列を必ず含める
+    """
+    if is_parquet(path):
+        compact_columns(add_domain_columns(df)).to_parquet(path, engine="pyarrow", index=False)
+    else:
+        df.drop(columns=DOMAIN_COLUMNS, errors="ignore").to_csv(path, index=False, **csv_kwargs)
+
+def read_intermediate(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """中間ファイルを読む（columns を指定するとその列だけ）"""
+    if is_parquet(path):
+        return pd.read_parquet(path, engine="pyarrow", columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+def read_domain_pairs(path: str, extra_columns: Iterable[str] = ()) -> pd.DataFrame:
+    """(correct_domain, input_domain, *extra_columns) だけの DataFrame を返す（Parquet はこの列しか読まない）"""
+    extra_columns = list(extra_columns)
+    if is_parquet(path):
+        return read_intermediate(path, DOMAIN_COLUMNS + extra_columns)
+    df = add_domain_columns(read_intermediate(path, ADDRESS_COLUMNS + extra_columns))
+    return df[DOMAIN_COLUMNS + extra_columns]
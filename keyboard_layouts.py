@@ -0,0 +1,158 @@
+import math
+from typing import Callable, Dict, List, Tuple, Union
+
+# ===================================================================
+# -------- キーボード配列モデル（文字×文字の物理距離行列）----------
+# ===================================================================
+
+# 隣接キーとみなす最大距離（キー1個分 + 段のずれ）
+ADJACENT_THRESHOLD = 1.3
+KEY_PITCH = 1.0  # キー1個分の距離。この距離の置換の起こりやすさを1とする
+
+# 段ごとの (開始位置のずれ, 文字列)。キー1個分の幅を1とする
+US_ROWS = [
+    (1.0,  "1234567890-="),
+    (1.5,  "qwertyuiop[]\\"),
+    (1.75, "asdfghjkl;'"),
+    (2.25, "zxcvbnm,./"),
+]
+
+JIS_ROWS = [
+    (1.0,  "1234567890-^\\"),
+    (1.5,  "qwertyuiop@["),
+    (1.75, "asdfghjkl;:]"),
+    (2.25, "zxcvbnm,./_"),
+]
+
+# スマートフォンのテンキー（トグル/フリック入力）。同じキー内の文字は距離0.5とする
+PHONE_KEYS = [
+    ((0, 0), "1.@-_/"), ((1, 0), "2abc"), ((2, 0), "3def"),
+    ((0, 1), "4ghi"),   ((1, 1), "5jkl"), ((2, 1), "6mno"),
+    ((0, 2), "7pqrs"),  ((1, 2), "8tuv"), ((2, 2), "9wxyz"),
+    ((1, 3), "0"),
+]
+SAME_KEY_DISTANCE = 0.5
+
+
+class KeyboardLayout:
+    """文字×文字の距離行列を事前計算したキーボード配列。距離・隣接判定はO(1)で引ける"""
+
+    def __init__(self, name: str, chars: List[str], matrix: List[float], threshold: float = ADJACENT_THRESHOLD, neighbors: Dict[str, str] = None):
+        self.name = name
+        self.chars = chars
+        self.index = {c: i for i, c in enumerate(chars)}
+        self.size = len(chars)
+        self.matrix = matrix  # size*size のフラットな行列 (行: 正しい文字, 列: 打たれた文字)
+        self.threshold = threshold
+        self.min_likelihood = math.exp(KEY_PITCH - threshold)  # 隣接キーとみなす起こりやすさの下限
+
+        # 生成用に、各文字の隣接キーを距離の近い順に並べておく
+        if neighbors is None:
+            neighbors = {}
+            for c, i in self.index.items():
+                row = matrix[i * self.size:(i + 1) * self.size]
+                near = [(d, self.chars[j]) for j, d in enumerate(row) if j != i and d <= threshold]
+                neighbors[c] = ''.join(ch for _, ch in sorted(near))
+        self._neighbors = neighbors
+
+    def distance(self, c1: str, c2: str) -> float:
+        i = self.index.get(c1.lower())
+        j = self.index.get(c2.lower())
+        if i is None or j is None:
+            return math.inf
+        return self.matrix[i * self.size + j]
+
+    def is_adjacent(self, c1: str, c2: str) -> bool:
+        return c1.lower() != c2.lower() and self.likelihood(c1, c2) >= self.min_likelihood
+
+    def likelihood(self, c1: str, c2: str) -> float:
+        """置換の起こりやすさ（隣のキー＝距離1で1、離れるほど0に近づく。テンキーの同じキー内は1より大きい）"""
+        return math.exp(KEY_PITCH - self.distance(c1, c2))
+
+    def neighbors(self, c: str) -> str:
+        return self._neighbors.get(c.lower(), '')
+
+    def adjacency_map(self) -> Dict[str, str]:
+        """data.json / typo_ranking.js 向けの keyboard_adjacent 形式に変換する"""
+        return {c: adj for c, adj in self._neighbors.items() if adj}
+
+    def likelihood_map(self) -> Dict[str, Dict[str, float]]:
+        """隣接キーごとの置換の起こりやすさ（data.json / typo_ranking.js 向け）"""
+        return {c: {ch: self.likelihood(c, ch) for ch in adj} for c, adj in self._neighbors.items() if adj}
+
+
+def _compile_from_positions(name: str, positions: Dict[str, Tuple[float, float]], same_key: Dict[str, object] = None) -> KeyboardLayout:
+    chars = list(positions)
+    n = len(chars)
+    matrix = [0.0] * (n * n)
+    for i, a in enumerate(chars):
+        ax, ay = positions[a]
+        for j, b in enumerate(chars):
+            if i == j:
+                continue
+            bx, by = positions[b]
+            d = math.hypot(ax - bx, ay - by)
+            if same_key is not None and same_key[a] == same_key[b]:
+                d = SAME_KEY_DISTANCE
+            matrix[i * n + j] = d
+    return KeyboardLayout(name, chars, matrix)
+
+def compile_row_layout(name: str, rows: List[Tuple[float, str]]) -> KeyboardLayout:
+    """段ごとの文字列から物理キーボードの距離行列を作る"""
+    positions = {}
+    for y, (offset, keys) in enumerate(rows):
+        for x, c in enumerate(keys):
+            positions.setdefault(c, (offset + x, float(y)))
+    return _compile_from_positions(name, positions)
+
+def compile_keypad_layout(name: str, keys: List[Tuple[Tuple[int, int], str]]) -> KeyboardLayout:
+    """テンキー（1キーに複数文字）の距離行列を作る"""
+    positions = {}
+    key_of = {}
+    for (x, y), chars in keys:
+        for c in chars:
+            positions.setdefault(c, (float(x), float(y)))
+            key_of.setdefault(c, (x, y))
+    return _compile_from_positions(name, positions, same_key=key_of)
+
+def compile_adjacency_layout(name: str, adjacent: Dict[str, str]) -> KeyboardLayout:
+    """既存の隣接キーマップ (keyboard_adjacent) を距離行列に変換する。隣接=1、それ以外=inf"""
+    chars = []
+    for c, adj in adjacent.items():
+        for ch in c + adj:
+            if ch not in chars:
+                chars.append(ch)
+    index = {c: i for i, c in enumerate(chars)}
+    n = len(chars)
+    matrix = [math.inf] * (n * n)
+    for i in range(n):
+        matrix[i * n + i] = 0.0
+    for c, adj in adjacent.items():
+        for ch in adj:
+            matrix[index[c] * n + index[ch]] = 1.0
+    # 生成順（=同点時の順位）を変えないよう、隣接キーは元の並びのまま使う
+    return KeyboardLayout(name, chars, matrix, threshold=1.0, neighbors=dict(adjacent))
+
+
+# 登録済みの配列。組み込みの配列は最初に使われたときに一度だけ行列化する（import を軽くするため）
+KEYBOARD_LAYOUTS: Dict[str, KeyboardLayout] = {}
+
+_BUILTIN_LAYOUTS: Dict[str, Callable[[], KeyboardLayout]] = {
+    "us": lambda: compile_row_layout("us", US_ROWS),
+    "jis": lambda: compile_row_layout("jis", JIS_ROWS),
+    "phone": lambda: compile_keypad_layout("phone", PHONE_KEYS),
+}
+
+def register_layout(layout: KeyboardLayout) -> None:
+    KEYBOARD_LAYOUTS[layout.name] = layout
+
+def get_layout(layout: Union[str, KeyboardLayout]) -> KeyboardLayout:
+    if isinstance(layout, KeyboardLayout):
+        return layout
+    if layout not in KEYBOARD_LAYOUTS and layout in _BUILTIN_LAYOUTS:
+        register_layout(_BUILTIN_LAYOUTS[layout]())
+    try:
+        return KEYBOARD_LAYOUTS[layout]
+    except KeyError:
+        available = sorted(set(KEYBOARD_LAYOUTS) | set(_BUILTIN_LAYOUTS))
+        raise ValueError(f"未登録のキーボード配列です: {layout} (利用可能: {', '.join(available)})")
@@ -0,0 +1,207 @@
+import json
+import struct
+import sys
+import zlib
+from typing import Any, Dict, List, Tuple
+
+# ===================================================================
+# -------- バイナリ形式のモデル (model.bin) ----------
+# ===================================================================
+#
+#   ヘッダ (32バイト, リトルエンディアン)
+#     magic "TYPOMDL\0" / 形式バージョン u16 / フラグ u16 /
+#     文字列数 u32 / 重みレコード数 u32 / 位置レコード数 u32 / メタ情報長 u32 / 本体のCRC32 u32
+#   本体
+#     文字列表   : オフセット u32 × (文字列数+1) + UTF-8 連結（原因・文字・キーを昇順に並べ、添字で参照）
+#     重み       : (原因 u16, キー種別 u8, -, a u32, b u32, 重み f64) を昇順に並べたもの
+#                  キー種別 0 = 文字列キー ("co.jp -> jp" 等、b は未使用), 1 = (a, b) のタプルキー
+#     位置別頻度 : (原因 u16, -, 文字 u32, 末尾からの位置 i32, 件数 u32) を昇順に並べたもの
+#     メタ情報   : JSON (total_dl1_count, TLD_COSTS 等、data.json のその他の項目)
+
+MAGIC = b"TYPOMDL\0"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sHHIIIII")
+WEIGHT_RECORD = struct.Struct("<HBxIId")
+POSITION_RECORD = struct.Struct("<HxxIiI")
+
+KEY_STR = 0
+KEY_PAIR = 1
+NO_STRING = 0xFFFFFFFF
+
+
+class ModelFormatError(ValueError):
+    pass
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+def _pack_strings(strings: List[str]) -> bytes:
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = [0]
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    table = struct.pack(f"<{len(offsets)}I", *offsets) + b''.join(encoded)
+    return table + b'\0' * (_align8(len(table)) - len(table))
+
+def encode_model(individual_weights: Dict[str, Dict[Any, float]], positional_freqs: Dict[str, Dict[str, Dict[int, int]]], meta: Dict[str, Any]) -> bytes:
+    """重み・位置別頻度・メタ情報をバイナリに変換する"""
+    strings = set()
+    for cause, inner in individual_weights.items():
+        strings.add(cause)
+        for key in inner:
+            strings.update(key if isinstance(key, tuple) else (key,))
+    for cause, char_data in positional_freqs.items():
+        strings.add(cause)
+        strings.update(char_data)
+    strings = sorted(strings)
+    sid = {s: i for i, s in enumerate(strings)}
+
+    weight_rows = []
+    for cause, inner in individual_weights.items():
+        for key, score in inner.items():
+            if isinstance(key, tuple):
+                if len(key) != 2:
+                    raise ModelFormatError(f"2要素以外のタプルキーは格納できません: {key!r}")
+                weight_rows.append((sid[cause], KEY_PAIR, sid[key[0]], sid[key[1]], float(score)))
+            else:
+                weight_rows.append((sid[cause], KEY_STR, sid[key], NO_STRING, float(score)))
+    weight_rows.sort()
+
+    position_rows = []
+    for cause, char_data in positional_freqs.items():
+        for char, pos_counts in char_data.items():
+            for pos, count in pos_counts.items():
+                position_rows.append((sid[cause], sid[char], int(pos), int(count)))
+    position_rows.sort()
+
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    body = bytearray(_pack_strings(strings))
+    for row in weight_rows:
+        body += WEIGHT_RECORD.pack(*row)
+    for row in position_rows:
+        body += POSITION_RECORD.pack(*row)
+    body += meta_bytes
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(strings), len(weight_rows), len(position_rows),
+                         len(meta_bytes), zlib.crc32(body))
+    return header + bytes(body)
+
+def write_model(path: str, individual_weights: Dict, positional_freqs: Dict, meta: Dict[str, Any]) -> int:
+    data = encode_model(individual_weights, positional_freqs, meta)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+def read_header(data) -> Tuple[int, int, int, int, int, int]:
+    """(形式バージョン, 文字列数, 重み数, 位置数, メタ長, CRC32) を返す"""
+    if len(data) < HEADER.size:
+        raise ModelFormatError("ファイルが短すぎます")
+    magic, version, _flags, n_strings, n_weights, n_positions, meta_len, crc = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ModelFormatError("model.bin 形式ではありません")
+    if version != FORMAT_VERSION:
+        raise ModelFormatError(f"未対応の形式バージョンです: {version}")
+    return version, n_strings, n_weights, n_positions, meta_len, crc
+
+def section_offsets(data) -> Dict[str, int]:
+    """各セクションの開始位置（ファイル先頭からのバイト数）"""
+    _, n_strings, n_weights, n_positions, meta_len, _ = read_header(data)
+    offsets_at = HEADER.size
+    blob_at = offsets_at + 4 * (n_strings + 1)
+    if len(data) < blob_at:
+        raise ModelFormatError("ファイルが途中で切れています")
+    blob_len = struct.unpack_from("<I", data, offsets_at + 4 * n_strings)[0]
+    weights_at = HEADER.size + _align8(4 * (n_strings + 1) + blob_len)
+    positions_at = weights_at + WEIGHT_RECORD.size * n_weights
+    meta_at = positions_at + POSITION_RECORD.size * n_positions
+    return {
+        "string_offsets": offsets_at, "string_blob": blob_at, "weights": weights_at,
+        "positions": positions_at, "meta": meta_at, "end": meta_at + meta_len
+    }
+
+def decode_model(data: bytes, verify: bool = True) -> Tuple[Dict, Dict, Dict[str, Any]]:
+    """バイナリから (individual_weights, positional_freqs, meta) を復元する（キーはタプル/文字列のまま）"""
+    _, n_strings, n_weights, n_positions, _, crc = read_header(data)
+    at = section_offsets(data)
+    if len(data) < at["end"]:
+        raise ModelFormatError("ファイルが途中で切れています")
+    if verify and zlib.crc32(memoryview(data)[HEADER.size:at["end"]]) != crc:
+        raise ModelFormatError("チェックサムが一致しません")
+
+    offsets = struct.unpack_from(f"<{n_strings + 1}I", data, at["string_offsets"])
+    blob = bytes(data[at["string_blob"]:at["string_blob"] + offsets[-1]])
+    strings = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(n_strings)]
+
+    individual_weights: Dict[str, Dict[Any, float]] = {}
+    end = at["weights"] + WEIGHT_RECORD.size * n_weights
+    for cause, kind, a, b, score in WEIGHT_RECORD.iter_unpack(data[at["weights"]:end]):
+        key = (strings[a], strings[b]) if kind == KEY_PAIR else strings[a]
+        individual_weights.setdefault(strings[cause], {})[key] = score
+
+    positional_freqs: Dict[str, Dict[str, Dict[int, int]]] = {}
+    end = at["positions"] + POSITION_RECORD.size * n_positions
+    for cause, char, pos, count in POSITION_RECORD.iter_unpack(data[at["positions"]:end]):
+        positional_freqs.setdefault(strings[cause], {}).setdefault(strings[char], {})[pos] = count
+
+    meta = json.loads(bytes(data[at["meta"]:at["end"]]).decode('utf-8'))
+    return individual_weights, positional_freqs, meta
+
+def read_model(path: str, verify: bool = True) -> Tuple[Dict, Dict, Dict[str, Any]]:
+    with open(path, 'rb') as f:
+        return decode_model(f.read(), verify=verify)
+
+def model_hash(path: str) -> str:
+    """モデルの版を表すハッシュ（ヘッダを含むファイル全体のSHA-256）"""
+    import hashlib  # 読み込み専用の利用 (typo_runtime) では不要なため、ここで読み込む
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# -------------------------------------------------------------------
+# Webページ向け data.json への変換
+# -------------------------------------------------------------------
+
+def _web_key(key) -> Tuple[str, Tuple[str, ...]]:
+    # 連結後の文字列で並べる（連結すると同じになるタプルキーも、元のキーの順で後のものが残るよう順序を決めておく）
+    return ("".join(key), key) if isinstance(key, tuple) else (key, (key,))
+
+def to_web_json(individual_weights: Dict, positional_freqs: Dict, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    typo_ranking.js が読む data.json と同じ構造に変換する（タプルキーは連結文字列）
+    原因・キー・文字・位置は昇順に並べるので、分析直後の集計からでも model.bin からでも同じJSONになる
+    （分割エクスポートのシャード名・版はこの並びのハッシュ）
+    """
+    converted_weights = {}
+    for cause in sorted(individual_weights):
+        inner = sorted(individual_weights[cause].items(), key=lambda item: _web_key(item[0]))
+        converted_weights[cause] = {_web_key(key)[0]: score for key, score in inner}
+    converted_positions = {
+        cause: {
+            char: {str(pos): pos_counts[pos] for pos in sorted(pos_counts)}
+            for char, pos_counts in sorted(positional_freqs[cause].items())
+        }
+        for cause in sorted(positional_freqs)
+    }
+    return {"individual_weights": converted_weights, "positional_freqs": converted_positions, **meta}
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "to-json":
+        individual_weights, positional_freqs, meta = read_model(sys.argv[2])
+        with open(sys.argv[3], 'w', encoding='utf-8') as f:
+            json.dump(to_web_json(individual_weights, positional_freqs, meta), f, indent=4, ensure_ascii=False)
+        print(f"[INFO] {sys.argv[2]} を {sys.argv[3]} に変換しました。")
+    elif len(sys.argv) == 3 and sys.argv[1] == "info":
+        import hashlib
+        with open(sys.argv[2], 'rb') as f:
+            data = f.read()
+        version, n_strings, n_weights, n_positions, meta_len, crc = read_header(data)
+        print(f"形式バージョン: {version}, 文字列: {n_strings}, 重み: {n_weights}, 位置: {n_positions}, "
+              f"メタ情報: {meta_len}バイト, CRC32: {crc:08x}, SHA-256: {hashlib.sha256(data).hexdigest()}")
+    else:
+        print("使い方: python model_artifact.py to-json model.bin data.json")
+        print("        python model_artifact.py info model.bin")
+        sys.exit(1)
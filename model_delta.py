@@ -0,0 +1,186 @@
+import gzip
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from web_export import MANIFEST_FILE, load_sharded, minify, model_version, normalize, write_precompressed
+
+# ===================================================================
+# -------- モデルの差分更新 (web_model/delta/) ----------
+# ===================================================================
+#
+#   delta/index.json             : 最新版と、{旧版: 次の版へのパッチ} の一覧
+#   delta/<旧版>-<新版>.json(.gz) : 旧版のモデルに当てると新版になるパッチ
+#
+# 版はモデル (data.json と同じ構造) の内容ハッシュ (web_export.model_version。マニフェストの version と同じ)。前回の版を持っているクライアントは
+# パッチを順に当てるだけで最新版になり、手順が MAX_CHAIN を超える場合は全体を取り直す
+
+DELTA_DIR = "delta"
+DELTA_INDEX_FILE = "index.json"
+DELTA_FORMAT = 1
+MAX_PATCHES = 10  # 保存しておくパッチの数（=追従できる過去の版の数）
+MAX_CHAIN = 5     # これより多くのパッチが必要なクライアントは全体を取り直す
+
+
+class PatchError(ValueError):
+    pass
+
+
+def diff_models(old: Dict[str, Any], new: Dict[str, Any]) -> List[list]:
+    """辞書を再帰的に比較し、["set", パス, 値] / ["del", パス] の操作列を返す（辞書以外は丸ごと置き換え）"""
+    ops: List[list] = []
+
+    def walk(a, b, path):
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in a:
+                if key not in b:
+                    ops.append(["del", path + [key]])
+            for key, value in b.items():
+                if key not in a:
+                    ops.append(["set", path + [key], value])
+                else:
+                    walk(a[key], value, path + [key])
+        elif a != b or type(a) is not type(b):
+            ops.append(["set", path, b])
+
+    walk(old, new, [])
+    return ops
+
+def make_patch(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    old, new = normalize(old), normalize(new)
+    return {
+        "format": DELTA_FORMAT,
+        "base": model_version(old),
+        "target": model_version(new),
+        "ops": diff_models(old, new),
+    }
+
+def apply_patch(web_data: Dict[str, Any], patch: Dict[str, Any], verify: bool = True) -> Dict[str, Any]:
+    """パッチを当てた新しいモデルを返す（元のモデルは変更しない）"""
+    if patch.get("format") != DELTA_FORMAT:
+        raise PatchError(f"未対応のパッチ形式です: {patch.get('format')}")
+    if verify and model_version(web_data) != patch["base"]:
+        raise PatchError(f"パッチの適用元の版が一致しません (必要: {patch['base']})")
+
+    result = normalize(web_data)
+    for op in patch["ops"]:
+        path = op[1]
+        if not path:
+            result = op[2]
+            continue
+        parent = result
+        for key in path[:-1]:
+            parent = parent.setdefault(key, {})
+        if op[0] == "set":
+            parent[path[-1]] = op[2]
+        elif op[0] == "del":
+            parent.pop(path[-1], None)
+        else:
+            raise PatchError(f"不明な操作です: {op[0]}")
+
+    if verify and model_version(result) != patch["target"]:
+        raise PatchError("パッチ適用後の版が一致しません")
+    return result
+
+def load_delta_index(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, DELTA_DIR, DELTA_INDEX_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"format": DELTA_FORMAT, "latest": None, "max_chain": MAX_CHAIN, "patches": {}}
+
+def export_delta(new_web_data: Dict[str, Any], out_dir: str, previous: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    前回のモデルとの差分パッチを書き出し、delta/index.json を更新する
+    previous を省略した場合は、out_dir にある前回の分割エクスポートを前の版として使う
+    """
+    new_web_data = normalize(new_web_data)
+    if previous is None and os.path.exists(os.path.join(out_dir, MANIFEST_FILE)):
+        previous = load_sharded(out_dir)
+
+    delta_dir = os.path.join(out_dir, DELTA_DIR)
+    os.makedirs(delta_dir, exist_ok=True)
+
+    index = load_delta_index(out_dir)
+    target = model_version(new_web_data)
+    patch = None
+
+    if previous is not None and model_version(previous) != target:
+        patch = make_patch(previous, new_web_data)
+        data = minify(patch)
+        # 全体より大きくなるパッチは出さない（クライアントは全体を取り直す）
+        if len(data) < len(minify(new_web_data)):
+            name = f"{patch['base']}-{patch['target']}.json"
+            write_precompressed(delta_dir, name, data)
+            index["patches"][patch["base"]] = {"target": patch["target"], "file": name, "size": len(data)}
+        else:
+            patch = None
+
+    # 古いパッチは MAX_PATCHES 件まで残す（辞書の並び = 追加順）
+    while len(index["patches"]) > MAX_PATCHES:
+        oldest = next(iter(index["patches"]))
+        stale = index["patches"].pop(oldest)["file"]
+        for suffix in ("", ".gz", ".br"):
+            path = os.path.join(delta_dir, stale + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+    index["latest"] = target
+    index["max_chain"] = MAX_CHAIN
+    with open(os.path.join(delta_dir, DELTA_INDEX_FILE), 'w', encoding='utf-8') as f:
+        f.write(minify(index).decode('utf-8'))
+    return patch
+
+def resolve_chain(index: Dict[str, Any], version: str) -> Optional[List[Dict[str, Any]]]:
+    """version から最新版までに当てるパッチの一覧。追従できない場合は None（全体を取り直す）"""
+    chain = []
+    while version != index["latest"]:
+        entry = index["patches"].get(version)
+        if entry is None or len(chain) >= index.get("max_chain", MAX_CHAIN):
+            return None
+        chain.append(entry)
+        version = entry["target"]
+    return chain
+
+def update_local_model(model_path: str, out_dir: str) -> str:
+    """
+    手元の data.json 形式のモデルを、out_dir (web_model/) のパッチで最新版にする（APIクライアント用）
+    パッチで追従できない場合は分割エクスポートから全体を読み直す。戻り値は更新後の版
+    """
+    with open(model_path, 'r', encoding='utf-8') as f:
+        web_data = json.load(f)
+    index = load_delta_index(out_dir)
+
+    chain = resolve_chain(index, model_version(web_data)) if index["latest"] else None
+    if chain is None:
+        web_data = load_sharded(out_dir)
+    else:
+        for entry in chain:
+            with gzip.open(os.path.join(out_dir, DELTA_DIR, entry["file"] + ".gz"), 'rt', encoding='utf-8') as f:
+                web_data = apply_patch(web_data, json.load(f))
+
+    with open(model_path, 'w', encoding='utf-8') as f:
+        json.dump(web_data, f, indent=4, ensure_ascii=False)
+    return model_version(web_data)
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "diff":
+        with open(sys.argv[2], 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        with open(sys.argv[3], 'r', encoding='utf-8') as f:
+            new = json.load(f)
+        patch = make_patch(old, new)
+        with open(sys.argv[4], 'w', encoding='utf-8') as f:
+            f.write(minify(patch).decode('utf-8'))
+        print(f"[INFO] パッチを作成しました: {patch['base']} -> {patch['target']}（{len(patch['ops'])}件の変更）")
+    elif len(sys.argv) == 4 and sys.argv[1] == "update":
+        version = update_local_model(sys.argv[2], sys.argv[3])
+        print(f"[INFO] {sys.argv[2]} を版 {version} に更新しました。")
+    else:
+        print("使い方: python model_delta.py diff old.json new.json patch.json")
+        print("        python model_delta.py update data.json web_model")
+        sys.exit(1)
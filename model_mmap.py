@@ -0,0 +1,188 @@
+import bisect
+import functools
+import json
+import mmap
+import struct
+import sys
+import zlib
+from collections.abc import Mapping
+from typing import Any, Callable, List, Optional, Tuple
+
+from model_artifact import (HEADER, KEY_PAIR, KEY_STR, NO_STRING, POSITION_RECORD, WEIGHT_RECORD,
+                            ModelFormatError, read_header, section_offsets)
+
+# ===================================================================
+# -------- model.bin の共有メモリマップ読み込み ----------
+# ===================================================================
+#
+# model.bin のレコードは (原因, キー) の昇順に並んでいるため、ファイルを mmap したまま二分探索で引ける。
+# ページは OS のページキャッシュに1つだけ載り、全ワーカーで共有される（fork 前に開いても、各ワーカーで開いてもよい）。
+# 辞書を作らないので、ワーカーごとのメモリはほぼ一定で、起動時の復元処理もない（小さなメタ情報の JSON だけ読む）
+#
+#   model = MappedModel("model.bin")
+#   model.individual_weights.get("隣接キー", {}).get(("a", "s"), 0.0)   # dict と同じように引ける
+#   rt = TypoRuntime.mapped("model.bin")                                # TypoRuntime.load と同じ結果を返す
+
+Level = Tuple[Callable[[Any], Optional[tuple]], Callable[[tuple], Any], int]  # (キー -> 項目, 項目 -> キー, 項目数)
+
+
+class _Records:
+    """固定長レコードの列を、タプルのシーケンスとして見せる（bisect 用）"""
+
+    def __init__(self, buf, start: int, count: int, record: struct.Struct):
+        self._buf = buf
+        self._start = start
+        self._count = count
+        self._record = record
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> tuple:
+        return self._record.unpack_from(self._buf, self._start + i * self._record.size)
+
+
+class _StringTable:
+    """文字列表。書き出し時に昇順 (= UTF-8 のバイト順) で並べてあるので、二分探索で添字を引ける"""
+
+    def __init__(self, buf, offsets_at: int, blob_at: int, count: int):
+        self._buf = buf
+        self._offsets_at = offsets_at
+        self._blob_at = blob_at
+        self._count = count
+        # 同じ文字を何度も引くため、直近の検索結果だけ保持する（上限つきなのでメモリはほぼ一定）
+        self.find = functools.lru_cache(maxsize=4096)(self._find)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        start, end = struct.unpack_from("<II", self._buf, self._offsets_at + 4 * i)
+        return self._buf[self._blob_at + start:self._blob_at + end]
+
+    def text(self, i: int) -> str:
+        return self[i].decode('utf-8')
+
+    def _find(self, s: Any) -> Optional[int]:
+        if not isinstance(s, str):
+            return None
+        b = s.encode('utf-8')
+        i = bisect.bisect_left(self, b)
+        return i if i < self._count and self[i] == b else None
+
+
+class _View(Mapping):
+    """prefix で始まるレコード [lo, hi) を、次の項目をキーとする読み取り専用の辞書として見せる"""
+
+    def __init__(self, records: _Records, lo: int, hi: int, prefix: tuple, levels: List[Level]):
+        self._records = records
+        self._lo = lo
+        self._hi = hi
+        self._prefix = prefix
+        self._levels = levels
+        self._children = {}  # 原因・文字ごとの下位ビュー（件数は原因数 × 文字数程度で頭打ち）
+
+    def _next_prefix(self, target: tuple) -> tuple:
+        return target[:-1] + (target[-1] + 1,)
+
+    def __getitem__(self, key: Any) -> Any:
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        encode, _decode, _width = self._levels[0]
+        part = encode(key)
+        if part is None:
+            raise KeyError(key)
+        target = self._prefix + part
+        lo = bisect.bisect_left(self._records, target, self._lo, self._hi)
+        if lo >= self._hi:
+            raise KeyError(key)
+        record = self._records[lo]
+        if record[:len(target)] != target:
+            raise KeyError(key)
+        if len(self._levels) == 1:
+            return record[len(target)]
+        hi = bisect.bisect_left(self._records, self._next_prefix(target), lo, self._hi)
+        child = self._children[key] = _View(self._records, lo, hi, target, self._levels[1:])
+        return child
+
+    def __iter__(self):
+        _encode, decode, width = self._levels[0]
+        depth = len(self._prefix)
+        i = self._lo
+        while i < self._hi:
+            part = self._records[i][depth:depth + width]
+            yield decode(part)
+            i = bisect.bisect_left(self._records, self._next_prefix(self._prefix + part), i + 1, self._hi)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class MappedModel:
+    """model.bin を mmap し、individual_weights / positional_freqs を辞書と同じ形のビューで提供する"""
+
+    def __init__(self, path: str, verify: bool = False):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._mmap
+
+        _, n_strings, n_weights, n_positions, _, crc = read_header(data)
+        at = section_offsets(data)
+        if len(data) < at["end"]:
+            raise ModelFormatError("ファイルが途中で切れています")
+        # CRC はファイル全体を読むため既定では行わない（配布時に一度 read_model で確認しておく）
+        if verify:
+            with memoryview(data) as view:
+                if zlib.crc32(view[HEADER.size:at["end"]]) != crc:
+                    raise ModelFormatError("チェックサムが一致しません")
+
+        self.strings = _StringTable(data, at["string_offsets"], at["string_blob"], n_strings)
+        string_level: Level = (self._string_part, lambda part: self.strings.text(part[0]), 1)
+        weight_key_level: Level = (self._weight_key_part, self._weight_key, 3)
+        position_level: Level = (lambda pos: (pos,) if isinstance(pos, int) else None, lambda part: part[0], 1)
+
+        self.individual_weights = _View(_Records(data, at["weights"], n_weights, WEIGHT_RECORD),
+                                        0, n_weights, (), [string_level, weight_key_level])
+        self.positional_freqs = _View(_Records(data, at["positions"], n_positions, POSITION_RECORD),
+                                      0, n_positions, (), [string_level, string_level, position_level])
+        self.meta = json.loads(data[at["meta"]:at["end"]].decode('utf-8'))
+
+    def _string_part(self, s: Any) -> Optional[tuple]:
+        i = self.strings.find(s)
+        return None if i is None else (i,)
+
+    def _weight_key_part(self, key: Any) -> Optional[tuple]:
+        """重みのキー（文字列 or 2要素タプル）-> (キー種別, a, b)"""
+        if isinstance(key, tuple):
+            if len(key) != 2:
+                return None
+            a, b = self.strings.find(key[0]), self.strings.find(key[1])
+            return None if a is None or b is None else (KEY_PAIR, a, b)
+        a = self.strings.find(key)
+        return None if a is None else (KEY_STR, a, NO_STRING)
+
+    def _weight_key(self, part: tuple) -> Any:
+        kind, a, b = part
+        return (self.strings.text(a), self.strings.text(b)) if kind == KEY_PAIR else self.strings.text(a)
+
+    def close(self) -> None:
+        self._mmap.close()
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    # 確認用: mmap したビューが read_model の結果と一致するか
+    from model_artifact import read_model
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "model.bin"
+    model = MappedModel(path, verify=True)
+    individual_weights, positional_freqs, meta = read_model(path)
+
+    same_weights = {c: dict(v) for c, v in model.individual_weights.items()} == individual_weights
+    same_positions = {c: {ch: dict(p) for ch, p in v.items()} for c, v in model.positional_freqs.items()} == positional_freqs
+    if same_weights and same_positions and model.meta == meta:
+        print(f"[SUCCESS] {path} の mmap ビューは read_model の結果と一致しました。")
+    else:
+        print(f"[ERROR] {path} の mmap ビューが read_model の結果と一致しません。")
+        sys.exit(1)
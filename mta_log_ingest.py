@@ -0,0 +1,394 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from typo_runtime import damerau_levenshtein_distance
+
+# ===================================================================
+# -------- メールサーバーのログからのタイポ事例の取り込み (Postfix) ----------
+# ===================================================================
+#
+# 送信者が宛先不明・ドメイン不明で配送に失敗した直後 (PAIR_WINDOW 秒以内) に、近い宛先
+# (アドレスのDL距離が MAX_ADDRESS_DISTANCE 以下) へ送り直して配送できたものを
+#   失敗した宛先 = input_address / 送り直した宛先 = correct_address
+# の組として取り出し、入力 (filtered_address.csv) と同じ列で mta_events.csv に追記する。
+# typo_ranking.py は mta_events.csv があれば入力に加えるので、次回は抽出・分類の段階から実行し直される (stage_cache.py)。
+# 入力 (filtered_address.csv) には書き込まない（中断後の切り詰めで、他の方法で加えた行を消さないため）
+#   user_id : 送信者アドレスのハッシュ (48bit の整数)
+#   step_id : 送り直して配送できた時刻 (Unix 秒)
+#
+# ログは1行ずつ読み、途中の状態（キューIDと送信者の対応・未対応の失敗）は件数の上限つきで持つ。
+# 読んだ位置と途中の状態は、出力の長さと一緒に .mta_ingest_state.json に保存し、次回はその続きから読む。
+# 保存の前に中断して出力だけが伸びていた場合は、保存した長さまで切り詰めてから読み直す（同じ事例を二重に追記しない）。
+# ローテートされていた場合は、前回のファイル (mail.log.1 等、inode で探す) の残りを読んでから新しいファイルを読む
+#
+#   python mta_log_ingest.py /var/log/mail.log                        # 前回の続きから末尾まで取り込む
+#   python mta_log_ingest.py /var/log/mail.log --follow --classify    # 追記を待ち続け、取り込んだ事例の原因も表示する
+#   python mta_log_ingest.py mail.log --out events.csv --state mta_state.json
+
+INGEST_STATE_FILE = ".mta_ingest_state.json"
+EVENTS_FILE = "mta_events.csv"
+TYPO_INPUT_FILE = "filtered_address.csv"  # typo_ranking.py の入力（出力先にはできない）
+EVENT_COLUMNS = ["user_id", "step_id", "correct_address", "input_address", "edit_distance", "mismatched_part"]
+
+PAIR_WINDOW = 3600            # 失敗から送り直しまでの最大の間隔（秒）
+MAX_ADDRESS_DISTANCE = 4      # 失敗した宛先と送り直した宛先のDL距離の上限（抽出の閾値と同じ）
+MAX_QUEUE_IDS = 100_000       # 送信者を覚えておくキューIDの数
+MAX_PENDING_SENDERS = 100_000  # 未対応の失敗を覚えておく送信者の数
+MAX_PENDING_PER_SENDER = 20
+STATE_SAVE_LINES = 10_000     # --follow で状態を保存する間隔（行数）
+POLL_INTERVAL = 1.0           # --follow で追記を待つ間隔（秒）
+
+_TIMESTAMP = r"(?P<ts>\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d+)?(?:Z|[+-]\d\d:?\d\d)?|[A-Z][a-z]{2}\s+\d{1,2}\s+\d\d:\d\d:\d\d)"
+LINE_RE = re.compile(_TIMESTAMP + r"\s+\S+\s+postfix(?:-\w+)?/(?:[\w-]+/)*(?P<prog>[\w-]+)\[\d+\]:\s+(?P<msg>.*)$")
+QUEUED_RE = re.compile(r"^(?P<qid>[0-9A-Za-z]{6,}):\s+(?P<rest>.*)$")
+FROM_RE = re.compile(r"from=<(?P<addr>[^>]*)>")
+TO_RE = re.compile(r"to=<(?P<addr>[^>]*)>")
+STATUS_RE = re.compile(r"status=(?P<status>\w+)(?:\s+\((?P<reason>.*)\))?")
+REJECT_RE = re.compile(r"^NOQUEUE: reject: RCPT from \S+: (?P<reason>.*)$")
+
+# 宛先の誤りによる失敗（一時的な失敗 deferred でも、これらの理由なら宛先の誤りとみなす）
+UNKNOWN_RECIPIENT_RE = re.compile(r"User unknown|Recipient address rejected|Host or domain name not found|"
+                                  r"No such user|does not exist|Unknown user|mailbox unavailable|Domain not found", re.I)
+
+_MONTHS = {m: i for i, m in enumerate(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], start=1)}
+
+
+class TypoEvent(NamedTuple):
+    sender: str
+    time: float              # 送り直して配送できた時刻
+    correct_address: str
+    input_address: str
+
+    def row(self) -> List[Any]:
+        """入力 (filtered_address.csv) と同じ列"""
+        from typo_ranking import get_mismatched_part
+        return [sender_id(self.sender), int(self.time), self.correct_address, self.input_address,
+                damerau_levenshtein_distance(self.correct_address, self.input_address),
+                get_mismatched_part(self.correct_address, self.input_address)]
+
+
+def sender_id(sender: str) -> int:
+    """送信者アドレスから決まる整数の user_id（アドレスそのものは出力しない）"""
+    return int.from_bytes(hashlib.blake2b(sender.lower().encode('utf-8'), digest_size=6).digest(), 'big')
+
+# -------------------------------------------------------------------
+# ログの解析と、失敗・送り直しの対応付け
+# -------------------------------------------------------------------
+
+class PostfixPairer:
+    """Postfix のログ行を順に受け取り、宛先の誤り → 送り直しの組 (TypoEvent) を返す"""
+
+    def __init__(self, window: float = PAIR_WINDOW, max_distance: int = MAX_ADDRESS_DISTANCE, year: Optional[int] = None):
+        self.window = window
+        self.max_distance = max_distance
+        self.year = year or datetime.now().year
+        self._last_month = 0
+        self.senders: "OrderedDict[str, str]" = OrderedDict()                  # キューID -> 送信者
+        self.pending: "OrderedDict[str, Dict[str, float]]" = OrderedDict()     # 送信者 -> {失敗した宛先: 時刻}
+        self.stats = {"lines": 0, "failures": 0, "deliveries": 0, "events": 0}
+
+    def _parse_time(self, ts: str) -> float:
+        if ts[0].isdigit():
+            return datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp()
+        # 従来の syslog 形式には年が無いので、月が大きく戻ったら年が変わったとみなす
+        month_name, day, clock = ts.split()
+        month = _MONTHS[month_name]
+        if self._last_month and month < self._last_month - 6:
+            self.year += 1
+        self._last_month = month
+        return datetime.strptime(f"{self.year}-{month:02d}-{int(day):02d} {clock}", "%Y-%m-%d %H:%M:%S").timestamp()
+
+    def _remember_sender(self, qid: str, sender: str) -> None:
+        self.senders[qid] = sender
+        self.senders.move_to_end(qid)
+        while len(self.senders) > MAX_QUEUE_IDS:
+            self.senders.popitem(last=False)
+
+    def _add_failure(self, sender: str, address: str, when: float) -> None:
+        if not sender or '@' not in address:
+            return  # 不達通知 (from=<>) 自体の失敗は対象外
+        self.stats["failures"] += 1
+        failures = self.pending.setdefault(sender.lower(), {})
+        self.pending.move_to_end(sender.lower())
+        failures[address.lower()] = when
+        if len(failures) > MAX_PENDING_PER_SENDER:
+            del failures[min(failures, key=failures.get)]
+        while len(self.pending) > MAX_PENDING_SENDERS:
+            self.pending.popitem(last=False)
+
+    def _match_delivery(self, sender: str, address: str, when: float) -> Optional[TypoEvent]:
+        failures = self.pending.get(sender.lower())
+        if not failures:
+            return None
+        address = address.lower()
+        best = None
+        for failed, failed_at in list(failures.items()):
+            if when - failed_at > self.window:
+                del failures[failed]  # 期限切れ
+                continue
+            if failed == address or failed_at > when:
+                continue
+            distance = damerau_levenshtein_distance(failed, address)
+            # 最も近い宛先、同じ距離なら直前に失敗した宛先
+            if distance <= self.max_distance and (best is None or (distance, -failed_at) < best[:2]):
+                best = (distance, -failed_at, failed)
+        if not failures:
+            del self.pending[sender.lower()]
+        if best is None:
+            return None
+        del failures[best[2]]
+        self.stats["events"] += 1
+        return TypoEvent(sender.lower(), when, address, best[2])
+
+    def feed(self, line: str) -> Optional[TypoEvent]:
+        """1行を処理し、送り直しの組が見つかれば返す"""
+        self.stats["lines"] += 1
+        m = LINE_RE.match(line.rstrip('\r\n'))
+        if not m:
+            return None
+        msg = m.group("msg")
+
+        reject = REJECT_RE.match(msg)
+        if reject:
+            # 受付時に拒否された宛先（キューIDが無いので送信者は同じ行から取る）
+            sender, to = FROM_RE.search(msg), TO_RE.search(msg)
+            if sender and to and UNKNOWN_RECIPIENT_RE.search(reject.group("reason")):
+                self._add_failure(sender.group("addr"), to.group("addr"), self._parse_time(m.group("ts")))
+            return None
+
+        queued = QUEUED_RE.match(msg)
+        if not queued:
+            return None
+        qid, rest = queued.group("qid"), queued.group("rest")
+        if rest == "removed":
+            self.senders.pop(qid, None)
+            return None
+        if rest.startswith("from=<"):
+            self._remember_sender(qid, FROM_RE.match(rest).group("addr"))
+            return None
+
+        to, status = TO_RE.search(rest), STATUS_RE.search(rest)
+        if not (to and status):
+            return None
+        sender = self.senders.get(qid)
+        if sender is None:
+            return None
+        when = self._parse_time(m.group("ts"))
+        kind, reason = status.group("status"), status.group("reason") or ""
+        if kind == "bounced" or (kind == "deferred" and UNKNOWN_RECIPIENT_RE.search(reason)):
+            self._add_failure(sender, to.group("addr"), when)
+        elif kind == "sent":
+            self.stats["deliveries"] += 1
+            return self._match_delivery(sender, to.group("addr"), when)
+        return None
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"year": self.year, "last_month": self._last_month,
+                "senders": list(self.senders.items()), "pending": list(self.pending.items())}
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self.year = state.get("year", self.year)
+        self._last_month = state.get("last_month", 0)
+        self.senders = OrderedDict(state.get("senders", []))
+        self.pending = OrderedDict(state.get("pending", []))
+
+# -------------------------------------------------------------------
+# ログファイルの追跡（前回の位置から・ローテート対応）
+# -------------------------------------------------------------------
+
+def _rotated_candidates(path: str) -> List[str]:
+    """path のローテート後の名前の候補（mail.log.1 / mail.log-20261019 等。圧縮済みは除く）"""
+    directory, base = os.path.split(os.path.abspath(path))
+    names = [n for n in os.listdir(directory or ".")
+             if n.startswith(base) and n != base and not n.endswith((".gz", ".bz2", ".xz", ".zst"))]
+    return [os.path.join(directory, n) for n in sorted(names)]
+
+
+class LogFollower:
+    """ログを前回読んだ位置から1行ずつ返す。書き込み途中の最後の行は、改行が書かれるまで返さない"""
+
+    def __init__(self, path: str, inode: Optional[int] = None, offset: int = 0):
+        self.path = path
+        self.inode = inode
+        self.offset = offset
+        self.rotations = 0
+
+    def _read_from(self, path: str, offset: int) -> Iterator[Tuple[str, int]]:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                offset += len(raw)
+                yield raw.decode('utf-8', 'replace'), offset
+
+    def lines(self, follow: bool = False, poll: float = POLL_INTERVAL) -> Iterator[str]:
+        while True:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                st = None  # ローテート直後で新しいファイルがまだ無い
+
+            if st is not None and self.inode is not None and st.st_ino != self.inode:
+                # ローテートされた: 前回のファイルを inode で探して残りを読む
+                old = next((p for p in _rotated_candidates(self.path) if os.stat(p).st_ino == self.inode), None)
+                if old is not None:
+                    for line, self.offset in self._read_from(old, self.offset):
+                        yield line
+                self.inode, self.offset = st.st_ino, 0
+                self.rotations += 1
+            elif st is not None:
+                if self.inode is None:
+                    self.inode = st.st_ino
+                if st.st_size < self.offset:
+                    self.offset = 0  # 切り詰められた (copytruncate)
+
+            if st is not None:
+                for line, self.offset in self._read_from(self.path, self.offset):
+                    yield line
+            if not follow:
+                return
+            time.sleep(poll)
+
+# -------------------------------------------------------------------
+# 出力と状態の保存
+# -------------------------------------------------------------------
+
+class EventWriter:
+    """
+    事例を入力と同じ列で CSV に追記する（ファイルが無ければ見出しから書く）
+    saved_size は前回の状態を保存した時点のファイルの長さで、それより後ろ（状態に反映されていない書き込み）は切り詰める
+    """
+
+    def __init__(self, path: str = EVENTS_FILE, saved_size: Optional[int] = None):
+        self.path = path
+        self.written = 0
+        self.discarded = 0  # 切り詰めたバイト数
+        if saved_size is not None and os.path.exists(path) and os.path.getsize(path) > saved_size:
+            self.discarded = os.path.getsize(path) - saved_size
+            with open(path, 'r+b') as f:
+                f.truncate(saved_size)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file, lineterminator='\n')
+        if is_new:
+            self._writer.writerow(EVENT_COLUMNS)
+
+    def write(self, event: TypoEvent) -> None:
+        self._writer.writerow(event.row())
+        self.written += 1
+
+    def flush(self) -> int:
+        """ディスクに書き出し、ファイルの長さを返す"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return os.fstat(self._file.fileno()).st_size
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(path: str, follower: LogFollower, pairer: PostfixPairer, writer: EventWriter) -> None:
+    # 事例をディスクに書き出してから、位置と出力の長さを保存する。この間に中断した場合に出力だけが伸びるが、
+    # 次回は保存した長さまで切り詰めて同じ位置から読み直すので、同じ事例が二重に追記されることはない
+    state = {"log": os.path.abspath(follower.path), "inode": follower.inode, "offset": follower.offset,
+             "out": os.path.abspath(writer.path), "out_size": writer.flush(), "pairer": pairer.to_state()}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def ingest(log_path: str, out_path: str = EVENTS_FILE, state_path: str = INGEST_STATE_FILE, follow: bool = False,
+           on_event=None, **pairer_options: Any) -> PostfixPairer:
+    """log_path の前回の続きを読み、見つかった事例を out_path に追記する。on_event(事例) は追記のたびに呼ぶ"""
+    if os.path.basename(out_path) == TYPO_INPUT_FILE:
+        raise ValueError(f"{TYPO_INPUT_FILE} には書き込めません（事例は {EVENTS_FILE} に書き出すと typo_ranking.py の入力に加わります）")
+    state = load_state(state_path)
+    if state.get("log") != os.path.abspath(log_path):
+        state = {}  # 別のログの状態は使わない
+    follower = LogFollower(log_path, state.get("inode"), state.get("offset", 0))
+    pairer = PostfixPairer(**pairer_options)
+    if state.get("pairer"):
+        pairer.load_state(state["pairer"])
+
+    # 前回と同じ出力なら、状態を保存した後に書かれた部分（読み直す位置より後の事例）を捨てる
+    saved_size = state.get("out_size") if state.get("out") == os.path.abspath(out_path) else None
+    writer = EventWriter(out_path, saved_size)
+    if writer.discarded:
+        print(f"[WARN] 前回の中断で状態に反映されなかった {writer.discarded}バイトを {out_path} から取り除きました")
+    try:
+        for n, line in enumerate(follower.lines(follow=follow), start=1):
+            event = pairer.feed(line)
+            if event is not None:
+                writer.write(event)
+                if on_event is not None:
+                    on_event(event)
+            if follow and n % STATE_SAVE_LINES == 0:
+                save_state(state_path, follower, pairer, writer)
+    finally:
+        save_state(state_path, follower, pairer, writer)
+        writer.close()
+    return pairer
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Postfix のログから、宛先の誤り → 送り直しの組を取り込む")
+    parser.add_argument("log", help="メールログ（例: /var/log/mail.log）")
+    parser.add_argument("--out", default=EVENTS_FILE, help="追記する CSV（既定のファイルは typo_ranking.py が入力に加える）")
+    parser.add_argument("--state", default=INGEST_STATE_FILE)
+    parser.add_argument("--follow", action="store_true", help="末尾に達しても終了せず、追記・ローテートを追い続ける")
+    parser.add_argument("--classify", action="store_true", help="ドメイン部が異なる事例の原因分類を表示する")
+    parser.add_argument("--window", type=float, default=PAIR_WINDOW, help="失敗から送り直しまでの最大の間隔（秒）")
+    parser.add_argument("--max-distance", type=int, default=MAX_ADDRESS_DISTANCE)
+    args = parser.parse_args()
+
+    on_event = None
+    if args.classify:
+        import typo_ranking as tr
+        from model_artifact import read_model
+        from intermediate_io import extract_domain
+        confusions = None
+        try:
+            # 分類に使うTLDの取り違えは学習済みモデルの値を使う
+            confusions = tr.TldConfusionModel.from_json(read_model("model.bin")[2]["tld_confusions"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARN] model.bin を読み込めないため、TLDの取り違えは学習前の状態で分類します: {e}")
+
+        def on_event(event):
+            correct, typo = extract_domain(event.correct_address), extract_domain(event.input_address)
+            cause = tr.classify_edit_ops_japanese(correct, typo, confusions=confusions)["cause"] if correct != typo else "（ローカル部）"
+            print(f"[INFO] {event.input_address} → {event.correct_address}  {cause}")
+
+    start = time.perf_counter()
+    try:
+        pairer = ingest(args.log, args.out, args.state, args.follow, on_event, window=args.window, max_distance=args.max_distance)
+    except FileNotFoundError as e:
+        print(f"[ERROR] ログが見つかりません: {e.filename}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("[INFO] 中断しました（読んだ位置は保存済みです）")
+        sys.exit(0)
+    s = pairer.stats
+    print(f"[INFO] {s['lines']:,}行を {time.perf_counter() - start:.2f}秒で処理: 失敗 {s['failures']:,}件、"
+          f"配送 {s['deliveries']:,}件 → 事例 {s['events']:,}件を {args.out} に追記しました")
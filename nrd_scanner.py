@@ -0,0 +1,176 @@
+import argparse
+import csv
+import gzip
+import multiprocessing
+import sys
+import time
+from collections import Counter, deque
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from deletion_index import DeletionIndex
+from prerender_rankings import PRERENDER_DOMAINS_FILE, load_domain_list
+from typo_runtime import DEFAULT_MODEL_FILE, TypoRuntime
+
+# ===================================================================
+# -------- 新規登録ドメインの一覧と保有ドメインの照合 ----------
+# ===================================================================
+#
+# 新規登録ドメイン (NRD) の一覧ファイル（1行1ドメイン、数百万行）を先頭から順に読み、保有ドメインの
+# どれかとのDL距離が MAX_NRD_DISTANCE 以下のものを取り出す。保有ドメインは削除近傍索引 (deletion_index.py) に
+# 入れておくので、1行ごとに保有ドメイン全件と比べることはない。
+# 見つかった組には classify_edit_ops_japanese の原因と、モデルのスコア（モデルが生成する候補のみ）を付ける
+#
+# 行は CHUNK_LINES 行ずつワーカーに渡す。ワーカーは model.bin を mmap で共有し (TypoRuntime.mapped)、
+# 処理待ちのまとまりは workers の数倍までに抑えるので、一覧の大きさによらずメモリは一定
+#
+#   python nrd_scanner.py nrd-2026-10-19.txt                                  # prerender_domains.txt と照合
+#   python nrd_scanner.py nrd-*.txt.gz --domains portfolio.txt --workers 8 --out hits.csv
+
+MAX_NRD_DISTANCE = 2
+CHUNK_LINES = 20_000
+NRD_HITS_FILE = "nrd_hits.csv"
+HIT_COLUMNS = ["domain", "protected", "distance", "cause", "score", "source", "line"]
+
+
+class Hit(NamedTuple):
+    domain: str             # 一覧にあったドメイン
+    protected: str          # 近い保有ドメイン
+    distance: int
+    cause: str              # classify_edit_ops_japanese の原因
+    score: Optional[float]  # モデルのスコア（モデルが生成しない候補は None）
+    source: str
+    line: int
+
+
+def normalize_feed_line(line: str) -> str:
+    """一覧の1行からドメインを取り出す（'example.com,2026-10-19' 等の追加の列・末尾のドットは除く）"""
+    field = line.split('#', 1)[0].strip().replace('\t', ',').replace(' ', ',').split(',', 1)[0]
+    return field.rstrip('.').lower()
+
+def open_feed(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+def iter_chunks(paths: Iterable[str], chunk_lines: int = CHUNK_LINES) -> Iterator[Tuple[str, int, List[str]]]:
+    """(ファイル, 先頭の行番号, 行のリスト) を chunk_lines 行ずつ返す"""
+    for path in paths:
+        with open_feed(path) as f:
+            chunk, start = [], 1
+            for n, line in enumerate(f, start=1):
+                chunk.append(line)
+                if len(chunk) >= chunk_lines:
+                    yield path, start, chunk
+                    chunk, start = [], n + 1
+            if chunk:
+                yield path, start, chunk
+
+# -------------------------------------------------------------------
+# 照合（ワーカー）
+# -------------------------------------------------------------------
+
+class Matcher:
+    """保有ドメインの索引と、原因分類・スコア計算"""
+
+    def __init__(self, portfolio: List[str], max_distance: int = MAX_NRD_DISTANCE, model_path: str = DEFAULT_MODEL_FILE,
+                 runtime: Optional[TypoRuntime] = None):
+        self.index = DeletionIndex(portfolio, max_distance)
+        self.runtime = runtime or TypoRuntime.mapped(model_path)
+        from typo_ranking import classify_edit_ops_japanese  # 原因分類だけに使う（import に時間がかかるので照合の準備時に読む）
+        self._classify = classify_edit_ops_japanese
+
+    def match(self, source: str, start: int, lines: List[str]) -> List[Hit]:
+        hits = []
+        index, seen = self.index, set()
+        for n, line in enumerate(lines, start=start):
+            domain = normalize_feed_line(line)
+            if not domain or domain in index or domain in seen or not index.in_range(domain):
+                continue
+            seen.add(domain)  # 同じまとまりの中の重複行は1回だけ数える
+            for protected, distance in index.search(domain):
+                scored = self.runtime.score_candidate(protected, domain)
+                # 分類の TLDミス もモデルの取り違えに揃える
+                cause = self._classify(protected, domain, confusions=self.runtime.confusions)["cause"]
+                hits.append(Hit(domain, protected, distance, cause,
+                                scored["score"] if scored else None, source, n))
+        return hits
+
+
+_WORKER_MATCHER: Optional[Matcher] = None
+
+def _init_worker(portfolio: List[str], max_distance: int, model_path: str) -> None:
+    global _WORKER_MATCHER
+    _WORKER_MATCHER = Matcher(portfolio, max_distance, model_path)
+
+def _match_worker(args: Tuple[str, int, List[str]]) -> Tuple[int, List[Hit]]:
+    source, start, lines = args
+    return len(lines), _WORKER_MATCHER.match(source, start, lines)
+
+def scan(paths: List[str], portfolio: List[str], max_distance: int = MAX_NRD_DISTANCE, model_path: str = DEFAULT_MODEL_FILE,
+         workers: int = 1, chunk_lines: int = CHUNK_LINES) -> Iterator[Tuple[int, List[Hit]]]:
+    """一覧を順に照合し、まとまりごとに (行数, 見つかった組) を一覧の順に返す"""
+    chunks = iter_chunks(paths, chunk_lines)
+    if workers <= 1:
+        matcher = Matcher(portfolio, max_distance, model_path)
+        for source, start, lines in chunks:
+            yield len(lines), matcher.match(source, start, lines)
+        return
+
+    with multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker,
+                                                   initargs=(portfolio, max_distance, model_path)) as pool:
+        # Pool.imap は入力を先読みし続けるので、処理待ちを workers * 2 までにして一覧全体を抱えないようにする
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_match_worker, (chunk,)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def write_hits(hits: Iterable[Hit], writer) -> None:
+    for h in hits:
+        writer.writerow([h.domain, h.protected, h.distance, h.cause, "" if h.score is None else f"{h.score:.7f}", h.source, h.line])
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="新規登録ドメインの一覧から、保有ドメインに近いものを探す")
+    parser.add_argument("feeds", nargs="+", help="新規登録ドメインの一覧（1行1ドメイン。.gz も可）")
+    parser.add_argument("--domains", default=PRERENDER_DOMAINS_FILE, help="保有ドメインの一覧（1行1ドメイン）")
+    parser.add_argument("--max-distance", type=int, default=MAX_NRD_DISTANCE)
+    parser.add_argument("--model", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--workers", type=int, default=max(1, (multiprocessing.cpu_count() or 1) - 1))
+    parser.add_argument("--out", default=NRD_HITS_FILE)
+    parser.add_argument("--top", type=int, default=20, help="表示する件数（スコアの高い順）")
+    args = parser.parse_args()
+
+    try:
+        portfolio = load_domain_list(args.domains)
+    except OSError as e:
+        print(f"[ERROR] 保有ドメインの一覧を読み込めませんでした: {e}")
+        sys.exit(1)
+    print(f"[INFO] 保有ドメイン {len(portfolio)}件と照合します（DL距離 {args.max_distance} 以下、{args.workers}プロセス）")
+
+    start = time.perf_counter()
+    total_lines, found = 0, []
+    try:
+        with open(args.out, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(HIT_COLUMNS)
+            for lines, hits in scan(args.feeds, portfolio, args.max_distance, args.model, args.workers):
+                total_lines += lines
+                write_hits(hits, writer)
+                found.extend(hits)
+    except OSError as e:
+        print(f"[ERROR] 一覧を読み込めませんでした: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    print(f"[INFO] {total_lines:,}行を {elapsed:.1f}秒で照合 ({total_lines / elapsed if elapsed else 0:,.0f}行/秒): {len(found):,}件 → {args.out}")
+    found.sort(key=lambda h: (h.score is None, -(h.score or 0.0), h.distance, h.domain))
+    for h in found[:args.top]:
+        score = "-" if h.score is None else f"{h.score:.7f}"
+        print(f"  {h.domain:<32} ← {h.protected:<28} 距離{h.distance}  {score:>10}  {h.cause}")
+    per_domain = Counter(h.protected for h in found)
+    if per_domain:
+        print(f"[INFO] 保有ドメイン別: {', '.join(f'{d} {n}件' for d, n in per_domain.most_common(10))}")
@@ -0,0 +1,17 @@
+// 事前計算用: typo_ranking.js の TypoRanker で一覧のドメインのランキングを生成する (prerender_rankings.py から実行する)
+//   node prerender_rankings.js <typo_ranking.js>  < {"data": data.json の内容, "domains": [...], "top_n": 件数}
+// 標準出力に {ドメイン: [ランキング結果, ...]} を JSON で書き出す。
+// ページが一覧に無いドメインで使う TypoRanker と同じ結果にするため、Python 側では生成しない
+const fs = require('fs');
+
+const [script] = process.argv.slice(2);
+const src = fs.readFileSync(script, 'utf8');
+const { TypoRanker } = new Function(src + '; return { TypoRanker };')();
+const { data, domains, top_n } = JSON.parse(fs.readFileSync(0, 'utf8'));
+const ranker = new TypoRanker(data);
+
+const rankings = {};
+for (const domain of domains) {
+    rankings[domain] = ranker.typoGeneratorRanked(domain, top_n);
+}
+process.stdout.write(JSON.stringify(rankings));
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+from web_export import minify, write_precompressed
+
+# ===================================================================
+# -------- 登録済みドメインのランキング事前計算 (rankings/) ----------
+# ===================================================================
+#
+#   rankings/index.json           : シャード数・件数と、シャード番号ごとのファイル名
+#   rankings/r-<hash>.json(.gz)   : {ドメイン: [ランキング結果, ...]} をドメインのハッシュで分けたもの
+#
+# ページは入力ドメインのハッシュからシャードを1つだけ取得し、載っていればモデルを読まずに表示する。
+# 載っていないドメインは従来どおりブラウザ側 (TypoRanker) で生成する。
+# 一覧に載っているかどうかで結果が変わらないよう、事前計算もページと同じ TypoRanker で行う (node で prerender_rankings.js を実行する)
+
+PRERENDER_DOMAINS_FILE = "prerender_domains.txt"
+PRERENDER_DIR = "rankings"
+PRERENDER_INDEX_FILE = "index.json"
+PRERENDER_FORMAT = 1
+PRERENDER_SHARDS = 16
+PRERENDER_TOP_N = 20  # index.html の表示件数と合わせる
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+RANKER_SCRIPT = os.path.join(_HERE, "typo_ranking.js")
+NODE_SCRIPT = os.path.join(_HERE, "prerender_rankings.js")
+
+_FULLWIDTH = {c: c - 0xFEE0 for c in [*range(ord('０'), ord('９') + 1), *range(ord('ａ'), ord('ｚ') + 1)]}
+
+def sanitize_domain(text: str) -> str:
+    """typo_ranking.js の sanitizeInput と同じ正規化（小文字化・全角英数の半角化・使用可能文字以外の削除）"""
+    domain = text.lower().translate(_FULLWIDTH)
+    return re.sub(r'[^a-z0-9.-]', '', domain)
+
+def shard_of(domain: str, shard_count: int = PRERENDER_SHARDS) -> int:
+    """FNV-1a (32bit) によるシャード番号。typo_ranking.js の prerenderShardOf と同じ値になる"""
+    h = 0x811C9DC5
+    for b in domain.encode('utf-8'):
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h % shard_count
+
+def load_domain_list(path: str = PRERENDER_DOMAINS_FILE) -> List[str]:
+    """1行1ドメイン（# 以降はコメント）。重複は除き、記載順を保つ"""
+    domains = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            domain = sanitize_domain(line.split('#', 1)[0].strip())
+            if len(domain) >= 3 and domain not in domains:
+                domains.append(domain)
+    return domains
+
+def rank_with_typo_ranker(domains: Iterable[str], web_data: Dict[str, Any], top_n: int = PRERENDER_TOP_N) -> Dict[str, List[Dict[str, Any]]]:
+    """web_data (data.json の内容) を読んだ TypoRanker (typo_ranking.js) による {ドメイン: ランキング結果（費用付き）}"""
+    node = shutil.which("node")
+    if node is None:
+        raise RuntimeError("node が見つかりません（事前計算はページと同じ typo_ranking.js で行います）")
+    request = json.dumps({"data": web_data, "domains": list(domains), "top_n": top_n}, ensure_ascii=False)
+    proc = subprocess.run([node, NODE_SCRIPT, RANKER_SCRIPT], input=request, capture_output=True, text=True, encoding='utf-8')
+    if proc.returncode != 0:
+        raise RuntimeError(f"TypoRanker を実行できませんでした: {proc.stderr.strip()}")
+    return json.loads(proc.stdout)
+
+def export_rankings(rankings: Dict[str, List[Dict[str, Any]]], out_dir: str = PRERENDER_DIR, shard_count: int = PRERENDER_SHARDS,
+                    model_version: Optional[str] = None) -> Dict[str, Any]:
+    """rankings ({ドメイン: ランキング結果}、rank_with_typo_ranker の結果) をハッシュで分けたシャードに書き出す"""
+    os.makedirs(out_dir, exist_ok=True)
+
+    shards: List[Dict[str, List[Dict[str, Any]]]] = [{} for _ in range(shard_count)]
+    for domain, results in rankings.items():
+        shards[shard_of(domain, shard_count)][domain] = results
+
+    names: List[Optional[str]] = []
+    for table in shards:
+        if not table:
+            names.append(None)
+            continue
+        data = minify(dict(sorted(table.items())))
+        name = f"r-{hashlib.sha256(data).hexdigest()[:16]}.json"
+        write_precompressed(out_dir, name, data)
+        names.append(name)
+
+    index = {
+        "format": PRERENDER_FORMAT,
+        "model": model_version,
+        "shard_count": shard_count,
+        "domains": sum(len(t) for t in shards),
+        "shards": names,
+    }
+    write_precompressed(out_dir, PRERENDER_INDEX_FILE, minify(index))
+
+    # 今回参照されなかった古いシャードを削除する
+    keep = set(n for n in names if n)
+    for fname in os.listdir(out_dir):
+        base = fname[:-3] if fname.endswith((".gz", ".br")) else fname
+        if base.startswith("r-") and base not in keep:
+            os.remove(os.path.join(out_dir, fname))
+
+    return index
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    # 学習済みの model.bin から生成する（パイプライン全体は再実行しない）
+    from model_artifact import read_model, to_web_json
+    from model_delta import model_version
+    from typo_runtime import DEFAULT_MODEL_FILE
+
+    domains_file = sys.argv[1] if len(sys.argv) > 1 else PRERENDER_DOMAINS_FILE
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else PRERENDER_DIR
+    model_file = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_MODEL_FILE
+
+    try:
+        domains = load_domain_list(domains_file)
+        web_data = to_web_json(*read_model(model_file))
+        rankings = rank_with_typo_ranker(domains, web_data)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"[ERROR] 事前計算の入力を読み込めませんでした: {e}")
+        sys.exit(1)
+
+    index = export_rankings(rankings, out_dir, model_version=model_version(web_data))
+    print(f"[INFO] {index['domains']}件のドメインのランキングを {out_dir}/ に書き出しました（シャード {sum(1 for n in index['shards'] if n)}個）")
@@ -0,0 +1,140 @@
+import functools
+import json
+import sys
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+# ===================================================================
+# -------- 段階ごとの計測 (--profile) ----------
+# ===================================================================
+#
+# 段階（抽出・分類・分析・生成など）ごとに、経過時間・CPU時間・呼び出し回数・件数と、
+# 段階内の区間（生成 → スコア計算 → 並べ替え 等）の時間を集計し、JSONで書き出す。
+# 無効のとき (既定) は stage / phase が何もしない共通のコンテキストを返すだけなので、ほぼ負荷はかからない
+#
+#   PROFILER.enable()
+#   @profiled("append_typo_causes")            # 関数全体を1つの段階として計測
+#   with PROFILER.phase("score"): ...           # 実行中の段階の中の区間
+#   PROFILER.count("rows", len(df))             # 実行中の段階の件数
+#   PROFILER.write_json("profile.json")
+
+PROFILE_FORMAT = 1
+
+_NULL_CONTEXT = nullcontext()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """このプロセスのピークメモリ使用量 (MB)。resource が無い環境 (Windows) では None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # macOS はバイト、Linux は KB
+
+
+class _Timer:
+    """経過時間と CPU 時間を entry に足し込むコンテキスト"""
+
+    def __init__(self, profiler: "Profiler", entry: Dict[str, Any], is_stage: bool):
+        self._profiler = profiler
+        self._entry = entry
+        self._is_stage = is_stage
+
+    def __enter__(self):
+        if self._is_stage:
+            self._rss_before = peak_rss_mb()
+            self._profiler._stack.append(self._entry)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        self._entry["calls"] += 1
+        self._entry["wall_s"] += time.perf_counter() - self._wall
+        self._entry["cpu_s"] += time.process_time() - self._cpu
+        if self._is_stage:
+            self._profiler._stack.pop()
+            rss = peak_rss_mb()
+            if rss is not None:
+                # ピークはプロセス全体の最大値なので、この段階で増えた分も記録する
+                self._entry["peak_rss_mb"] = max(self._entry.get("peak_rss_mb", 0.0), rss)
+                self._entry["peak_rss_growth_mb"] = max(self._entry.get("peak_rss_growth_mb", 0.0), rss - self._rss_before)
+        return False
+
+
+class Profiler:
+    """段階ごとの時間・件数を集計する（無効のときは何もしない）"""
+
+    def __init__(self):
+        self.enabled = False
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._stack: List[Dict[str, Any]] = []
+        self._started = time.perf_counter()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self._started = time.perf_counter()
+
+    def reset(self) -> None:
+        self._stages.clear()
+        self._stack.clear()
+        self._started = time.perf_counter()
+
+    def stage(self, name: str):
+        """段階の計測（入れ子にした場合、外側の時間は内側を含む）"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        entry = self._stages.get(name)
+        if entry is None:
+            entry = self._stages[name] = {"name": name, "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "counters": {}, "phases": {}}
+        return _Timer(self, entry, is_stage=True)
+
+    def phase(self, name: str):
+        """実行中の段階の中の区間の計測（段階の外では何もしない）"""
+        if not self.enabled or not self._stack:
+            return _NULL_CONTEXT
+        phases = self._stack[-1]["phases"]
+        entry = phases.get(name)
+        if entry is None:
+            entry = phases[name] = {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0}
+        return _Timer(self, entry, is_stage=False)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """実行中の段階の件数に n を足す"""
+        if not self.enabled or not self._stack:
+            return
+        counters = self._stack[-1]["counters"]
+        counters[name] = counters.get(name, 0) + n
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "format": PROFILE_FORMAT,
+            "wall_s": time.perf_counter() - self._started,
+            "cpu_s": time.process_time(),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": list(self._stages.values()),
+        }
+
+    def write_json(self, path: str, **extra: Any) -> None:
+        """計測結果を書き出す（extra は report にそのまま追加する）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({**self.report(), **extra}, f, indent=2, ensure_ascii=False)
+        print(f"[INFO] 計測結果を書き出しました: {path}")
+
+
+PROFILER = Profiler()
+
+
+def profiled(name: str) -> Callable:
+    """関数の呼び出し全体を段階 name として計測するデコレータ"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
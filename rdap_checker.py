@@ -0,0 +1,495 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# ===================================================================
+# -------- タイポ候補の登録状況 (RDAP) ----------
+# ===================================================================
+#
+# 候補ドメインごとにレジストリの RDAP サーバーへ問い合わせ、登録済み / 未登録 と、
+# 前回の確認から登録者が変わったか (registrant_changed) を調べる。
+#   - 問い合わせ先は IANA の RDAP ブートストラップ (rdap_bootstrap.json、無ければ組み込みの一覧) で決める
+#   - レジストリごとに HTTP の接続を使い回し、接続数 (= 同時に問い合わせる数) を per_registry までに抑える
+#   - 429 (Retry-After を優先) / 5xx / 接続エラーは間隔を倍にしながら再試行する
+#   - 応答は .rdap_cache/ に保存し、期限内は問い合わせない（期限切れの記録は登録者の比較に使う）
+# MockRdapServer はローカルで動く応答用サーバーで、確認・試験に使う
+#
+#   python rdap_checker.py treasurefactory.co.jp --top 30
+#   python rdap_checker.py treasurefactory.com --mock registered.json   # {ドメイン: {"registrant": ..., "registration": ...}}
+#   python rdap_checker.py --update-bootstrap                           # IANA からブートストラップを取得し直す
+#
+#   results = RdapChecker().check_many(domains)
+#   annotate_rankings(rows, results)   # 順位表の各行に "rdap" を付ける
+
+RDAP_BOOTSTRAP_URL = "https://data.iana.org/rdap/dns.json"
+BOOTSTRAP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rdap_bootstrap.json")
+RDAP_CACHE_DIR = ".rdap_cache"
+RDAP_CACHE_TTL = 24 * 3600       # 登録済みの応答を使い回す時間（秒）
+RDAP_NEGATIVE_TTL = 3600         # 未登録 (404) の応答を使い回す時間（秒）
+RDAP_PER_REGISTRY = 4            # レジストリごとの接続数（同時に問い合わせる数）
+RDAP_WORKERS = 32                # 全体の同時問い合わせ数
+RDAP_TIMEOUT = 10.0
+RDAP_RETRIES = 3
+RDAP_BACKOFF = 1.0               # 再試行までの待ち時間（秒、再試行ごとに倍）
+RDAP_MAX_RETRY_AFTER = 60.0
+
+# ブートストラップが無い場合の最低限（.jp は RDAP を提供していない）
+BUILTIN_RDAP_SERVICES = {
+    "com": "https://rdap.verisign.com/com/v1/",
+    "net": "https://rdap.verisign.com/net/v1/",
+    "org": "https://rdap.publicinterestregistry.org/rdap/",
+    "info": "https://rdap.identitydigital.services/rdap/",
+    "xyz": "https://rdap.centralnic.com/xyz/",
+    "shop": "https://rdap.gmoregistry.net/rdap/",
+    "app": "https://pubapi.registry.google/rdap/",
+    "dev": "https://pubapi.registry.google/rdap/",
+}
+
+STATUS_REGISTERED = "登録済み"
+STATUS_AVAILABLE = "未登録"
+STATUS_UNSUPPORTED = "RDAP非対応"
+STATUS_ERROR = "エラー"
+
+
+class RdapError(Exception):
+    """再試行しても応答が得られなかった"""
+
+# -------------------------------------------------------------------
+# ブートストラップ（TLD -> RDAPサーバー）
+# -------------------------------------------------------------------
+
+def parse_bootstrap(data: Dict[str, Any]) -> Dict[str, str]:
+    """IANA の dns.json 形式 {"services": [[[TLD, ...], [URL, ...]], ...]} -> {TLD: URL}（https を優先）"""
+    services = {}
+    for tlds, urls in data.get("services", []):
+        urls = sorted(urls, key=lambda u: not u.startswith("https://"))
+        if not urls:
+            continue
+        base = urls[0] if urls[0].endswith('/') else urls[0] + '/'
+        for tld in tlds:
+            services[tld.lower()] = base
+    return services
+
+def load_bootstrap(path: str = BOOTSTRAP_FILE) -> Dict[str, str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return parse_bootstrap(json.load(f))
+    except FileNotFoundError:
+        return dict(BUILTIN_RDAP_SERVICES)
+
+def update_bootstrap(url: str = RDAP_BOOTSTRAP_URL, path: str = BOOTSTRAP_FILE, timeout: float = RDAP_TIMEOUT) -> Dict[str, str]:
+    import urllib.request
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        data = json.loads(response.read().decode('utf-8'))
+    services = parse_bootstrap(data)  # 形式が壊れていれば置き換えない
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return services
+
+def service_for(domain: str, services: Dict[str, str]) -> Optional[str]:
+    """domain の最長一致するサフィックスの RDAP ベースURL（非対応なら None）"""
+    labels = domain.lower().rstrip('.').split('.')
+    for i in range(1, len(labels)):
+        base = services.get('.'.join(labels[i:]))
+        if base:
+            return base
+    return None
+
+# -------------------------------------------------------------------
+# HTTP 接続の使い回し
+# -------------------------------------------------------------------
+
+class HttpPool:
+    """1つのホストへの持続的な HTTP 接続の組。同時に使える接続は size 本まで（空くまで待つ）"""
+
+    def __init__(self, base_url: str, size: int = RDAP_PER_REGISTRY, timeout: float = RDAP_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle: "queue.LifoQueue[Optional[http.client.HTTPConnection]]" = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)  # 空き枠（接続は使うときに作る）
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self.connections_opened += 1
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def get(self, path: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """(ステータス, ヘッダー, 本文)。使い回した接続がサーバー側で閉じられていた場合は1回だけ張り直す"""
+        conn = self._idle.get()
+        try:
+            for attempt in range(2):
+                reused = conn is not None
+                if conn is None:
+                    conn = self._connect()
+                try:
+                    conn.request("GET", path, headers={"Accept": "application/rdap+json", **(headers or {})})
+                    response = conn.getresponse()
+                    body = response.read()
+                    if response.will_close:
+                        conn.close()
+                        conn = None
+                    return response.status, {k.lower(): v for k, v in response.getheaders()}, body
+                except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError):
+                    conn.close()
+                    conn = None
+                    if not reused or attempt:
+                        raise
+                except Exception:
+                    conn.close()
+                    conn = None
+                    raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                conn.close()
+
+# -------------------------------------------------------------------
+# 応答のキャッシュ（期限付き、登録者の比較用に前回の記録を残す）
+# -------------------------------------------------------------------
+
+class RdapCache:
+    """.rdap_cache/<ドメイン>.json に最後の確認結果を保存する"""
+
+    def __init__(self, directory: str = RDAP_CACHE_DIR, ttl: float = RDAP_CACHE_TTL, negative_ttl: float = RDAP_NEGATIVE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def _path(self, domain: str) -> str:
+        return os.path.join(self.directory, f"{domain}.json")
+
+    def load(self, domain: str) -> Optional[Dict[str, Any]]:
+        """保存済みの結果（期限切れも含む。"expired" で区別する）。読めない・壊れた記録は無いものとして扱う"""
+        try:
+            with open(self._path(domain), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            ttl = self.ttl if entry["result"]["registered"] else self.negative_ttl
+            entry["expired"] = time.time() - entry["fetched"] >= ttl
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry
+
+    def save(self, domain: str, result: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(domain) + f".{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"fetched": time.time(), "result": result}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(domain))
+
+# -------------------------------------------------------------------
+# 問い合わせ
+# -------------------------------------------------------------------
+
+def _vcard_value(entity: Dict[str, Any], field: str) -> Optional[str]:
+    vcard = entity.get("vcardArray")
+    if not (isinstance(vcard, list) and len(vcard) == 2):
+        return None
+    for item in vcard[1]:
+        if len(item) >= 4 and item[0] == field and isinstance(item[3], str) and item[3]:
+            return item[3]
+    return None
+
+def summarize_domain(data: Dict[str, Any]) -> Dict[str, Any]:
+    """RDAP の domain オブジェクトから、登録者・レジストラ・主なイベントの日時を取り出す"""
+    registrant = registrar = None
+    for entity in data.get("entities", []):
+        roles = entity.get("roles", [])
+        if "registrant" in roles and registrant is None:
+            registrant = _vcard_value(entity, "org") or _vcard_value(entity, "fn") or entity.get("handle")
+        if "registrar" in roles and registrar is None:
+            registrar = _vcard_value(entity, "fn") or entity.get("handle")
+    events = {e.get("eventAction"): e.get("eventDate") for e in data.get("events", []) if e.get("eventAction")}
+    return {
+        "registrant": registrant,
+        "registrar": registrar,
+        "registration": events.get("registration"),
+        "expiration": events.get("expiration"),
+        "last_changed": events.get("last changed"),
+    }
+
+def registrant_changed(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> bool:
+    """前回も登録済みで、登録者（非公開の場合は登録日 = 取り直し）が変わったか"""
+    if not previous or not previous.get("registered") or not current.get("registered"):
+        return False
+    if previous.get("registrant") and current.get("registrant") and previous["registrant"] != current["registrant"]:
+        return True
+    return bool(previous.get("registration") and current.get("registration") and previous["registration"] != current["registration"])
+
+
+class RdapChecker:
+    """候補ドメインの登録状況を、レジストリごとの接続数を抑えて並行して調べる"""
+
+    def __init__(self, services: Optional[Dict[str, str]] = None, cache: Optional[RdapCache] = None,
+                 per_registry: int = RDAP_PER_REGISTRY, workers: int = RDAP_WORKERS, timeout: float = RDAP_TIMEOUT,
+                 retries: int = RDAP_RETRIES, backoff: float = RDAP_BACKOFF):
+        self.services = services if services is not None else load_bootstrap()
+        self.cache = cache if cache is not None else RdapCache()
+        self.per_registry = per_registry
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {"requests": 0, "cache_hits": 0, "retries": 0, "failures": 0}
+        self._pools: Dict[str, HttpPool] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, base: str) -> HttpPool:
+        key = urlsplit(base).netloc
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = HttpPool(base, self.per_registry, self.timeout)
+            return self._pools[key]
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _fetch(self, base: str, domain: str) -> Tuple[int, bytes]:
+        pool = self._pool(base)
+        path = urlsplit(base).path.rstrip('/') + f"/domain/{domain}"
+        delay = self.backoff
+        last_error = ""
+        for attempt in range(self.retries + 1):
+            wait = delay * (1 + random.random() * 0.5)  # 同時に再試行が集中しないよう少しずらす
+            try:
+                self._count("requests")
+                status, headers, body = pool.get(path)
+                if status in (200, 404):
+                    return status, body
+                last_error = f"HTTP {status}"
+                if status == 429 and headers.get("retry-after", "").isdigit():
+                    wait = min(float(headers["retry-after"]), RDAP_MAX_RETRY_AFTER)
+                elif status < 500 and status != 429:
+                    break  # 400 等は再試行しても変わらない
+            except (OSError, http.client.HTTPException) as e:
+                last_error = f"{type(e).__name__}: {e}"
+            if attempt < self.retries:
+                self._count("retries")
+                time.sleep(wait)
+                delay *= 2
+        self._count("failures")
+        raise RdapError(f"{domain}: {last_error}")
+
+    def check(self, domain: str) -> Dict[str, Any]:
+        """domain の登録状況（status / registered / available / registrant_changed と登録情報）"""
+        domain = domain.lower().rstrip('.')
+        base = service_for(domain, self.services)
+        if base is None:
+            return {"status": STATUS_UNSUPPORTED, "registered": None, "available": None, "registrant_changed": False}
+
+        entry = self.cache.load(domain)
+        if entry is not None and not entry["expired"]:
+            self._count("cache_hits")
+            return {**entry["result"], "cached": True}
+        previous = entry["result"] if entry else None
+
+        try:
+            status, body = self._fetch(base, domain)
+        except RdapError as e:
+            return {"status": STATUS_ERROR, "registered": None, "available": None, "registrant_changed": False, "error": str(e)}
+
+        if status == 404:
+            result = {"status": STATUS_AVAILABLE, "registered": False, "available": True, "registrant_changed": False}
+        else:
+            try:
+                data = json.loads(body.decode('utf-8'))
+            except ValueError:
+                return {"status": STATUS_ERROR, "registered": None, "available": None, "registrant_changed": False,
+                        "error": f"{domain}: JSONとして読めない応答"}
+            result = {"status": STATUS_REGISTERED, "registered": True, "available": False, **summarize_domain(data)}
+            # 変化を見つけた記録は期限内はキャッシュから返す。次に問い合わせたときに同じ登録者なら元に戻る
+            result["registrant_changed"] = registrant_changed(previous, result)
+        result["source"] = base
+        self.cache.save(domain, result)
+        return {**result, "cached": False}
+
+    def check_many(self, domains: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """domains（重複は1回だけ）を並行して調べる"""
+        unique = list(dict.fromkeys(d.lower().rstrip('.') for d in domains))
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                return dict(zip(unique, executor.map(self.check, unique)))
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        # 閉じた接続の組は空き枠も無くなっているので捨て、次に使うときに作り直す
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
+def annotate_rankings(rows: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """順位表の各行に登録状況 "rdap" を付けたものを返す"""
+    missing = {"status": STATUS_ERROR, "registered": None, "available": None, "registrant_changed": False}
+    return [{**r, "rdap": results.get(r["typo"].lower(), missing)} for r in rows]
+
+# -------------------------------------------------------------------
+# ローカルのモックサーバー（確認・試験用）
+# -------------------------------------------------------------------
+
+def rdap_domain_object(domain: str, info: Dict[str, Any]) -> Dict[str, Any]:
+    """{"registrant": ..., "registrar": ..., "registration": ...} から RDAP の domain オブジェクトを作る"""
+    entities = []
+    if info.get("registrant"):
+        entities.append({"roles": ["registrant"], "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", info["registrant"]]]]})
+    if info.get("registrar"):
+        entities.append({"roles": ["registrar"], "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", info["registrar"]]]]})
+    events = [{"eventAction": action, "eventDate": info[key]}
+              for action, key in (("registration", "registration"), ("expiration", "expiration")) if info.get(key)]
+    return {"objectClassName": "domain", "ldhName": domain.upper(), "entities": entities, "events": events}
+
+
+class MockRdapServer:
+    """登録済みドメインの辞書から応答する RDAP サーバー（HTTP/1.1 keep-alive）。
+    throttle_every 回に1回は 429 (Retry-After: 0) を返す"""
+
+    def __init__(self, registered: Dict[str, Dict[str, Any]], throttle_every: int = 0):
+        self.registered = {d.lower(): info for d, info in registered.items()}
+        self.throttle_every = throttle_every
+        self.requests = 0
+        self.connections = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """別スレッドで起動してベースURLを返す（port=0 なら空いているポート）"""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # ヘッダーと本文を別々に送るため、遅延ACKで待たされないようにする
+
+            def setup(self):
+                super().setup()
+                with mock._lock:
+                    mock.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with mock._lock:
+                    mock.requests += 1
+                    mock._in_flight += 1
+                    mock.max_in_flight = max(mock.max_in_flight, mock._in_flight)
+                    throttled = mock.throttle_every and mock.requests % mock.throttle_every == 0
+                try:
+                    time.sleep(0.005)  # 同時実行数を観測できるよう、少しだけ時間をかける
+                    domain = self.path.rstrip('/').rsplit('/', 1)[-1].lower()
+                    if throttled:
+                        status, body, extra = 429, b'{"errorCode": 429}', {"Retry-After": "0"}
+                    elif domain in mock.registered:
+                        status, extra = 200, {}
+                        body = json.dumps(rdap_domain_object(domain, mock.registered[domain])).encode('utf-8')
+                    else:
+                        status, body, extra = 404, b'{"errorCode": 404}', {}
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/rdap+json")
+                    self.send_header("Content-Length", str(len(body)))
+                    for k, v in extra.items():
+                        self.send_header(k, v)
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with mock._lock:
+                        mock._in_flight -= 1
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/rdap/"
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="タイポ候補の登録状況 (RDAP)")
+    parser.add_argument("domain", nargs="?")
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--model", help="model.bin のパス（省略時は同じディレクトリのもの）")
+    parser.add_argument("--mock", metavar="JSON", help="登録済みドメインの JSON からローカルのモックサーバーを起動し、全TLDをそこへ問い合わせる")
+    parser.add_argument("--per-registry", type=int, default=RDAP_PER_REGISTRY)
+    parser.add_argument("--workers", type=int, default=RDAP_WORKERS)
+    parser.add_argument("--cache-dir", default=RDAP_CACHE_DIR)
+    parser.add_argument("--update-bootstrap", action="store_true", help=f"{RDAP_BOOTSTRAP_URL} を取得して {os.path.basename(BOOTSTRAP_FILE)} を更新する")
+    args = parser.parse_args()
+
+    if args.update_bootstrap:
+        try:
+            services = update_bootstrap()
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] ブートストラップを取得できませんでした: {e}")
+            sys.exit(1)
+        print(f"[SUCCESS] ブートストラップを更新しました: {BOOTSTRAP_FILE}（{len(services)}件のTLD）")
+        if not args.domain:
+            sys.exit(0)
+    if not args.domain:
+        parser.error("domain を指定してください")
+
+    from typo_runtime import DEFAULT_MODEL_FILE, TypoRuntime
+    try:
+        runtime = TypoRuntime.load(args.model or DEFAULT_MODEL_FILE)
+        mock_data = None
+        if args.mock:
+            with open(args.mock, 'r', encoding='utf-8') as f:
+                mock_data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] 入力を読み込めませんでした: {e}")
+        sys.exit(1)
+    rows = runtime.generate(args.domain, args.top)
+
+    mock = None
+    services = None
+    if mock_data is not None:
+        mock = MockRdapServer(mock_data)
+        base = mock.start()
+        services = {r["typo"].rsplit('.', 1)[-1]: base for r in rows}
+    checker = RdapChecker(services, RdapCache(args.cache_dir), args.per_registry, args.workers)
+    start = time.perf_counter()
+    try:
+        results = checker.check_many(r["typo"] for r in rows)
+        elapsed = time.perf_counter() - start
+    finally:
+        if mock is not None:
+            mock.close()
+
+    for i, r in enumerate(annotate_rankings(rows, results)):
+        rdap = r["rdap"]
+        detail = rdap.get("registrant") or rdap.get("error") or ""
+        changed = " 登録者変更" if rdap["registrant_changed"] else ""
+        print(f"{i+1:2}位 {r['typo']:<30} (スコア: {r['score']:.7f}) {rdap['status']:<8}{changed} {detail}")
+    stats = checker.stats
+    print(f"[INFO] {len(results)}件を {elapsed:.2f}秒で確認（問い合わせ {stats['requests']}回、"
+          f"キャッシュ {stats['cache_hits']}回、再試行 {stats['retries']}回、失敗 {stats['failures']}件）")
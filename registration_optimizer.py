@@ -0,0 +1,202 @@
+import argparse
+import csv
+import multiprocessing
+import re
+import sys
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from prerender_rankings import PRERENDER_DOMAINS_FILE, load_domain_list
+from tld_trie import TldInfo, registrable_domain
+from typo_runtime import DEFAULT_MODEL_FILE, TypoRuntime
+
+# ===================================================================
+# -------- 予算内での防衛登録の選定 ----------
+# ===================================================================
+#
+# 保有ドメイン（ポートフォリオ）それぞれのタイポ候補を生成し、年間予算の中で
+# 「登録した候補のスコアの合計（ドメインの重み付き）」が最大になる組を選ぶ。
+# 候補は登録の単位（一致したサフィックス + 1ラベル。"artra-group.coo.jp" なら "coo.jp"）にまとめ、
+# 同じドメインの登録で防げるタイポ（複数の保有ドメインのものを含む）のスコアを合算した1件として扱う。
+# 価格は tld_prices.json の表記を数値化したもの (TldInfo.price)。要問い合わせ・実在しないTLD・
+# 保有済みのドメイン（とそのサブドメイン）は選ばない
+#
+# 目的関数は候補ごとの価値の和（ナップサック）なので、価値/価格の大きい順に予算まで詰める貪欲法と、
+# 予算内で最も価値の大きい1件から詰め直した結果の良い方を採る（最適値の 1/2 以上が保証される）。
+# 並べ替え1回で済むため、数十万件の候補でも数秒で終わる
+#
+#   python registration_optimizer.py 500000                                  # prerender_domains.txt を予算 50万円/年で
+#   python registration_optimizer.py 1,200,000 --domains portfolio.txt --top 200 --workers 4 --out plan.csv
+
+REGISTRATION_TOP_N = 100  # 保有ドメイン1件あたりに生成する候補数
+LABEL_RE = re.compile(r"(?!-)[a-z0-9-]{1,63}(?<!-)|xn--[a-z0-9-]{1,59}")  # 登録できるラベル
+PLAN_FILE = "registration_plan.csv"
+
+
+class Candidate(NamedTuple):
+    domain: str                         # 登録するドメイン
+    price: int                          # 年額（円）
+    cost: str                           # tld_prices.json の表記
+    value: float                        # 防げるタイポの (保有ドメインの重み × スコア) の合計
+    covers: Tuple[Tuple[str, float], ...]  # (保有ドメイン, そのタイポのスコアの合計)
+    typos: Tuple[str, ...]              # 防げるタイポ（domain 自身かそのサブドメイン）
+
+
+class Plan(NamedTuple):
+    chosen: List[Candidate]
+    spent: int
+    value: float       # 選んだ候補の価値の合計
+    total_value: float  # 選定対象の全候補の価値の合計
+
+
+def parse_budget(text: str) -> int:
+    """'1,200,000' / '1200000円' -> 1200000"""
+    digits = text.replace(',', '').replace('円', '').strip()
+    if not digits.isdigit():
+        raise ValueError(f"予算は円単位の整数で指定してください: {text}")
+    return int(digits)
+
+def collect_candidates(portfolio: Dict[str, float], rankings: Iterable[Tuple[str, List[Dict[str, Any]]]],
+                       lookup: Callable[[str], TldInfo]) -> Tuple[List[Candidate], Counter]:
+    """保有ドメインごとの順位表を登録するドメインごとにまとめる。選定対象外のタイポの件数を理由別に返す"""
+    covers: Dict[str, List[Tuple[str, float]]] = {}
+    for domain, rows in rankings:
+        for r in rows:
+            covers.setdefault(r["typo"], []).append((domain, r["score"]))
+
+    # 登録するドメイン -> (TldInfo, {保有ドメイン: スコアの合計}, [タイポ])
+    grouped: Dict[str, Tuple[TldInfo, Dict[str, float], List[str]]] = {}
+    skipped = Counter()
+    for typo, pairs in covers.items():
+        info = lookup(typo)
+        registrable = registrable_domain(typo, info.suffix)
+        if typo in portfolio or registrable in portfolio:
+            skipped["保有済み"] += 1
+            continue
+        if not info.valid:
+            skipped["実在しないTLD"] += 1
+            continue
+        if not LABEL_RE.fullmatch(registrable.split('.', 1)[0]):
+            skipped["登録できない名前"] += 1  # 空のラベル（ドットの重複）や先頭・末尾のハイフン
+            continue
+        if info.price is None:
+            skipped["価格不明"] += 1
+            continue
+        _, scores, typos = grouped.setdefault(registrable, (info, {}, []))
+        for domain, score in pairs:
+            scores[domain] = scores.get(domain, 0.0) + score
+        typos.append(typo)
+
+    candidates = []
+    for registrable, (info, scores, typos) in grouped.items():
+        value = sum(portfolio[domain] * score for domain, score in scores.items())
+        candidates.append(Candidate(registrable, info.price, info.cost, value, tuple(scores.items()), tuple(typos)))
+    return candidates, skipped
+
+def _fill(ordered: List[Candidate], budget: int, chosen: List[Candidate], spent: int) -> int:
+    # 入りきらない候補は飛ばして、残りの予算に入る候補を詰め続ける
+    taken = {c.domain for c in chosen}
+    for c in ordered:
+        if c.domain not in taken and spent + c.price <= budget:
+            chosen.append(c)
+            spent += c.price
+    return spent
+
+def optimize(candidates: List[Candidate], budget: int) -> Plan:
+    """予算 budget (円/年) 以内で価値の合計が大きい候補の組を選ぶ"""
+    ordered = sorted(candidates, key=lambda c: (-(c.value / c.price if c.price else float("inf")), c.price, c.domain))
+
+    chosen: List[Candidate] = []
+    spent = _fill(ordered, budget, chosen, 0)
+    best = (sum(c.value for c in chosen), chosen, spent)
+
+    # 価値/価格の順では高価な1件を取りこぼすことがあるので、最も価値の大きい1件から詰め直した場合と比べる
+    affordable = [c for c in candidates if c.price <= budget]
+    if affordable:
+        top = max(affordable, key=lambda c: (c.value, -c.price))
+        alt = [top]
+        alt_spent = _fill(ordered, budget, alt, top.price)
+        alt_value = sum(c.value for c in alt)
+        if alt_value > best[0]:
+            best = (alt_value, alt, alt_spent)
+
+    value, chosen, spent = best
+    chosen.sort(key=lambda c: (-c.value, c.domain))
+    return Plan(chosen, spent, value, sum(c.value for c in candidates))
+
+# -------------------------------------------------------------------
+# 候補の生成（保有ドメインが多い場合はプロセスを分ける）
+# -------------------------------------------------------------------
+
+_WORKER_RUNTIME: Optional[TypoRuntime] = None
+
+def _init_worker(model_path: str) -> None:
+    global _WORKER_RUNTIME
+    _WORKER_RUNTIME = TypoRuntime.mapped(model_path)  # model.bin のページをプロセス間で共有する
+
+def _generate_worker(args: Tuple[str, int]) -> Tuple[str, List[Dict[str, Any]]]:
+    domain, top_n = args
+    return domain, _WORKER_RUNTIME.generate(domain, top_n)
+
+def generate_rankings(domains: List[str], top_n: int = REGISTRATION_TOP_N, model_path: str = DEFAULT_MODEL_FILE,
+                      workers: int = 1, runtime: Optional[TypoRuntime] = None) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """保有ドメインそれぞれの上位 top_n 件（workers > 1 なら mmap したモデルを共有するプロセスで並列に生成）"""
+    if workers <= 1:
+        runtime = runtime or TypoRuntime.load(model_path)
+        return [(domain, runtime.generate(domain, top_n)) for domain in domains]
+    with multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        return pool.map(_generate_worker, [(domain, top_n) for domain in domains], chunksize=max(1, len(domains) // (workers * 8)))
+
+def write_plan(plan: Plan, path: str) -> None:
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(["domain", "price", "cost", "value", "typos", "covers"])
+        for c in plan.chosen:
+            writer.writerow([c.domain, c.price, c.cost, f"{c.value:.7f}", " ".join(c.typos),
+                             " ".join(f"{d}:{s:.7f}" for d, s in c.covers)])
+
+def print_plan(plan: Plan, budget: int, skipped: Counter, portfolio: Dict[str, float], top: int = 20) -> None:
+    ratio = plan.value / plan.total_value if plan.total_value else 0.0
+    print(f"[INFO] 予算 {budget:,}円/年 → {len(plan.chosen)}件 {plan.spent:,}円/年、スコアの合計の {ratio:.1%} を確保")
+    if skipped:
+        print(f"[INFO] 選定対象外: {', '.join(f'{k} {v:,}件' for k, v in skipped.most_common())}")
+    for i, c in enumerate(plan.chosen[:top]):
+        typos = f"  タイポ {len(c.typos)}件" if c.typos != (c.domain,) else ""
+        print(f"{i+1:3}位 {c.domain:<32} {c.cost:<14} 価値 {c.value:.7f}{typos}  ({', '.join(d for d, _ in c.covers)})")
+    if len(plan.chosen) > top:
+        print(f"      ...ほか {len(plan.chosen) - top}件")
+
+    covered: Dict[str, float] = Counter()
+    for c in plan.chosen:
+        for domain, score in c.covers:
+            covered[domain] += portfolio[domain] * score
+    uncovered = [d for d in portfolio if not covered.get(d)]
+    if uncovered:
+        print(f"[WARN] 候補を1件も登録しない保有ドメイン: {', '.join(uncovered[:10])}{' ...' if len(uncovered) > 10 else ''}")
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="年間予算の中で、保有ドメインのタイポ候補のうち登録するものを選ぶ")
+    parser.add_argument("budget", help="年間予算（円）。例: 500000 / 1,200,000")
+    parser.add_argument("--domains", default=PRERENDER_DOMAINS_FILE, help="保有ドメインの一覧（1行1ドメイン）")
+    parser.add_argument("--top", type=int, default=REGISTRATION_TOP_N, help="保有ドメイン1件あたりの候補数")
+    parser.add_argument("--model", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--out", default=PLAN_FILE)
+    args = parser.parse_args()
+
+    try:
+        budget = parse_budget(args.budget)
+        portfolio = {domain: 1.0 for domain in load_domain_list(args.domains)}
+        runtime = TypoRuntime.load(args.model)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] 入力を読み込めませんでした: {e}")
+        sys.exit(1)
+
+    rankings = generate_rankings(list(portfolio), args.top, args.model, args.workers, runtime)
+    candidates, skipped = collect_candidates(portfolio, rankings, runtime.lookup)
+    plan = optimize(candidates, budget)
+    print_plan(plan, budget, skipped, portfolio)
+    write_plan(plan, args.out)
+    print(f"[INFO] 登録候補を書き出しました: {args.out}")
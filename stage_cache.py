@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# ===================================================================
+# -------- パイプラインの段階ごとのキャッシュ (.stage_cache.json) ----------
+# ===================================================================
+#
+# 各段階 (抽出 → 分類 → 分析・モデル出力 → Web出力 → 事前計算) について、
+#   入力ファイルの内容ハッシュ / コード・ルール表のファイルの内容ハッシュ / パラメータ
+# を記録しておき、すべて前回と同じで出力も前回のまま残っていれば、その段階は実行しない。
+# 出力も内容ハッシュで比べるので、上流を再実行しても結果が同じなら下流は省略される
+#
+#   cache = StageCache()
+#   cache.run("filter", lambda: ..., inputs=["filtered_address.csv"], outputs=["filtered_domain_typos_dl4.csv"],
+#             code=["typo_ranking.py"], params={"threshold": 4})
+#   if cache.begin("model", inputs=[...], outputs=["model.bin"]):   # 関数にまとめにくい段階は begin / finish で囲む
+#       ...
+#       cache.finish("model")   # 失敗した場合は cache.fail("model", e)（記録を残さず、次回も実行する）
+#   cache.print_report()
+#
+# run は func が例外を送出すると失敗として記録し、例外をそのまま送出する
+
+STAGE_CACHE_FILE = ".stage_cache.json"
+STAGE_CACHE_FORMAT = 1
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class StageCache:
+    """段階ごとの入力・コード・パラメータの指紋と出力のハッシュを保存し、変更の無い段階を省略する"""
+
+    def __init__(self, path: str = STAGE_CACHE_FILE, force: bool = False):
+        self.path = path
+        self.force = force
+        self.report: List[Dict[str, Any]] = []  # {stage, ran, failed, reason, seconds}
+        self._pending: Dict[str, tuple] = {}
+        self._state = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("format") == STAGE_CACHE_FORMAT:
+                return state
+        except (OSError, ValueError):
+            pass
+        return {"format": STAGE_CACHE_FORMAT, "files": {}, "stages": {}}
+
+    def _save(self) -> None:
+        # 途中で落ちても壊れたキャッシュが残らないよう、書き終えてから置き換える
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def digest(self, path: str) -> Optional[str]:
+        """ファイル内容の SHA-256（無ければ None）。サイズと更新時刻が前回と同じなら前回の値を使う"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        known = self._state["files"].get(path)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            return known["sha256"]
+
+        sha256 = file_sha256(path)
+        self._state["files"][path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha256}
+        return sha256
+
+    def _digests(self, paths: Iterable[str]) -> Dict[str, Optional[str]]:
+        return {path: self.digest(path) for path in paths}
+
+    def _stale_reason(self, name: str, fingerprint: Dict[str, Any], outputs: List[str]) -> Optional[str]:
+        """実行が必要な理由（省略できる場合は None）"""
+        if self.force:
+            return "強制実行"
+        previous = self._state["stages"].get(name)
+        if previous is None:
+            return "前回の記録なし"
+        for field, label in (("inputs", "入力"), ("code", "コード・ルール表")):
+            changed = [p for p, d in fingerprint[field].items() if previous[field].get(p, "") != d]
+            changed += [p for p in previous[field] if p not in fingerprint[field]]
+            if changed:
+                return f"{label}が変更: {', '.join(changed)}"
+        if previous["params"] != fingerprint["params"]:
+            changed = sorted(k for k in set(previous["params"]) | set(fingerprint["params"])
+                             if previous["params"].get(k) != fingerprint["params"].get(k))
+            return f"パラメータが変更: {', '.join(changed)}"
+        current = self._digests(outputs)
+        changed = [p for p in outputs if current[p] is None or previous["outputs"].get(p) != current[p]]
+        if changed:
+            return f"出力が無いか変更された: {', '.join(changed)}"
+        return None
+
+    def begin(self, name: str, inputs: Iterable[str], outputs: Iterable[str],
+              code: Iterable[str] = (), params: Optional[Dict[str, Any]] = None) -> bool:
+        """段階を実行する必要があれば True（実行後に finish を呼ぶ）。省略できる場合は False"""
+        start = time.perf_counter()
+        outputs = list(outputs)
+        fingerprint = {
+            "inputs": self._digests(inputs),
+            "code": self._digests(code),
+            "params": json.loads(json.dumps(params or {}, ensure_ascii=False)),  # JSONに保存した形にそろえる
+        }
+
+        reason = self._stale_reason(name, fingerprint, outputs)
+        if reason is None:
+            self.report.append({"stage": name, "ran": False, "failed": False, "reason": "入力・コード・パラメータに変更なし",
+                                "seconds": time.perf_counter() - start})
+            return False
+
+        # 途中で失敗した場合に備えて前回の記録は消しておき、次回は必ず実行する
+        if self._state["stages"].pop(name, None) is not None:
+            self._save()
+        self._pending[name] = (fingerprint, outputs, reason, start)
+        return True
+
+    def finish(self, name: str) -> None:
+        """begin で実行が必要とされた段階の完了を記録する（出力の内容ハッシュも保存する）"""
+        fingerprint, outputs, reason, start = self._pending.pop(name)
+        self._state["stages"][name] = {**fingerprint, "outputs": self._digests(outputs)}
+        self._save()
+        self.report.append({"stage": name, "ran": True, "failed": False, "reason": reason, "seconds": time.perf_counter() - start})
+
+    def fail(self, name: str, error: Any) -> None:
+        """begin で実行が必要とされた段階の失敗を記録する（出力は記録しないので、次回も実行する）"""
+        _, _, reason, start = self._pending.pop(name)
+        self.report.append({"stage": name, "ran": True, "failed": True, "reason": f"{reason}（失敗: {error}）",
+                            "seconds": time.perf_counter() - start})
+
+    def run(self, name: str, func: Callable[[], Any], inputs: Iterable[str], outputs: Iterable[str],
+            code: Iterable[str] = (), params: Optional[Dict[str, Any]] = None) -> bool:
+        """入力・コード・パラメータが前回と同じで出力も残っていれば func を実行しない。実行した場合は True"""
+        if not self.begin(name, inputs, outputs, code, params):
+            return False
+        try:
+            func()
+        except BaseException as e:
+            self.fail(name, e)
+            raise
+        self.finish(name)
+        return True
+
+    def print_report(self) -> None:
+        print("[INFO] 段階ごとの実行結果:")
+        for r in self.report:
+            status = "失敗" if r["failed"] else "実行" if r["ran"] else "省略"
+            print(f"  {r['stage']:<10} {status}  {r['seconds']:6.3f}秒  {r['reason']}")
@@ -0,0 +1,238 @@
+import argparse
+import csv
+import os
+import random
+import string
+import sys
+from collections import Counter
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from intermediate_io import extract_domain, intermediate_path, is_parquet, resolve_format
+from model_artifact import read_model
+from typo_runtime import DEFAULT_MODEL_FILE, EMPTY, damerau_levenshtein_distance
+
+# ===================================================================
+# -------- 合成タイポコーパス (負荷・規模の検証用) ----------
+# ===================================================================
+#
+# 学習済みモデル (model.bin) から、入力と同じ形式の行
+#   user_id, step_id, correct_address, input_address, edit_distance, mismatched_part
+# を何行でも作る。正しいアドレスは同梱データ (filtered_address.csv) の利用者・ドメインの分布に、
+# 乱数で作ったドメインを加えたものから選び、タイポは
+#   原因の割合 (W_individual の原因ごとの合計) → その原因の個別ミス (W_individual) →
+#   位置 (位置別頻度。未観測の位置も選ばれるよう +1) / TLDの取り違え
+# の順に選んで当てはめる。同じ seed・モデル・同梱データからは同じ行が出る
+#
+#   python synth_corpus.py synthetic.csv 1000000 --seed 0
+#   python synth_corpus.py synthetic.parquet 10000000      # pyarrow がある場合
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "filtered_address.csv")
+CORPUS_COLUMNS = ["user_id", "step_id", "correct_address", "input_address", "edit_distance", "mismatched_part"]
+CHUNK_ROWS = 100_000
+MAX_ATTEMPTS = 20
+
+TLD_CAUSE = "TLDミス"
+TRANSPOSE_CAUSE = "入力順序ミス"
+
+_SYLLABLES = [c + v for c in ["", "k", "s", "t", "n", "h", "m", "y", "r", "w", "g", "z", "d", "b", "p"] for v in "aiueo"]
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    return list(accumulate(weights))
+
+def _random_label(rng: random.Random) -> str:
+    label = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 5)))
+    if rng.random() < 0.15:
+        label += "-" + "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 3)))
+    return label
+
+
+class TypoSampler:
+    """学習済みの重み・位置別頻度に従って、ミスを選び文字列に当てはめる"""
+
+    def __init__(self, individual_weights: Dict, positional_freqs: Dict, rng: random.Random):
+        self.rng = rng
+        self.positional_freqs = positional_freqs
+        self.causes = [c for c, inner in individual_weights.items() if inner]
+        self.cause_cum = _cumulative([sum(individual_weights[c].values()) for c in self.causes])
+        self.keys = {c: list(individual_weights[c]) for c in self.causes}
+        self.key_cum = {c: _cumulative(list(individual_weights[c].values())) for c in self.causes}
+        self._distances: Dict[Tuple[str, str], int] = {}
+
+    def choose(self, domain: bool = True) -> Tuple[str, Any]:
+        """原因を W_individual の合計に比例して、その中の個別ミスを重みに比例して選ぶ（ローカル部ではTLDミスを除く）"""
+        while True:
+            cause = self.rng.choices(self.causes, cum_weights=self.cause_cum)[0]
+            if domain or cause != TLD_CAUSE:
+                return cause, self.rng.choices(self.keys[cause], cum_weights=self.key_cum[cause])[0]
+
+    def apply(self, text: str, cause: str, key: Any, domain: bool = True) -> Optional[Tuple[str, str, int]]:
+        """text にミスを当てはめた (タイポ後の文字列, 変わった部分, 編集距離)。当てはまらなければ None"""
+        edit = self._apply(text, cause, key)
+        if edit is None or edit[0] == text or not edit[0] or (domain and '.' not in edit[0]):
+            return None
+        return edit
+
+    def _distance(self, a: str, b: str) -> int:
+        if (a, b) not in self._distances:
+            self._distances[(a, b)] = damerau_levenshtein_distance(a, b)
+        return self._distances[(a, b)]
+
+    def _pick(self, text: str, cause: str, char: str, positions: List[int]) -> int:
+        """候補位置から、位置別頻度（末尾からの位置）に比例して選ぶ"""
+        freqs = self.positional_freqs.get(cause, {}).get(char, {})
+        weights = [freqs.get(len(text) - 1 - i, 0) + 1 for i in positions]
+        return self.rng.choices(positions, weights=weights)[0]
+
+    def _apply(self, text: str, cause: str, key: Any) -> Optional[Tuple[str, str, int]]:
+        if cause == TLD_CAUSE:
+            src, dst = key.split(' -> ')
+            if not text.endswith('.' + src):
+                return None
+            return text[:-len(src)] + dst, dst, self._distance(src, dst)
+
+        if cause == TRANSPOSE_CAUSE:
+            c1, c2 = key.split(' -> ')[0].split(' ')
+            positions = [i for i in range(len(text) - 1) if text[i] == c1 and text[i + 1] == c2]
+            if not positions:
+                return None
+            i = self._pick(text, cause, c1, positions)
+            return text[:i] + c2 + c1 + text[i + 2:], c2 + c1, 1
+
+        c1, c2 = ('' if k == EMPTY else k for k in key)
+        if c1:
+            positions = [i for i in range(len(text) - len(c1) + 1) if text.startswith(c1, i)]
+            if not positions:
+                return None
+            i = self._pick(text, cause, c1, positions)
+            return text[:i] + c2 + text[i + len(c1):], c2, self._distance(c1, c2)
+        # 挿入: 位置別頻度は挿入先の直前の位置で集計している
+        if len(text) < 2:
+            return None
+        i = self._pick(text, cause, c2, list(range(1, len(text))))
+        return text[:i] + c2 + text[i:], c2, len(c2)
+
+
+class AddressPool:
+    """正しいアドレスの母集団（同梱データのローカル部・ドメインの分布 + 乱数で作ったドメイン）"""
+
+    def __init__(self, rng: random.Random, seed_csv: Optional[str], extra_domains: int):
+        self.rng = rng
+        locals_, domains, steps = [], Counter(), []
+        if seed_csv and os.path.exists(seed_csv):
+            with open(seed_csv, 'r', encoding='utf-8-sig') as f:
+                for row in csv.DictReader(f):
+                    address = row["correct_address"]
+                    if '@' not in address:
+                        continue
+                    locals_.append(address.split('@')[0])
+                    domains[extract_domain(address)] += 1
+                    steps.append(row["step_id"])
+
+        suffixes = Counter(d.split('.', 1)[1] for d in domains if '.' in d) or Counter({"co.jp": 1, "com": 1, "jp": 1})
+        suffix_list, suffix_cum = list(suffixes), _cumulative(list(suffixes.values()))
+        mean_count = (sum(domains.values()) / len(domains)) if domains else 1.0
+        for _ in range(extra_domains):
+            domains[_random_label(rng) + "." + rng.choices(suffix_list, cum_weights=suffix_cum)[0]] += mean_count
+
+        self.locals = locals_ or ["".join(rng.choice(string.ascii_lowercase) for _ in range(8)) for _ in range(1000)]
+        self.domains = list(domains)
+        self.domain_cum = _cumulative(list(domains.values()))
+        self.steps = steps or [str(i) for i in range(1, 21)]
+
+    def address(self) -> Tuple[str, str]:
+        return self.rng.choice(self.locals), self.rng.choices(self.domains, cum_weights=self.domain_cum)[0]
+
+
+def seed_typo_rate(seed_csv: Optional[str], default: float = 0.5) -> float:
+    """同梱データでドメイン部が異なる行の割合（残りはローカル部のタイポ）"""
+    if not seed_csv or not os.path.exists(seed_csv):
+        return default
+    total = differ = 0
+    with open(seed_csv, 'r', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            total += 1
+            differ += extract_domain(row["correct_address"]) != extract_domain(row["input_address"])
+    return differ / total if total else default
+
+def iter_corpus(rows: int, seed: int = 0, model_path: str = DEFAULT_MODEL_FILE, seed_csv: Optional[str] = SEED_FILE,
+                typo_rate: Optional[float] = None, extra_domains: Optional[int] = None,
+                users: Optional[int] = None) -> Iterator[list]:
+    """合成した行 (CORPUS_COLUMNS の順) を rows 行返す"""
+    individual_weights, positional_freqs, _ = read_model(model_path)
+    rng = random.Random(seed)
+    sampler = TypoSampler(individual_weights, positional_freqs, rng)
+    pool = AddressPool(rng, seed_csv, extra_domains if extra_domains is not None else max(1000, rows // 50))
+    typo_rate = seed_typo_rate(seed_csv) if typo_rate is None else typo_rate
+    users = users or max(1, rows // 7)
+
+    produced = 0
+    while produced < rows:
+        # 先にミスを選んでから当てはまるアドレスを探す（当てはまりやすいミスに偏らないように）
+        in_domain = rng.random() < typo_rate
+        cause, key = sampler.choose(in_domain)
+        for _ in range(MAX_ATTEMPTS):
+            local, domain = pool.address()
+            edit = sampler.apply(domain if in_domain else local, cause, key, in_domain)
+            if edit is not None:
+                break
+        else:
+            continue
+        typo_address = f"{local}@{edit[0]}" if in_domain else f"{edit[0]}@{domain}"
+        yield [rng.randrange(users), rng.choice(pool.steps), f"{local}@{domain}", typo_address, edit[2], edit[1]]
+        produced += 1
+
+def write_corpus(path: str, rows: int, chunk_rows: int = CHUNK_ROWS, **options: Any) -> str:
+    """合成コーパスを CSV / Parquet（拡張子で決まる）に分割して書き出し、書き出したパスを返す"""
+    if is_parquet(path):
+        path = intermediate_path(path, resolve_format("parquet"))  # pyarrow が無ければ CSV にする
+    rows_iter = iter_corpus(rows, **options)
+
+    if is_parquet(path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        while True:
+            chunk = [row for _, row in zip(range(chunk_rows), rows_iter)]
+            if not chunk:
+                break
+            table = pa.Table.from_pydict({col: [row[i] for row in chunk] for i, col in enumerate(CORPUS_COLUMNS)})
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+        return path
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(CORPUS_COLUMNS)
+        while True:
+            chunk = [row for _, row in zip(range(chunk_rows), rows_iter)]
+            if not chunk:
+                break
+            writer.writerows(chunk)
+    return path
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="学習済みモデルから、入力と同じ形式の合成タイポデータを作る")
+    parser.add_argument("out", help="出力先 (.csv / .parquet)")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--seed-csv", default=SEED_FILE, help="利用者・ドメインの分布を取る元データ（'' で使わない）")
+    parser.add_argument("--typo-rate", type=float, help="ドメイン部のタイポの割合（省略時は元データと同じ）")
+    parser.add_argument("--domains", type=int, help="乱数で作るドメインの数（省略時は rows/50、最低1000）")
+    parser.add_argument("--users", type=int, help="利用者数（省略時は rows/7）")
+    args = parser.parse_args()
+
+    try:
+        path = write_corpus(args.out, args.rows, seed=args.seed, model_path=args.model, seed_csv=args.seed_csv or None,
+                            typo_rate=args.typo_rate, extra_domains=args.domains, users=args.users)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] 合成データを作成できませんでした: {e}")
+        sys.exit(1)
+    print(f"[INFO] {args.rows:,}行の合成データを書き出しました: {path}")
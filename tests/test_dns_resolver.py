@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+import pytest
+
+import dns_resolver
+from dns_resolver import (QTYPE_A, QTYPE_AAAA, QTYPE_MX, RCODE_NXDOMAIN, STATUS_ADDRESS, STATUS_ERROR, STATUS_MX,
+                          STATUS_NXDOMAIN, DnsAnswer, DnsError, DnsRecord, DnsResolver, StubDnsServer, TtlCache)
+
+ZONE = {
+    ("mail.example", QTYPE_MX): [((10, "mx.mail.example"), 300)],
+    ("mail.example", QTYPE_A): [("192.0.2.1", 300)],
+    ("web.example", QTYPE_A): [("192.0.2.2", 300)],
+    ("web.example", QTYPE_AAAA): [("2001:db8::2", 300)],
+    ("short.example", QTYPE_A): [("192.0.2.3", 0)],
+}
+
+
+def run_with_stubs(body, drop_rates=(0.0,), **options):
+    """drop_rates の数だけスタブサーバーを立て、body(resolver, stubs) を実行する"""
+    async def main():
+        stubs = [StubDnsServer(ZONE, drop_rate=rate) for rate in drop_rates]
+        servers = [await stub.start() for stub in stubs]
+        resolver = DnsResolver(servers, **{"timeout": 0.2, "backoff": 0.01, **options})
+        try:
+            return await body(resolver, stubs)
+        finally:
+            resolver.close()
+            for stub in stubs:
+                stub.close()
+    return asyncio.run(main())
+
+
+def test_resolve_many_statuses():
+    async def body(resolver, stubs):
+        return await resolver.resolve_many(["mail.example", "web.example", "missing.example", "mail.example"])
+
+    statuses = run_with_stubs(body)
+    assert statuses["mail.example"]["status"] == STATUS_MX
+    assert statuses["mail.example"]["mx"] == ["mx.mail.example"]
+    assert statuses["web.example"]["status"] == STATUS_ADDRESS
+    assert statuses["web.example"]["aaaa"] == ["2001:db8::2"]
+    assert statuses["missing.example"]["status"] == STATUS_NXDOMAIN
+
+
+def test_timeout_is_retried_on_next_server():
+    # 1台目は応答しない。再試行は次のサーバーに送られる
+    async def body(resolver, stubs):
+        answer = await resolver.query("web.example", QTYPE_A)
+        return answer, stubs[0].received, stubs[1].received
+
+    answer, dead, alive = run_with_stubs(body, drop_rates=(1.0, 0.0))
+    assert [r.data for r in answer.records] == ["192.0.2.2"]
+    assert (dead, alive) == (1, 1)
+
+
+def test_gives_up_after_retries():
+    async def body(resolver, stubs):
+        with pytest.raises(DnsError):
+            await resolver.query("web.example", QTYPE_A)
+        result = await resolver.resolve("mail.example")
+        return resolver.stats, stubs[0].received, result
+
+    stats, received, result = run_with_stubs(body, drop_rates=(1.0,), retries=2)
+    assert received == 3 + 3 * 3  # 1回目 + 再試行2回、resolve は A / AAAA / MX の3種類
+    assert stats["retries"] == 2 * 4 and stats["failures"] == 4
+    assert result["status"] == STATUS_ERROR and "error" in result
+
+
+def test_rate_limit_spaces_queries():
+    async def body(resolver, stubs):
+        start = time.monotonic()
+        await asyncio.gather(*(resolver.query(f"n{i}.example", QTYPE_A) for i in range(6)))
+        return time.monotonic() - start
+
+    # 1秒あたり20回: 6回の送信は 5 × 0.05 秒以上に分散される
+    assert run_with_stubs(body, rate=20.0) >= 0.25 - 0.01
+
+
+def test_answers_are_cached_for_their_ttl():
+    async def body(resolver, stubs):
+        for _ in range(3):
+            await resolver.query("web.example", QTYPE_A)
+            await resolver.query("missing.example", QTYPE_A)
+            await resolver.query("short.example", QTYPE_A)
+        return stubs[0].received, resolver.stats["cache_hits"]
+
+    received, hits = run_with_stubs(body)
+    # 肯定応答と NXDOMAIN は1回だけ問い合わせる。TTL 0 の応答はキャッシュしない
+    assert received == 1 + 1 + 3
+    assert hits == 2 + 2
+
+
+def test_identical_inflight_queries_are_shared():
+    async def body(resolver, stubs):
+        answers = await asyncio.gather(*(resolver.query("MAIL.example.", QTYPE_MX) for _ in range(5)))
+        return answers, stubs[0].received, resolver.stats
+
+    answers, received, stats = run_with_stubs(body)
+    assert received == 1
+    assert stats["queries"] == 1 and stats["cache_hits"] == 4
+    assert all(a == answers[0] for a in answers)
+
+
+def test_shared_inflight_failure_reaches_every_caller():
+    async def body(resolver, stubs):
+        results = await asyncio.gather(*(resolver.query("web.example", QTYPE_A) for _ in range(3)),
+                                       return_exceptions=True)
+        return results, stubs[0].received
+
+    results, received = run_with_stubs(body, drop_rates=(1.0,), retries=0)
+    assert received == 1
+    assert all(isinstance(r, DnsError) for r in results)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_ttl_cache_expiry(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(dns_resolver, "time", clock)
+    cache = TtlCache()
+    cache.put(("a.example", QTYPE_A), DnsAnswer(0, [DnsRecord("a.example", QTYPE_A, 30, "192.0.2.1"),
+                                                    DnsRecord("a.example", QTYPE_A, 10, "192.0.2.9")], None))
+    cache.put(("nx.example", QTYPE_A), DnsAnswer(RCODE_NXDOMAIN, [], 60))
+    cache.put(("long.example", QTYPE_A), DnsAnswer(RCODE_NXDOMAIN, [], 86400))
+
+    clock.now += 9
+    assert cache.get(("a.example", QTYPE_A)) is not None
+    clock.now += 1  # 最も短い TTL (10秒) で期限切れ
+    assert cache.get(("a.example", QTYPE_A)) is None
+    clock.now += 50
+    assert cache.get(("nx.example", QTYPE_A)) is None  # 否定応答は SOA の TTL
+    assert cache.get(("long.example", QTYPE_A)) is not None
+    clock.now += dns_resolver.NEGATIVE_TTL - 60
+    assert cache.get(("long.example", QTYPE_A)) is None  # 否定応答のTTLは NEGATIVE_TTL まで
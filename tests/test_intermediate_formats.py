@@ -0,0 +1,35 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_DIR
+
+pytest.importorskip("pyarrow")
+
+# パイプラインの実行に必要なファイル（生成物の web_model/ や rankings/ は写さない）
+PIPELINE_FILES = ["*.py", "*.js", "filtered_address.csv", "tld_prices.json", "tld_registry.txt", "confusables.txt", "prerender_domains.txt"]
+
+
+def run_pipeline(workdir, *flags):
+    os.makedirs(workdir)
+    for pattern in PIPELINE_FILES:
+        for path in glob.glob(os.path.join(REPO_DIR, pattern)):
+            shutil.copy(path, workdir)
+    proc = subprocess.run([sys.executable, "typo_ranking.py", *flags], cwd=workdir, input="\n",
+                          capture_output=True, text=True, encoding="utf-8", timeout=300)
+    assert proc.returncode == 0, proc.stderr
+    assert "[ERROR]" not in proc.stdout, proc.stdout
+    with open(os.path.join(workdir, "data.json"), "rb") as f:
+        return f.read()
+
+
+def test_parquet_pipeline_matches_csv(tmp_path):
+    csv_json = run_pipeline(str(tmp_path / "csv"))
+    parquet_json = run_pipeline(str(tmp_path / "parquet"), "--parquet")
+    assert os.path.exists(tmp_path / "parquet" / "domaintypos_dl4_causes2.parquet")
+    assert not os.path.exists(tmp_path / "csv" / "domaintypos_dl4_causes2.parquet")
+    assert parquet_json == csv_json
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from conftest import REPO_DIR
+from keyboard_layouts import get_layout
+from typo_runtime import TypoRuntime
+
+MODEL_FILE = os.path.join(REPO_DIR, "model.bin")
+
+
+def test_us_neighbors_are_physical():
+    us = get_layout("us")
+    assert us.is_adjacent("f", "g")
+    assert not us.is_adjacent("f", "j")  # legacy 配列の f→j は隣接ではない
+    assert us.likelihood("f", "g") == pytest.approx(1.0)
+    assert us.likelihood("f", "g") > us.likelihood("f", "t") > us.likelihood("f", "j")
+
+
+def test_likelihood_map_matches_adjacency():
+    us = get_layout("us")
+    likelihood = us.likelihood_map()
+    for c, adjacent in us.adjacency_map().items():
+        assert set(likelihood[c]) == set(adjacent)
+        assert all(v >= us.min_likelihood for v in likelihood[c].values())
+
+
+def test_runtime_layout_selection():
+    runtime = TypoRuntime.load(MODEL_FILE)
+    assert runtime.keyboard.name == runtime.meta["keyboard_layout"]
+    assert TypoRuntime.load(MODEL_FILE, layout="jis").keyboard.name == "jis"
+    with pytest.raises(ValueError):
+        TypoRuntime.load(MODEL_FILE, layout="dvorak")
+
+
+def test_generated_candidates_are_hostnames():
+    runtime = TypoRuntime.load(MODEL_FILE)
+    for layout in ("us", "jis", "phone"):
+        for r in runtime.generate("example.co.jp", 50, idn=False, layout=layout):
+            assert set(r["typo"]) <= set("abcdefghijklmnopqrstuvwxyz0123456789.-")
+
+
+def test_mixed_case_input_is_normalized():
+    runtime = TypoRuntime.load(MODEL_FILE)
+    expected = runtime.generate("example.co.jp", 30)
+    assert len(expected) == 30
+    assert runtime.generate(" Example.CO.jp. ", 30) == expected
+    assert runtime.score_candidate("Example.co.jp", "Exmaple.co.jp") == runtime.score_candidate("example.co.jp", "exmaple.co.jp")
+
+    import typo_ranking as tr
+    weights, positions = runtime.individual_weights, runtime.positional_freqs
+    assert tr.typo_generator_ranked("Example.co.jp", weights, positions, 30) == tr.typo_generator_ranked("example.co.jp", weights, positions, 30)
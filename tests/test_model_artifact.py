@@ -0,0 +1,51 @@
+import json
+import os
+from collections import Counter
+
+import pytest
+
+from conftest import REPO_DIR
+from model_artifact import ModelFormatError, decode_model, encode_model, read_model, to_web_json
+from model_mmap import MappedModel
+
+
+def dump(web_json):
+    # typo_ranking.py / model_artifact.py to-json と同じ書式
+    return json.dumps(web_json, indent=4, ensure_ascii=False)
+
+
+def test_round_trip_is_byte_identical():
+    # 分析の集計は出現順に並ぶ（昇順ではない）
+    weights = {
+        "入力漏れ": {("t", "（空）"): 0.25, ("a", "（空）"): 0.125},
+        "TLDミス": {"co.jp -> jp": 0.5, "com -> co.jp": 0.0625},
+        "隣接キー誤打": {("rn", "m"): 0.03125, ("r", "nm"): 0.015625, ("f", "g"): 0.0078125},
+    }
+    positions = {
+        "入力漏れ": {"t": Counter({3: 2, 0: 5}), "a": Counter({1: 1})},
+        "二重入力": {"z": Counter({10: 1, 2: 4})},
+    }
+    meta = {"total_dl1_count": 13, "K_POSITION_BOOST": 0.5}
+
+    expected = dump(to_web_json(weights, positions, meta))
+    assert dump(to_web_json(*decode_model(encode_model(weights, positions, meta)))) == expected
+
+
+def test_pipeline_data_json_matches_model():
+    with open(os.path.join(REPO_DIR, "data.json"), "r", encoding="utf-8") as f:
+        data_json = f.read()
+    assert dump(to_web_json(*read_model(os.path.join(REPO_DIR, "model.bin")))) == data_json
+
+
+def test_truncated_model_raises_format_error(tmp_path):
+    with open(os.path.join(REPO_DIR, "model.bin"), "rb") as f:
+        data = f.read()
+    # 途中までしか取得できなかったファイルは、どこで切れていても ModelFormatError にする
+    for size in list(range(0, 1024)) + list(range(1024, len(data), 37)):
+        with pytest.raises(ModelFormatError):
+            decode_model(data[:size])
+
+    path = tmp_path / "partial.bin"
+    path.write_bytes(data[:500])
+    with pytest.raises(ModelFormatError):
+        MappedModel(str(path))
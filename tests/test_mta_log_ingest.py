@@ -0,0 +1,105 @@
+import csv
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_DIR
+from mta_log_ingest import EVENTS_FILE, TYPO_INPUT_FILE, ingest
+
+
+def retry_lines(qid, sender, typo, correct, minute):
+    """typo への送信が宛先不明で失敗し、correct に送り直して配送できたログ"""
+    ts = f"2026-10-19T10:{minute:02d}"
+    return [
+        f"{ts}:00+09:00 mx postfix/qmgr[10]: {qid}A: from=<{sender}>, size=100, nrcpt=1 (queue active)\n",
+        f"{ts}:01+09:00 mx postfix/smtp[11]: {qid}A: to=<{typo}>, relay=none, delay=1, status=bounced (Host or domain name not found)\n",
+        f"{ts}:30+09:00 mx postfix/qmgr[10]: {qid}B: from=<{sender}>, size=100, nrcpt=1 (queue active)\n",
+        f"{ts}:31+09:00 mx postfix/smtp[11]: {qid}B: to=<{correct}>, relay=mx[192.0.2.1]:25, delay=1, status=sent (250 OK)\n",
+    ]
+
+
+def append_log(path, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def read_events(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return [(r["input_address"], r["correct_address"]) for r in csv.DictReader(f)]
+
+
+def test_ingest_continues_from_saved_position(tmp_path):
+    log, out, state = tmp_path / "mail.log", tmp_path / "events.csv", tmp_path / "state.json"
+    append_log(log, retry_lines("AAAAAA", "taro@example.co.jp", "hanako@exmaple.co.jp", "hanako@example.co.jp", 0))
+    assert ingest(str(log), str(out), str(state)).stats["events"] == 1
+    append_log(log, retry_lines("BBBBBB", "jiro@example.co.jp", "info@exapmle.com", "info@example.com", 5))
+    assert ingest(str(log), str(out), str(state)).stats["events"] == 1
+    assert read_events(out) == [("hanako@exmaple.co.jp", "hanako@example.co.jp"), ("info@exapmle.com", "info@example.com")]
+
+
+def test_crash_before_state_save_does_not_duplicate(tmp_path):
+    log, out, state = tmp_path / "mail.log", tmp_path / "events.csv", tmp_path / "state.json"
+    append_log(log, retry_lines("AAAAAA", "taro@example.co.jp", "hanako@exmaple.co.jp", "hanako@example.co.jp", 0))
+    ingest(str(log), str(out), str(state))
+    shutil.copy(state, tmp_path / "saved.json")
+
+    # 事例は書き出したが、位置を保存する前に中断した状態にする（書き込み途中の行も残す）
+    append_log(log, retry_lines("BBBBBB", "jiro@example.co.jp", "info@exapmle.com", "info@example.com", 5))
+    ingest(str(log), str(out), str(state))
+    with open(out, "a", encoding="utf-8") as f:
+        f.write("123,17923")
+    shutil.copy(tmp_path / "saved.json", state)
+
+    assert ingest(str(log), str(out), str(state)).stats["events"] == 1
+    assert read_events(out) == [("hanako@exmaple.co.jp", "hanako@example.co.jp"), ("info@exapmle.com", "info@example.com")]
+
+
+def test_other_output_is_not_truncated(tmp_path):
+    log, state = tmp_path / "mail.log", tmp_path / "state.json"
+    append_log(log, retry_lines("AAAAAA", "taro@example.co.jp", "hanako@exmaple.co.jp", "hanako@example.co.jp", 0))
+    ingest(str(log), str(tmp_path / "first.csv"), str(state))
+
+    # 状態に記録した長さは、その出力にだけ当てはめる
+    other = tmp_path / "other.csv"
+    other.write_text("user_id,step_id,correct_address,input_address,edit_distance,mismatched_part\n" + "1,2,a@b.jp,a@c.jp,1,b\n" * 10,
+                     encoding="utf-8")
+    size = other.stat().st_size
+    ingest(str(log), str(other), str(state))
+    assert other.stat().st_size == size
+
+
+def test_cli_does_not_append_to_input_by_default(tmp_path):
+    assert EVENTS_FILE != TYPO_INPUT_FILE
+    append_log(tmp_path / "mail.log", retry_lines("AAAAAA", "taro@example.co.jp", "hanako@exmaple.co.jp", "hanako@example.co.jp", 0))
+    (tmp_path / TYPO_INPUT_FILE).write_text("input\n", encoding="utf-8")
+    script = os.path.join(REPO_DIR, "mta_log_ingest.py")
+
+    proc = subprocess.run([sys.executable, script, "mail.log"], cwd=tmp_path, capture_output=True, text=True, encoding="utf-8")
+    assert proc.returncode == 0, proc.stderr
+    assert read_events(tmp_path / EVENTS_FILE) == [("hanako@exmaple.co.jp", "hanako@example.co.jp")]
+    assert (tmp_path / TYPO_INPUT_FILE).read_text(encoding="utf-8") == "input\n"
+
+    # 入力には書き込まない（中断後の切り詰めで、他の方法で加えた行を消さないため）
+    proc = subprocess.run([sys.executable, script, "mail.log", "--out", TYPO_INPUT_FILE], cwd=tmp_path,
+                          capture_output=True, text=True, encoding="utf-8")
+    assert proc.returncode == 1
+    assert (tmp_path / TYPO_INPUT_FILE).read_text(encoding="utf-8") == "input\n"
+    with pytest.raises(ValueError):
+        ingest(str(tmp_path / "mail.log"), str(tmp_path / TYPO_INPUT_FILE), str(tmp_path / "state.json"))
+
+
+def test_events_are_added_to_the_filter_stage(tmp_path):
+    import typo_ranking as tr
+
+    log, events = tmp_path / "mail.log", tmp_path / EVENTS_FILE
+    append_log(log, retry_lines("AAAAAA", "taro@example.co.jp", "hanako@exmaple.co.jp", "hanako@example.co.jp", 0))
+    ingest(str(log), str(events), str(tmp_path / "state.json"))
+    main_input = tmp_path / TYPO_INPUT_FILE
+    main_input.write_text("user_id,step_id,correct_address,input_address\n1,2,a@example.com,a@exampel.com\n", encoding="utf-8")
+
+    out = tmp_path / "filtered.csv"
+    tr.filter_domain_differences_with_mismatch(str(main_input), str(out), 4, extra_paths=[str(events), str(tmp_path / "none.csv")])
+    assert read_events(out) == [("a@exampel.com", "a@example.com"), ("hanako@exmaple.co.jp", "hanako@example.co.jp")]
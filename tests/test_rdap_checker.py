@@ -0,0 +1,127 @@
+import json
+import time
+
+import pytest
+
+from rdap_checker import STATUS_AVAILABLE, STATUS_ERROR, STATUS_REGISTERED, MockRdapServer, RdapCache, RdapChecker
+
+REGISTERED = {f"taken{i}.com": {"registrant": f"Owner {i}", "registration": "2020-01-01T00:00:00Z"} for i in range(20)}
+
+
+@pytest.fixture
+def mock():
+    server = MockRdapServer(REGISTERED)
+    base = server.start()
+    yield server, base
+    server.close()
+
+
+def make_checker(base, cache_dir, cache=None, **options):
+    return RdapChecker({"com": base}, cache or RdapCache(str(cache_dir)), **{"backoff": 0.01, **options})
+
+
+def test_statuses(mock, tmp_path):
+    server, base = mock
+    results = make_checker(base, tmp_path).check_many(["taken1.com", "TAKEN1.com.", "free.com", "x.jp"])
+    assert set(results) == {"taken1.com", "free.com", "x.jp"}
+    assert results["taken1.com"]["status"] == STATUS_REGISTERED
+    assert results["taken1.com"]["registrant"] == "Owner 1"
+    assert results["free.com"]["status"] == STATUS_AVAILABLE
+    assert results["x.jp"]["registered"] is None  # RDAP非対応のTLD
+    assert server.requests == 2
+
+
+def test_connections_are_pooled_and_limited(mock, tmp_path):
+    server, base = mock
+    domains = list(REGISTERED) + [f"free{i}.com" for i in range(40)]
+    checker = make_checker(base, tmp_path, per_registry=3, workers=16)
+    results = checker.check_many(domains)
+    assert len(results) == 60 and server.requests == 60
+    assert server.max_in_flight <= 3
+    assert server.connections <= 3  # keep-alive で使い回す
+
+    # 閉じた後でも同じ checker で問い合わせられる
+    assert make_checker(base, tmp_path / "again", per_registry=3).check_many(["free0.com"])["free0.com"]["available"]
+    assert checker.check_many(["free99.com"])["free99.com"]["available"]
+
+
+def test_429_is_retried_after_retry_after(tmp_path):
+    server = MockRdapServer(REGISTERED, throttle_every=3)
+    base = server.start()
+    try:
+        # Retry-After: 0 が優先されるので、長い backoff を待たずに終わる
+        checker = make_checker(base, tmp_path, per_registry=1, backoff=30.0)
+        start = time.monotonic()
+        results = checker.check_many([f"free{i}.com" for i in range(10)])
+        elapsed = time.monotonic() - start
+    finally:
+        server.close()
+    assert all(r["status"] == STATUS_AVAILABLE for r in results.values())
+    assert checker.stats["retries"] == server.requests - 10 > 0
+    assert elapsed < 5
+
+
+def test_gives_up_when_always_throttled(tmp_path):
+    server = MockRdapServer(REGISTERED, throttle_every=1)
+    base = server.start()
+    try:
+        checker = make_checker(base, tmp_path, retries=2)
+        result = checker.check("taken1.com")
+    finally:
+        server.close()
+    assert result["status"] == STATUS_ERROR and "HTTP 429" in result["error"]
+    assert server.requests == 3 and checker.stats["failures"] == 1
+    assert not (tmp_path / "taken1.com.json").exists()  # 失敗はキャッシュしない
+
+
+def test_cache_expiry(mock, tmp_path):
+    server, base = mock
+    checker = make_checker(base, tmp_path, cache=RdapCache(str(tmp_path), ttl=3600, negative_ttl=0))
+    checker.check("taken1.com")
+    checker.check("free.com")
+    assert checker.check("taken1.com")["cached"]
+    assert not checker.check("free.com")["cached"]  # 未登録の記録は negative_ttl で期限切れ
+    assert server.requests == 3
+
+    # 保存時刻を ttl より前にすると問い合わせ直す
+    path = tmp_path / "taken1.com.json"
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    entry["fetched"] -= 3600
+    path.write_text(json.dumps(entry), encoding="utf-8")
+    assert not checker.check("taken1.com")["cached"]
+    assert server.requests == 4
+
+
+@pytest.mark.parametrize("content", ['{"fetched": 0}', '{"result": {"registered": true}}', '[]', '{"fetched": "x", "result": {"registered": true}}', '{'])
+def test_corrupt_cache_entry_is_ignored(mock, tmp_path, content):
+    server, base = mock
+    (tmp_path / "taken1.com.json").write_text(content, encoding="utf-8")
+    assert RdapCache(str(tmp_path)).load("taken1.com") is None
+    result = make_checker(base, tmp_path).check("taken1.com")
+    assert result["status"] == STATUS_REGISTERED and not result["cached"]
+    assert RdapCache(str(tmp_path)).load("taken1.com") is not None  # 正しい記録で置き換わる
+
+
+def test_registrant_change_is_reported_until_next_fetch(tmp_path):
+    server = MockRdapServer({"taken1.com": dict(REGISTERED["taken1.com"])})
+    base = server.start()
+    try:
+        always_fetch = make_checker(base, tmp_path, cache=RdapCache(str(tmp_path), ttl=0))
+        cached = make_checker(base, tmp_path, cache=RdapCache(str(tmp_path), ttl=3600))
+        assert not always_fetch.check("taken1.com")["registrant_changed"]
+
+        server.registered["taken1.com"]["registrant"] = "New Owner"
+        changed = always_fetch.check("taken1.com")
+        assert changed["registrant_changed"] and changed["registrant"] == "New Owner"
+        assert cached.check("taken1.com")["registrant_changed"]  # 期限内はキャッシュのまま
+
+        # 次に問い合わせたときに同じ登録者なら変更なし
+        assert not always_fetch.check("taken1.com")["registrant_changed"]
+        assert not cached.check("taken1.com")["registrant_changed"]
+
+        # 登録者が非公開の場合は登録日の変化（取り直し）で判定する
+        server.registered["taken1.com"] = {"registration": "2026-01-01T00:00:00Z"}
+        assert always_fetch.check("taken1.com")["registrant_changed"]
+        assert not always_fetch.check("taken1.com")["registrant_changed"]
+    finally:
+        server.close()
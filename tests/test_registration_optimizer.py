@@ -0,0 +1,39 @@
+import os
+
+from conftest import REPO_DIR
+from registration_optimizer import collect_candidates, optimize
+from tld_trie import registrable_domain
+from typo_runtime import TypoRuntime
+
+MODEL_FILE = os.path.join(REPO_DIR, "model.bin")
+
+
+def test_registrable_domain():
+    assert registrable_domain("artra-group.coo.jp", "jp") == "coo.jp"
+    assert registrable_domain("exmaple.co.jp", "co.jp") == "exmaple.co.jp"
+    assert registrable_domain("www.exmaple.com", "com") == "exmaple.com"
+    assert registrable_domain("localhost", "") == "localhost"
+
+
+def test_candidates_are_grouped_by_registrable_domain():
+    runtime = TypoRuntime.load(MODEL_FILE)
+    portfolio = {"artra-group.co.jp": 1.0, "asahidia.co.jp": 2.0, "example.com": 1.0}
+    rankings = [
+        ("artra-group.co.jp", [{"typo": "artra-group.coo.jp", "score": 0.25}, {"typo": "artra-group.jp", "score": 0.125}]),
+        ("asahidia.co.jp", [{"typo": "asahidia.coo.jp", "score": 0.5}, {"typo": "asahidia..co.jp", "score": 0.5}]),
+        ("example.com", [{"typo": "www.example.com", "score": 0.5}, {"typo": "exmaple.com", "score": 0.0625}]),
+    ]
+    candidates, skipped = collect_candidates(portfolio, rankings, runtime.lookup)
+    by_domain = {c.domain: c for c in candidates}
+    assert set(by_domain) == {"coo.jp", "artra-group.jp", "exmaple.com"}
+
+    # coo.jp を1件登録すれば、両方の保有ドメインの *.coo.jp のタイポを防げる
+    coo = by_domain["coo.jp"]
+    assert coo.price == runtime.lookup("coo.jp").price
+    assert sorted(coo.typos) == ["artra-group.coo.jp", "asahidia.coo.jp"]
+    assert dict(coo.covers) == {"artra-group.co.jp": 0.25, "asahidia.co.jp": 0.5}
+    assert coo.value == 0.25 * 1.0 + 0.5 * 2.0
+    assert skipped == {"保有済み": 1, "登録できない名前": 1}
+
+    plan = optimize(candidates, coo.price)
+    assert [c.domain for c in plan.chosen] == ["coo.jp"] and plan.spent == coo.price
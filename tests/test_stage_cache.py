@@ -0,0 +1,51 @@
+import pytest
+
+from stage_cache import StageCache
+
+
+@pytest.fixture
+def files(tmp_path):
+    src, out = tmp_path / "in.txt", tmp_path / "out.txt"
+    src.write_text("input", encoding="utf-8")
+    return tmp_path / "cache.json", str(src), str(out)
+
+
+def write_output(path, text="output"):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_unchanged_stage_is_skipped(files):
+    cache_path, src, out = files
+    assert StageCache(str(cache_path)).run("s", lambda: write_output(out), inputs=[src], outputs=[out])
+    assert not StageCache(str(cache_path)).run("s", lambda: write_output(out), inputs=[src], outputs=[out])
+
+
+def test_failed_stage_is_rerun(files):
+    cache_path, src, out = files
+    StageCache(str(cache_path)).run("s", lambda: write_output(out), inputs=[src], outputs=[out])
+
+    def fail_after_partial_write():
+        write_output(out, "partial")
+        raise OSError("disk full")
+
+    # 入力は変わらないが前回の結果は上書きされる。失敗は送出され、完了は記録されない
+    failing = StageCache(str(cache_path), force=True)
+    with pytest.raises(OSError):
+        failing.run("s", fail_after_partial_write, inputs=[src], outputs=[out])
+    assert failing.report[-1]["failed"]
+
+    ran = []
+    assert StageCache(str(cache_path)).run("s", lambda: ran.append(write_output(out)), inputs=[src], outputs=[out])
+    assert ran
+    assert not StageCache(str(cache_path)).run("s", lambda: write_output(out), inputs=[src], outputs=[out])
+
+
+def test_failed_begin_block_is_rerun(files):
+    cache_path, src, out = files
+    cache = StageCache(str(cache_path))
+    assert cache.begin("model", inputs=[src], outputs=[out])
+    write_output(out, "stale")
+    cache.fail("model", "書き出しに失敗")
+    assert cache.report[-1]["failed"]
+    assert StageCache(str(cache_path)).begin("model", inputs=[src], outputs=[out])
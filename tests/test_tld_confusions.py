@@ -0,0 +1,32 @@
+import os
+
+import typo_ranking as tr
+from conftest import REPO_DIR
+
+DL4_FILE = os.path.join(REPO_DIR, "filtered_domain_typos_dl4.csv")
+
+
+def test_learning_returns_new_model():
+    before = tr.DEFAULT_TLD_CONFUSIONS.to_json()
+    first = tr.learn_tld_confusions(DL4_FILE)
+    second = tr.learn_tld_confusions(DL4_FILE)
+    assert first is not tr.DEFAULT_TLD_CONFUSIONS
+    assert first.to_json() == second.to_json()  # 2回学習しても件数は倍にならない
+    assert tr.DEFAULT_TLD_CONFUSIONS.to_json() == before
+
+
+def test_learning_from_base_adds_counts():
+    once = tr.learn_tld_confusions(DL4_FILE)
+    twice = tr.learn_tld_confusions(DL4_FILE, base=once)
+    for i, j, count in once.to_json()["counts"]:
+        assert twice.counts[i][j] == 2 * count
+    assert once.to_json() == tr.learn_tld_confusions(DL4_FILE).to_json()
+
+
+def test_classification_uses_given_model():
+    model = tr.DEFAULT_TLD_CONFUSIONS.copy()
+    assert tr.is_tld_mismatch("example.com", "example.net", model) == (False, None)
+    model.observe("example.com", "example.net", count=model.min_count)
+    assert tr.is_tld_mismatch("example.com", "example.net", model) == (True, "com -> net")
+    assert tr.is_tld_mismatch("example.com", "example.net") == (False, None)
+    assert tr.classify_edit_ops_japanese("example.com", "example.net", confusions=model)["cause"] == "TLDミス"
@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import REPO_DIR
+from model_delta import export_delta
+from prerender_rankings import export_rankings, rank_with_typo_ranker
+from web_export import export_sharded, model_version
+
+NODE = shutil.which("node")
+HARNESS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "web_loader_harness.js")
+SCRIPT = os.path.join(REPO_DIR, "typo_ranking.js")
+
+pytestmark = pytest.mark.skipif(NODE is None, reason="node が無い")
+
+RANKER_CAUSES = {"入力漏れ", "二重入力", "隣接キー誤打", "ホモグリフ（視覚類似文字）", "左右対称キー誤打", "入力順序ミス", "TLDミス"}
+
+
+def run_harness(root, scenario):
+    proc = subprocess.run([NODE, HARNESS, SCRIPT, str(root), scenario], capture_output=True, text=True, encoding="utf-8", timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout)
+
+
+def load_data_json():
+    with open(os.path.join(REPO_DIR, "data.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def site(tmp_path):
+    """前の版 (old) から今の data.json (new) へのパッチを含む web_model/ を作る"""
+    new = load_data_json()
+    old = json.loads(json.dumps(new))
+    cause, table = next(iter(old["individual_weights"].items()))
+    key = next(iter(table))
+    table[key] = table[key] * 2 + 1e-7
+    old["K_POSITION_BOOST"] = 0.25
+
+    out_dir = tmp_path / "web_model"
+    export_sharded(old, str(out_dir))
+    assert export_delta(new, str(out_dir)) is not None
+    export_sharded(new, str(out_dir))
+    with open(tmp_path / "data.json", "w", encoding="utf-8") as f:
+        json.dump(new, f, ensure_ascii=False)
+    return tmp_path, old, new
+
+
+def write_cache(root, version, data):
+    with open(root / "cached.json", "w", encoding="utf-8") as f:
+        json.dump({"version": version, "data": data}, f, ensure_ascii=False)
+
+
+def test_first_ranking_loads_only_needed_shards():
+    result = run_harness(REPO_DIR, "sharded")
+    data = load_data_json()
+    for field, causes in result["loadedFirst"].items():
+        assert set(causes) == RANKER_CAUSES & set(data[field])
+    assert result["sameRanking"]
+    assert result["sameAsDataJson"]  # 残りのシャードも埋まり、並びは data.json と同じ
+
+
+def test_manifest_version_matches_js_and_python():
+    result = run_harness(REPO_DIR, "sharded")
+    assert result["version"] == result["dataJsonVersion"] == model_version(load_data_json())
+
+
+def test_full_load_is_cached_under_manifest_version(site):
+    root, _, new = site
+    result = run_harness(root, "load")
+    assert result["stored"] == {"version": model_version(new), "dataVersion": model_version(new)}
+
+
+def test_data_json_fallback_is_not_cached(site):
+    root, _, new = site
+    result = run_harness(root, "fallback")
+    assert "data.json" in result["requested"]
+    assert result["version"] == model_version(new)
+    assert result["stored"] is None
+
+
+def test_cached_model_is_patched(site):
+    root, old, new = site
+    write_cache(root, model_version(old), old)
+    result = run_harness(root, "load")
+    assert "web_model/manifest.json" not in result["requested"]
+    assert result["version"] == model_version(new)
+    assert result["stored"]["version"] == result["stored"]["dataVersion"] == model_version(new)
+
+
+def test_patched_result_is_checked_against_target(site):
+    root, old, new = site
+    corrupt = json.loads(json.dumps(old))
+    corrupt["TLD_COSTS"] = {}  # 版の名前は old のまま、中身だけ違う
+    write_cache(root, model_version(old), corrupt)
+    result = run_harness(root, "load")
+    assert "web_model/manifest.json" in result["requested"]  # パッチの結果を捨てて全体を読み直す
+    assert result["version"] == model_version(new)
+    assert result["stored"]["dataVersion"] == model_version(new)
+
+
+def assert_prerendered_matches_ranker(root):
+    rankings = run_harness(root, "prerendered")["rankings"]
+    assert rankings.pop("not-prerendered.example.com")["shard"] is None
+    assert rankings
+    for domain, r in rankings.items():
+        # 一覧に載っているかどうかで、ページに表示されるランキングが変わらない
+        assert r["shard"] == r["ranker"], domain
+
+
+def test_committed_rankings_match_typo_ranker():
+    assert_prerendered_matches_ranker(REPO_DIR)
+
+
+def test_exported_rankings_match_typo_ranker(tmp_path):
+    data = load_data_json()
+    data["K_POSITION_BOOST"] = 0.25  # 同梱の rankings/ とは別のモデルで書き出す
+    with open(tmp_path / "data.json", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    shutil.copy(os.path.join(REPO_DIR, "prerender_domains.txt"), tmp_path)
+    domains = [line.split("#")[0].strip() for line in (tmp_path / "prerender_domains.txt").read_text(encoding="utf-8").splitlines()]
+    export_rankings(rank_with_typo_ranker([d for d in domains if d], data), str(tmp_path / "rankings"), model_version=model_version(data))
+    assert_prerendered_matches_ranker(tmp_path)
@@ -0,0 +1,87 @@
+// typo_ranking.js のモデル読み込みを、ディレクトリのファイルを返す fetch で動かす (test_web_loader.py から実行する)
+//   node web_loader_harness.js <typo_ranking.js> <配信するディレクトリ> <シナリオ>
+//   sharded  : loadFullTypoModelData で分割モデルを読み込む
+//   load     : loadTypoModelData で読み込む (配信ディレクトリの cached.json があれば localStorage に入れておく)
+//   fallback : manifest.json が無い状態で loadTypoModelData を呼ぶ
+//   prerendered : prerender_domains.txt の各ドメインについて、事前計算済みランキング (rankings/) と
+//                 data.json を読んだ TypoRanker の結果を返す
+const fs = require('fs');
+const path = require('path');
+
+const [script, root, scenario] = process.argv.slice(2);
+const requested = [];
+const missing = new Set(scenario === 'fallback' ? ['web_model/manifest.json'] : []);
+
+globalThis.fetch = async (url) => {
+    requested.push(url);
+    const file = path.join(root, url);
+    if (missing.has(url) || !fs.existsSync(file)) {
+        return new Response(null, { status: 404 });
+    }
+    // 後から要求したファイルほど早く返す (取得し終えた順と並びが一致しないように)
+    await new Promise(resolve => setTimeout(resolve, Math.max(0, 50 - requested.length * 2)));
+    return new Response(fs.readFileSync(file));
+};
+
+const store = new Map();
+globalThis.localStorage = {
+    getItem: key => (store.has(key) ? store.get(key) : null),
+    setItem: (key, value) => store.set(key, String(value)),
+};
+const cachedFile = path.join(root, 'cached.json');
+if (fs.existsSync(cachedFile)) {
+    store.set('typoModel', fs.readFileSync(cachedFile, 'utf8'));
+}
+
+const src = fs.readFileSync(script, 'utf8');
+const api = new Function(src + '; return { TypoRanker, loadTypoModelData, loadFullTypoModelData, modelVersion, lookupPrerenderedRanking };')();
+const readJson = name => JSON.parse(fs.readFileSync(path.join(root, name), 'utf8'));
+const settle = () => new Promise(resolve => setTimeout(resolve, 200));
+
+async function sharded() {
+    const { data, version, complete } = await api.loadFullTypoModelData('web_model/manifest.json', 'data.json');
+    // 最初の順位付けの時点で取得済みの原因
+    const loadedFirst = {};
+    for (const field of ['individual_weights', 'positional_freqs']) {
+        loadedFirst[field] = Object.entries(data[field]).filter(([, table]) => table !== null).map(([cause]) => cause);
+    }
+    const ranking = new api.TypoRanker(data).typoGeneratorRanked('treasurefactory.co.jp', 20);
+    await complete;
+    const full = readJson('data.json');
+    return {
+        loadedFirst,
+        version,
+        dataJsonVersion: await api.modelVersion(full),
+        sameAsDataJson: JSON.stringify(data) === JSON.stringify(full),
+        sameRanking: JSON.stringify(ranking) === JSON.stringify(new api.TypoRanker(full).typoGeneratorRanked('treasurefactory.co.jp', 20)),
+    };
+}
+
+async function load() {
+    const data = await api.loadTypoModelData('web_model/manifest.json', 'data.json');
+    await settle();
+    const stored = store.has('typoModel') ? JSON.parse(store.get('typoModel')) : null;
+    return {
+        version: await api.modelVersion(data),
+        stored: stored && { version: stored.version, dataVersion: await api.modelVersion(stored.data) },
+    };
+}
+
+async function prerendered() {
+    const ranker = new api.TypoRanker(readJson('data.json'));
+    const domains = fs.readFileSync(path.join(root, 'prerender_domains.txt'), 'utf8').split('\n')
+        .map(line => line.split('#')[0].trim()).filter(Boolean);
+    const rankings = {};
+    for (const domain of [...domains, 'not-prerendered.example.com']) {
+        rankings[domain] = {
+            shard: await api.lookupPrerenderedRanking(domain, 20),
+            ranker: ranker.typoGeneratorRanked(domain, 20),
+        };
+    }
+    return { rankings };
+}
+
+(async () => {
+    const result = await (scenario === 'sharded' ? sharded() : scenario === 'prerendered' ? prerendered() : load());
+    console.log(JSON.stringify({ ...result, requested }));
+})().catch(e => { console.error(e); process.exit(1); });
@@ -0,0 +1,151 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from tld_trie import SuffixTrie
+
+# ===================================================================
+# -------- TLD取り違えモデル（サフィックス×サフィックスの件数行列）----------
+# ===================================================================
+
+# 観測データが無くても常にTLDミスとして扱う組（従来の tld_pairs と同じ）
+SEED_TLD_PAIRS = [
+    ('jp', 'co.jp'), ('co.jp', 'jp'),
+    ('com', 'co.jp'), ('co.jp', 'com'),
+    ('ne.jp', 'co.jp'), ('co.jp', 'ne.jp'),
+    ('go.jp', 'co.jp'), ('co.jp', 'go.jp')
+]
+
+# 観測からTLDミスとして採用する最小件数
+MIN_CONFUSION_COUNT = 2
+
+def _is_single_edit(a: str, b: str) -> bool:
+    """1文字の置換・挿入・削除・隣接入れ替えで一致するか"""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [k for k in range(len(a)) if a[k] != b[k]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    short, long_ = (a, b) if len(a) < len(b) else (b, a)
+    return any(long_[:k] + long_[k+1:] == short for k in range(len(long_)))
+
+
+class TldConfusionModel:
+    """
+    正しいサフィックス → 誤って入力されたサフィックス の件数行列
+    分類 (is_tld_mismatch) と生成 (typo_generator_ranked) の両方が同じトライ経由で参照する
+    """
+
+    def __init__(self, suffixes: Iterable[str], seed_pairs: Iterable[Tuple[str, str]] = SEED_TLD_PAIRS, min_count: int = MIN_CONFUSION_COUNT):
+        self.trie = SuffixTrie()
+        self.suffixes: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.counts: Dict[int, Counter] = defaultdict(Counter)  # 行: 正しいサフィックス, 列: 入力されたサフィックス
+        self.seeded: Dict[Tuple[int, int], int] = {}  # (行, 列) -> 登録順
+        self.min_count = min_count
+
+        for suffix in suffixes:
+            self.add_suffix(suffix)
+        for c_suffix, t_suffix in seed_pairs:
+            self.seeded.setdefault((self.add_suffix(c_suffix), self.add_suffix(t_suffix)), len(self.seeded))
+
+        self._alternatives = None
+
+    @classmethod
+    def from_json(cls, data: Dict, seed_pairs: Iterable[Tuple[str, str]] = SEED_TLD_PAIRS) -> "TldConfusionModel":
+        """to_json() の出力（model.bin / data.json の tld_confusions）から復元する"""
+        model = cls(data["suffixes"], seed_pairs, data.get("min_count", MIN_CONFUSION_COUNT))
+        for i, j, count in data.get("counts", []):
+            model.counts[i][j] += count
+        return model
+
+    def copy(self) -> "TldConfusionModel":
+        """同じサフィックス・件数を持つ別のモデル（学習で元のモデルを書き換えないため）"""
+        model = TldConfusionModel(self.suffixes, (), self.min_count)
+        model.seeded = dict(self.seeded)
+        for i, row in self.counts.items():
+            model.counts[i].update(row)
+        return model
+
+    def add_suffix(self, suffix: str) -> int:
+        suffix = SuffixTrie.normalize(suffix)
+        if suffix not in self.index:
+            self.index[suffix] = len(self.suffixes)
+            self.suffixes.append(suffix)
+            self.trie.add(suffix, self.index[suffix])
+        return self.index[suffix]
+
+    def split(self, domain: str) -> Tuple[str, str]:
+        base, suffix = self.trie.split(domain)
+        return base, suffix.lower()
+
+    def observe(self, correct_domain: str, typo_domain: str, count: int = 1) -> bool:
+        """ベース部分が同じでサフィックスだけ異なる組を件数行列に加える"""
+        correct_base, c_suffix = self.split(correct_domain)
+        typo_base, t_suffix = self.split(typo_domain)
+        if not c_suffix or not t_suffix or c_suffix == t_suffix or correct_base != typo_base:
+            return False
+        self.counts[self.index[c_suffix]][self.index[t_suffix]] += count
+        self._alternatives = None
+        return True
+
+    def count(self, c_suffix: str, t_suffix: str) -> int:
+        i = self.index.get(c_suffix)
+        j = self.index.get(t_suffix)
+        if i is None or j is None:
+            return 0
+        return self.counts[i][j] if i in self.counts else 0
+
+    def _is_confusion_index(self, i: int, j: int) -> bool:
+        if (i, j) in self.seeded:
+            return True
+        # 1文字違いのサフィックス (com -> co 等) は文字単位の原因（入力漏れ等）として扱う
+        return (i in self.counts and self.counts[i][j] >= self.min_count
+                and not _is_single_edit(self.suffixes[i], self.suffixes[j]))
+
+    def is_confusion(self, c_suffix: str, t_suffix: str) -> bool:
+        i = self.index.get(c_suffix)
+        j = self.index.get(t_suffix)
+        return i is not None and j is not None and self._is_confusion_index(i, j)
+
+    def alternatives(self, suffix: str) -> List[str]:
+        """suffix の取り違え先を件数の多い順に返す（生成用）"""
+        if self._alternatives is None:
+            table = defaultdict(list)
+            pairs = set(self.seeded)
+            for i, row in self.counts.items():
+                pairs.update((i, j) for j in row)
+            for i, j in pairs:
+                if self._is_confusion_index(i, j):
+                    table[i].append(j)
+            # 件数の多い順、同数は従来の組の並び → サフィックス番号順
+            def order(i, j):
+                count = self.counts[i][j] if i in self.counts else 0
+                return (-count, self.seeded.get((i, j), len(self.seeded)), j)
+            self._alternatives = {
+                self.suffixes[i]: [self.suffixes[j] for j in sorted(js, key=lambda j: order(i, j))]
+                for i, js in table.items()
+            }
+        return self._alternatives.get(suffix, [])
+
+    def mismatch(self, correct_domain: str, typo_domain: str) -> Tuple[bool, str]:
+        correct_base, c_suffix = self.split(correct_domain)
+        typo_base, t_suffix = self.split(typo_domain)
+        if not c_suffix or not t_suffix or correct_base != typo_base or not self.is_confusion(c_suffix, t_suffix):
+            return False, None
+        return True, f"{c_suffix} -> {t_suffix}"
+
+    def to_json(self) -> Dict:
+        """data.json 向け（typo_ranking.js が同じ判定を行うための情報）"""
+        pairs = set(self.seeded)
+        for i, row in self.counts.items():
+            pairs.update((i, j) for j in row)
+        return {
+            "suffixes": self.suffixes,
+            "confusions": {
+                suffix: self.alternatives(suffix) for suffix in self.suffixes if self.alternatives(suffix)
+            },
+            "counts": [[i, j, self.counts[i][j]] for i, j in sorted(pairs) if i in self.counts and self.counts[i][j]],
+            "min_count": self.min_count
+        }
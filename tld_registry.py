@@ -0,0 +1,151 @@
+import os
+import re
+import sys
+import threading
+from typing import Callable, FrozenSet, List, NamedTuple
+
+# ===================================================================
+# -------- TLD一覧（ローカルスナップショット + バックグラウンド更新）----------
+# ===================================================================
+
+IANA_TLDS_URL = "https://data.iana.org/TLD/tlds-alpha-by-domain.txt"
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tld_registry.txt")
+
+# 組み込みのTLD（スナップショットが無い場合の最低限）
+BUILTIN_TLDS = frozenset({
+    'com', 'net', 'org', 'edu', 'gov', 'mil', 'int', 'jp', 'co.jp', 'ne.jp',
+    'ai', 'io', 'co', 'me', 'info', 'biz', 'us', 'uk', 'ca', 'de', 'fr', 'au',
+    'ntt', 'google', 'amazon', 'shop', 'blog', 'tech', 'dev', 'app', 'xyz'
+})
+
+class TldRegistry(NamedTuple):
+    version: int             # IANAファイル先頭の "# Version YYYYMMDDNN"。不明は0
+    tlds: FrozenSet[str]     # 小文字のTLD（IDNは xn-- 表記）
+
+EMPTY_REGISTRY = TldRegistry(0, frozenset())
+
+def parse_registry(text: str) -> TldRegistry:
+    """IANA の tlds-alpha-by-domain.txt 形式を読み込む"""
+    version = 0
+    tlds = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#'):
+            m = re.match(r'#\s*Version\s+(\d+)', line)
+            if m and not version:
+                version = int(m.group(1))
+            continue
+        tlds.add(line.lower())
+    return TldRegistry(version, frozenset(tlds))
+
+def load_snapshot(path: str = SNAPSHOT_FILE) -> TldRegistry:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return parse_registry(f.read())
+    except FileNotFoundError:
+        print(f"[WARN] TLDスナップショット ({path}) が見つかりません。組み込みのTLDのみ使用します。")
+        return EMPTY_REGISTRY
+
+def write_snapshot(registry: TldRegistry, path: str = SNAPSHOT_FILE, source: str = "") -> None:
+    """スナップショットを書き出す（一時ファイル経由で置き換えるため、読み込み中のプロセスに影響しない）"""
+    lines = [f"# Version {registry.version}"]
+    if source:
+        lines.append(f"# 取得元: {source}")
+    lines.extend(sorted(tld.upper() for tld in registry.tlds))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+
+# -------------------------------------------------------------------
+# 現在のTLD一覧（不変な TldRegistry を丸ごと差し替える）
+# -------------------------------------------------------------------
+
+_current = None  # 最初に参照されたときにスナップショットを読む（import を軽くするため）
+_listeners: List[Callable[[TldRegistry], None]] = []
+
+def current_registry() -> TldRegistry:
+    global _current
+    if _current is None:
+        _current = load_snapshot()
+    return _current
+
+def on_update(callback: Callable[[TldRegistry], None]) -> None:
+    """一覧が差し替わったときに呼ばれる関数を登録する（TLD_LOOKUP の再構築など）"""
+    _listeners.append(callback)
+
+def swap_registry(registry: TldRegistry) -> None:
+    global _current
+    _current = registry
+    for callback in list(_listeners):
+        callback(registry)
+
+def refresh_in_background(url: str = IANA_TLDS_URL, timeout: float = 5.0) -> threading.Thread:
+    """最新のTLD一覧を別スレッドで取得し、取得できた場合のみ差し替える。呼び出し元は待たない"""
+    def worker():
+        import urllib.request  # 起動時間を増やさないよう、取得するときだけ読み込む
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                registry = parse_registry(response.read().decode('utf-8'))
+        except Exception as e:
+            print(f"[WARN] TLDリストの取得に失敗しました。スナップショット (Version {current_registry().version}) を使用します: {e}")
+            return
+
+        if not registry.tlds:
+            print("[WARN] 取得したTLDリストが空のため、差し替えません。")
+            return
+        if registry.version and registry.version <= current_registry().version:
+            return
+
+        swap_registry(registry)
+        print(f"[INFO] 最新のTLDリストに差し替えました（Version {registry.version}, 総数: {len(registry.tlds)}個）")
+
+    thread = threading.Thread(target=worker, name="tld-registry-refresh", daemon=True)
+    thread.start()
+    return thread
+
+def update_snapshot_from_file(source_path: str, snapshot_path: str = SNAPSHOT_FILE, force: bool = False) -> TldRegistry:
+    """ローカルに置いた tlds-alpha-by-domain.txt でスナップショットを更新する"""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        registry = parse_registry(f.read())
+    if not registry.tlds:
+        raise ValueError(f"TLDが1件も含まれていません: {source_path}")
+
+    existing = load_snapshot(snapshot_path) if os.path.exists(snapshot_path) else EMPTY_REGISTRY
+    if not force and registry.version and registry.version < existing.version:
+        raise ValueError(f"既存のスナップショット (Version {existing.version}) より古いファイルです (Version {registry.version})。--force で上書きできます。")
+
+    write_snapshot(registry, snapshot_path, source=os.path.basename(source_path))
+    return registry
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="TLD一覧スナップショットの確認・更新")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    update = sub.add_parser("update", help="ローカルの tlds-alpha-by-domain.txt からスナップショットを更新")
+    update.add_argument("source")
+    update.add_argument("--snapshot", default=SNAPSHOT_FILE)
+    update.add_argument("--force", action="store_true", help="古いバージョンでも上書きする")
+
+    show = sub.add_parser("show", help="スナップショットのバージョンと件数を表示")
+    show.add_argument("--snapshot", default=SNAPSHOT_FILE)
+
+    args = parser.parse_args()
+
+    if args.command == "update":
+        try:
+            registry = update_snapshot_from_file(args.source, args.snapshot, force=args.force)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] スナップショットを更新できませんでした: {e}")
+            sys.exit(1)
+        print(f"[SUCCESS] スナップショットを更新しました: {args.snapshot}（Version {registry.version}, {len(registry.tlds)}個）")
+    else:
+        registry = load_snapshot(args.snapshot)
+        print(f"{args.snapshot}: Version {registry.version}, {len(registry.tlds)}個")
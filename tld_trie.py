@@ -0,0 +1,150 @@
+import re
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+# ===================================================================
+# -------- サフィックストライ（ラベルを末尾から逆順にたどる）----------
+# ===================================================================
+
+class _Node:
+    __slots__ = ("children", "suffix", "value")
+
+    def __init__(self):
+        self.children = {}
+        self.suffix = None  # このノードで終わるサフィックス (例: "co.jp")。途中ノードは None
+        self.value = None
+
+
+class SuffixTrie:
+    """
+    TLD・公開サフィックスを逆順ラベルで格納するトライ
+    例: "co.jp" は root -> "jp" -> "co" に格納され、ドメインの末尾から1回たどるだけで最長一致が求まる
+    """
+
+    def __init__(self, suffixes: Iterable[str] = ()):
+        self.root = _Node()
+        self.size = 0
+        for suffix in suffixes:
+            self.add(suffix)
+
+    @staticmethod
+    def normalize(suffix: str) -> str:
+        return suffix.strip().lower().lstrip('.')
+
+    def add(self, suffix: str, value: Any = None) -> None:
+        suffix = self.normalize(suffix)
+        if not suffix:
+            return
+        node = self.root
+        for label in reversed(suffix.split('.')):
+            node = node.children.setdefault(label, _Node())
+        if node.suffix is None:
+            self.size += 1
+        node.suffix = suffix
+        if value is not None:
+            node.value = value
+
+    def __contains__(self, suffix: str) -> bool:
+        node = self.root
+        for label in reversed(self.normalize(suffix).split('.')):
+            node = node.children.get(label)
+            if node is None:
+                return False
+        return node.suffix is not None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _walk(self, domain: str, keep_base: bool) -> Tuple[Optional[_Node], int]:
+        """最長一致したノードと、一致したラベル数を返す"""
+        labels = domain.lower().split('.')
+        limit = len(labels) - 1 if keep_base else len(labels)
+        node = self.root
+        best, best_depth = None, 0
+        for depth in range(1, limit + 1):
+            node = node.children.get(labels[-depth])
+            if node is None:
+                break
+            if node.suffix is not None:
+                best, best_depth = node, depth
+        return best, best_depth
+
+    def longest_match(self, domain: str) -> Optional[Tuple[str, Any]]:
+        """ドメイン末尾に最長一致するサフィックスと、その値を返す（ベース部分のラベルを1つ以上残す）"""
+        node, _ = self._walk(domain, keep_base=True)
+        if node is None:
+            return None
+        return node.suffix, node.value
+
+    def split(self, domain: str) -> Tuple[str, str]:
+        """ドメインを (ベース部分, サフィックス) に分ける。一致しなければサフィックスは空文字"""
+        node, depth = self._walk(domain, keep_base=True)
+        if node is None:
+            return domain, ''
+        labels = domain.split('.')
+        return '.'.join(labels[:-depth]), '.'.join(labels[-depth:])
+
+
+# ===================================================================
+# -------- TLD費用・実在チェック（1回の走査で 最長サフィックス / 価格 / 実在 を返す）----------
+# ===================================================================
+
+UNKNOWN_COST = "費用不明"
+
+class TldInfo(NamedTuple):
+    suffix: str            # 最長一致したサフィックス (例: "co.jp")。一致なしは空文字
+    cost: str              # tld_prices.json の表記 (例: "4,378円/年")
+    price: Optional[int]   # 年額（円）。"要問い合わせ" 等の数値化できないものは None
+    valid: bool            # 最上位ラベルが実在TLDか
+
+def registrable_domain(domain: str, suffix: str) -> str:
+    """サフィックスにラベルを1つ加えた、登録の単位になるドメイン（例: "artra-group.coo.jp" と "jp" -> "coo.jp"）"""
+    labels = domain.split('.')
+    depth = len(suffix.split('.')) + 1 if suffix else len(labels)
+    return '.'.join(labels[-depth:])
+
+def parse_price(cost: str) -> Optional[int]:
+    """'3,124円/年' -> 3124。数値が無い表記（要問い合わせ等）は None"""
+    if not cost or '円' not in cost:
+        return None
+    digits = re.sub(r'[^\d]', '', cost.split('円', 1)[0])
+    return int(digits) if digits else None
+
+
+class TldLookup:
+    """tld_prices.json とTLD一覧から作るサフィックストライ。大量の候補の費用計算に使う"""
+
+    def __init__(self, tld_costs: Dict[str, str], valid_tlds: Iterable[str] = ()):
+        self.trie = SuffixTrie()
+        for tld in valid_tlds:
+            self.add_tld(tld)
+        for suffix, cost in tld_costs.items():
+            self.trie.add(suffix, (cost, parse_price(cost)))
+
+    def add_tld(self, tld: str) -> None:
+        """実在TLD（価格不明）を追加する。既に価格があるものはそのまま"""
+        if tld not in self.trie:
+            self.trie.add(tld)
+
+    def lookup(self, domain: str) -> TldInfo:
+        labels = domain.lower().split('.')
+        node = self.trie.root
+        valid = False
+        best, best_value = '', None
+        for depth in range(1, len(labels)):
+            node = node.children.get(labels[-depth])
+            if node is None:
+                break
+            if node.suffix is not None:
+                if depth == 1:
+                    valid = True
+                best, best_value = node.suffix, node.value
+        if best_value is None:
+            return TldInfo(best, UNKNOWN_COST, None, valid)
+        cost, price = best_value
+        return TldInfo(best, cost, price, valid)
+
+    def cost(self, domain: str) -> str:
+        return self.lookup(domain).cost
+
+    def is_valid(self, domain: str) -> bool:
+        return self.lookup(domain).valid
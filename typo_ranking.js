@@ -8,6 +8,7 @@ class TypoRanker {
     constructor(data) {
         // data.json から渡されたデータを格納
         this.keyboardAdjacent = data.keyboard_adjacent;
+        this.keyboardLikelihood = data.keyboard_likelihood || {}; // 隣接キーごとの起こりやすさ (隣のキーで1)
         this.symmetricKeyPairs = data.symmetric_key_pairs; 
         this.homoglyphsForGenerator = data.homoglyphs_for_generator;
         this.individualWeights = data.individual_weights;
@@ -15,6 +16,18 @@ class TypoRanker {
         this.totalDl1Count = data.total_dl1_count || 1;    // 正規化用
         this.kPositionBoost = data.K_POSITION_BOOST || 0.5;
         this.tldCosts = data.TLD_COSTS || {}; 
+
+        // TLD取り違えモデル (Pythonで観測データから学習したもの。古いdata.jsonでは従来の固定ペア)
+        const tldConfusions = data.tld_confusions || {};
+        this.tldConfusionPairs = tldConfusions.confusions || {
+            'jp': ['co.jp'], 'co.jp': ['jp', 'com', 'ne.jp', 'go.jp'],
+            'com': ['co.jp'], 'ne.jp': ['co.jp'], 'go.jp': ['co.jp']
+        };
+        this.tldSuffixes = new Set(tldConfusions.suffixes || Object.keys(this.tldCosts).map(t => t.replace(/^\./, '')));
+        for (const [cSuffix, tSuffixes] of Object.entries(this.tldConfusionPairs)) {
+            this.tldSuffixes.add(cSuffix);
+            tSuffixes.forEach(t => this.tldSuffixes.add(t));
+        }
     }
 
     // ======================================================================
@@ -23,15 +36,7 @@ class TypoRanker {
 
     /** * 入力を正規化する (小文字化、全角→半角、不要文字削除) */
     sanitizeInput(input) {
-        if (!input) return "";
-        let domain = input.toLowerCase();
-        // 全角英数 -> 半角
-        domain = domain.replace(/[Ａ-Ｚａ-ｚ０-９]/g, function(s) {
-            return String.fromCharCode(s.charCodeAt(0) - 0xFEE0);
-        });
-        // 使用可能文字(a-z, 0-9, ., -)以外を削除
-        domain = domain.replace(/[^a-z0-9.-]/g, '');
-        return domain;
+        return sanitizeDomainInput(input);
     }
 
     /**
@@ -159,6 +164,12 @@ class TypoRanker {
         return ['', ''];
     }
 
+    /** 隣接キー誤打の起こりやすさ (keyboard_layouts.py の likelihood。古いdata.jsonでは1) */
+    keyLikelihood(c1, c2) {
+        const row = this.keyboardLikelihood[c1];
+        return row && row[c2] !== undefined ? row[c2] : 1.0;
+    }
+
     /** 転置ペアを特定する */
     getTransposedPair(correct, typo) {
         if (correct.length !== typo.length || this._damerauLevenshteinDistance(correct, typo) !== 1) return null;
@@ -171,28 +182,28 @@ class TypoRanker {
         return null;
     }
     
-    /** TLDミス判定 (特定のペアのみ) */
+    /** ドメインを [ベース部分, サフィックス] に分ける (既知のサフィックスに最長一致) */
+    splitSuffix(domain) {
+        const labels = domain.split('.');
+        for (let depth = labels.length - 1; depth >= 1; depth--) {
+            const suffix = labels.slice(-depth).join('.');
+            if (this.tldSuffixes.has(suffix)) {
+                return [labels.slice(0, -depth).join('.'), suffix];
+            }
+        }
+        return [domain, ''];
+    }
+
+    /** TLDミス判定 (取り違えモデルに含まれるペアのみ) */
     isTldMismatch(correctDomain, typoDomain) {
         if (!correctDomain.includes('.') || !typoDomain.includes('.')) return [false, null];
-        
-        const TLD_PAIRS = {
-            'jp': ['co.jp'], 'co.jp': ['jp', 'com', 'ne.jp', 'go.jp'],
-            'com': ['co.jp'], 'ne.jp': ['co.jp'], 'go.jp': ['co.jp']
-        };
 
-        for (const cPattern in TLD_PAIRS) {
-            for (const tPattern of TLD_PAIRS[cPattern]) {
-                if (correctDomain.endsWith(cPattern) && typoDomain.endsWith(tPattern)) {
-                    const correctBase = correctDomain.slice(0, -cPattern.length);
-                    const typoBase = typoDomain.slice(0, -tPattern.length);
-                    
-                    if (correctBase === typoBase) {
-                        const correctTld = correctDomain.substring(correctBase.length);
-                        const typoTld = typoDomain.substring(typoBase.length);
-                        return [true, `${correctTld} -> ${typoTld}`];
-                    }
-                }
-            }
+        const [correctBase, correctTld] = this.splitSuffix(correctDomain);
+        const [typoBase, typoTld] = this.splitSuffix(typoDomain);
+        if (!correctTld || !typoTld || correctBase !== typoBase) return [false, null];
+
+        if ((this.tldConfusionPairs[correctTld] || []).includes(typoTld)) {
+            return [true, `${correctTld} -> ${typoTld}`];
         }
         return [false, null];
     }
@@ -252,27 +263,11 @@ class TypoRanker {
             }
         }
         
-        // 7. TLDミス生成
-        const parts = domain.split('.');
-        if (parts.length > 1) {
-            const currentTld = parts[parts.length - 1];
-            const fullTld = parts.length >= 2 && (parts[parts.length-2] === 'co' || parts[parts.length-2] === 'ne' || parts[parts.length-2] === 'go' || parts[parts.length-2] === 'ac') 
-                            ? parts.slice(-2).join('.') 
-                            : currentTld;
-
-            const TLD_GEN_PAIRS = {
-                'jp': ['co.jp'], 'co.jp': ['jp', 'com', 'ne.jp', 'go.jp'],
-                'com': ['co.jp'], 'net': ['com', 'co.jp']
-            };
-
-            // baseDomainの計算
-            let baseDomain = domain.slice(0, -fullTld.length);
-            if (baseDomain.endsWith('.')) baseDomain = baseDomain.slice(0, -1);
-
-            if (TLD_GEN_PAIRS[fullTld]) {
-                for (const altTld of TLD_GEN_PAIRS[fullTld]) {
-                    addVariant(`${baseDomain}.${altTld}`, "TLDミス");
-                }
+        // 7. TLDミス生成 (判定と同じ取り違えモデルから生成)
+        const [baseDomain, fullTld] = this.splitSuffix(domain);
+        if (fullTld) {
+            for (const altTld of (this.tldConfusionPairs[fullTld] || [])) {
+                addVariant(`${baseDomain}.${altTld}`, "TLDミス");
             }
         }
 
@@ -333,6 +328,9 @@ class TypoRanker {
                         if (W_individual === 0.0 && c1 && c2 && c1 !== '（空）' && c2 !== '（空）') {
                             W_individual = weights[c2 + c1] || 0.0;
                         }
+                        if (cause === "隣接キー誤打") {
+                            W_individual *= this.keyLikelihood(c1, c2);
+                        }
                     }
 
                     // ベーススコア加算
@@ -361,7 +359,8 @@ class TypoRanker {
                          const iRelativeEnd = L - 1 - iStart;
                          const charLower = posChar; 
                          const freqCount = this.positionalFreqs[tempCause]?.[charLower]?.[iRelativeEnd] || 0;
-                         const positionBonusValue = freqCount / this.totalDl1Count;
+                         let positionBonusValue = freqCount / this.totalDl1Count;
+                         if (tempCause === "隣接キー誤打") positionBonusValue *= this.keyLikelihood(c1, c2);
                          finalScore += positionBonusValue * this.kPositionBoost;
                     }
                 } 
@@ -400,4 +399,264 @@ class TypoRanker {
 
         return finalRankedResults.slice(0, topN);
     }
-}
\ No newline at end of file
+}
+
+// ======================================================================
+// モデルデータの読み込み
+// ======================================================================
+
+/**
+ * モデルデータを読み込む
+ * localStorage に前回のモデルがあれば web_model/delta/ のパッチで最新版にし、
+ * 無ければ web_model/manifest.json から順位付けに使う原因のシャードだけを取得して返し (残りは後から埋める)、
+ * それも無ければ data.json を読む
+ * (返す値はどれも data.json と同じ構造)
+ */
+async function loadTypoModelData(manifestUrl = 'web_model/manifest.json', fallbackUrl = 'data.json') {
+    const baseUrl = manifestUrl.slice(0, manifestUrl.lastIndexOf('/') + 1);
+    let index = null;
+    try {
+        const response = await fetch(baseUrl + 'delta/index.json', { cache: 'no-cache' });
+        if (response.ok) {
+            index = await response.json();
+            const cached = await loadCachedTypoModel(index, baseUrl);
+            if (cached) {
+                return cached;
+            }
+        }
+    } catch (e) {
+        console.warn("差分パッチを使用できないため、モデル全体を読み込みます:", e);
+    }
+
+    // 保存する版は実際に読み込んだマニフェストのもの (index.latest とは限らない)。data.json を読んだ場合は版が分からないので保存しない
+    const { data, version, complete } = await loadFullTypoModelData(manifestUrl, fallbackUrl);
+    complete.then(() => {
+        if (version) {
+            storeCachedTypoModel(version, data);
+        }
+    }).catch(e => console.warn("一部のシャードを読み込めませんでした:", e));
+    return data;
+}
+
+const TYPO_MODEL_CACHE_KEY = 'typoModel';
+
+/** localStorage のモデルを index.latest まで更新して返す。追従できなければ null */
+async function loadCachedTypoModel(index, baseUrl) {
+    if (typeof localStorage === 'undefined') {
+        return null;
+    }
+    const raw = localStorage.getItem(TYPO_MODEL_CACHE_KEY);
+    if (!raw) {
+        return null;
+    }
+    let { version, data } = JSON.parse(raw);
+    const maxChain = index.max_chain || 5;
+    for (let steps = 0; version !== index.latest; steps++) {
+        const entry = index.patches[version];
+        if (!entry || steps >= maxChain) {
+            return null;
+        }
+        const patch = await fetchModelShard(baseUrl + 'delta/' + entry.file);
+        if (patch.base !== version || patch.target !== entry.target) {
+            return null;
+        }
+        data = applyModelPatch(data, patch.ops);
+        // パッチを当てた結果がパッチの版と一致しなければ (手元のモデルが壊れている等)、全体を取り直す
+        if (await modelVersion(data) !== patch.target) {
+            return null;
+        }
+        version = patch.target;
+    }
+    storeCachedTypoModel(version, data);
+    return data;
+}
+
+function storeCachedTypoModel(version, data) {
+    if (typeof localStorage === 'undefined') {
+        return;
+    }
+    try {
+        localStorage.setItem(TYPO_MODEL_CACHE_KEY, JSON.stringify({ version, data }));
+    } catch (e) {
+        // 容量超過などは無視する (次回も全体を読み込む)
+    }
+}
+
+/** コードポイント順の比較 (Python の sorted と同じ順。sort() の既定は UTF-16 の単位順) */
+function compareCodePoints(a, b) {
+    const n = Math.min(a.length, b.length);
+    for (let i = 0; i < n; i++) {
+        const x = a.codePointAt(i);
+        const y = b.codePointAt(i);
+        if (x !== y) {
+            return x - y;
+        }
+        if (x > 0xffff) {
+            i++;
+        }
+    }
+    return a.length - b.length;
+}
+
+/** 版のハッシュに使う正規形 (web_export.py の canonical_json と同じ文字列) */
+function canonicalJson(value) {
+    if (Array.isArray(value)) {
+        return '[' + value.map(canonicalJson).join(',') + ']';
+    }
+    if (value !== null && typeof value === 'object') {
+        return '{' + Object.keys(value).sort(compareCodePoints)
+            .map(key => JSON.stringify(key) + ':' + canonicalJson(value[key])).join(',') + '}';
+    }
+    return JSON.stringify(value);
+}
+
+/** モデルの内容ハッシュ (web_export.py の model_version と同じ値)。計算できない環境では null */
+async function modelVersion(data) {
+    if (typeof crypto === 'undefined' || !crypto.subtle) {
+        return null;
+    }
+    const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(canonicalJson(data)));
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('').slice(0, 16);
+}
+
+/** model_delta.py の ["set", パス, 値] / ["del", パス] を順に当てる */
+function applyModelPatch(data, ops) {
+    for (const [op, path, value] of ops) {
+        if (path.length === 0) {
+            data = value;
+            continue;
+        }
+        let parent = data;
+        for (const key of path.slice(0, -1)) {
+            if (parent[key] === undefined) {
+                parent[key] = {};
+            }
+            parent = parent[key];
+        }
+        const last = path[path.length - 1];
+        if (op === 'set') {
+            parent[last] = value;
+        } else if (op === 'del') {
+            delete parent[last];
+        } else {
+            throw new Error(`不明なパッチ操作です: ${op}`);
+        }
+    }
+    return data;
+}
+
+/** TypoRanker.typoGeneratorRanked が生成・採点する原因 (スペルミス・ドット抜けのシャードは順位付けに使わない) */
+const TYPO_RANKER_CAUSES = new Set([
+    "入力漏れ", "二重入力", "隣接キー誤打", "ホモグリフ（視覚類似文字）", "左右対称キー誤打", "入力順序ミス", "TLDミス"
+]);
+
+/**
+ * manifest.json + シャード、または data.json からモデルを読み込む
+ * 返す data には TYPO_RANKER_CAUSES のシャードがそろっており、残りは complete が解決するまでに埋まる
+ * (未取得の原因は null。原因の並びは取得し終えた順ではなくマニフェストの順)
+ * version は読み込んだマニフェストの版 (data.json から読んだ場合は null)
+ */
+async function loadFullTypoModelData(manifestUrl, fallbackUrl) {
+    try {
+        // マニフェストは毎回サーバーに確認する。シャードは名前が内容のハッシュなのでキャッシュを使い回せる
+        const response = await fetch(manifestUrl, { cache: 'no-cache' });
+        if (response.ok) {
+            const manifest = await response.json();
+            const baseUrl = manifestUrl.slice(0, manifestUrl.lastIndexOf('/') + 1);
+            const data = {};
+            const first = [];
+            const rest = [];
+            for (const [field, causes] of Object.entries(manifest.shards)) {
+                data[field] = {};
+                for (const [cause, name] of Object.entries(causes)) {
+                    data[field][cause] = null;
+                    const load = () => fetchModelShard(baseUrl + name).then(table => { data[field][cause] = table; });
+                    (TYPO_RANKER_CAUSES.has(cause) ? first : rest).push(load);
+                }
+            }
+            await Promise.all(first.map(load => load()));
+            Object.assign(data, manifest.core);
+            return { data, version: manifest.version, complete: Promise.all(rest.map(load => load())) };
+        }
+    } catch (e) {
+        console.warn("分割モデルの読み込みに失敗したため data.json を使用します:", e);
+    }
+
+    const response = await fetch(fallbackUrl);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return { data: await response.json(), version: null, complete: Promise.resolve() };
+}
+
+/** シャードを1つ取得する (DecompressionStream が使えれば gzip 済みのファイルを展開して使う) */
+async function fetchModelShard(url) {
+    if (typeof DecompressionStream !== 'undefined') {
+        try {
+            const response = await fetch(url + '.gz');
+            if (response.ok) {
+                const stream = response.body.pipeThrough(new DecompressionStream('gzip'));
+                return JSON.parse(await new Response(stream).text());
+            }
+        } catch (e) {
+            // サーバー側で展開済みの場合などは無圧縮版を取りに行く
+        }
+    }
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+}
+
+// ======================================================================
+// 事前計算済みランキング (prerender_rankings.py が rankings/ に書き出したもの)
+// ======================================================================
+
+/** 入力の正規化 (prerender_rankings.py の sanitize_domain と同じ) */
+function sanitizeDomainInput(input) {
+    if (!input) return "";
+    let domain = input.toLowerCase();
+    // 全角英数 -> 半角
+    domain = domain.replace(/[Ａ-Ｚａ-ｚ０-９]/g, function(s) {
+        return String.fromCharCode(s.charCodeAt(0) - 0xFEE0);
+    });
+    // 使用可能文字(a-z, 0-9, ., -)以外を削除
+    domain = domain.replace(/[^a-z0-9.-]/g, '');
+    return domain;
+}
+
+/** FNV-1a (32bit) によるシャード番号 (prerender_rankings.py の shard_of と同じ) */
+function prerenderShardOf(domain, shardCount) {
+    let h = 0x811C9DC5;
+    for (const b of new TextEncoder().encode(domain)) {
+        h = Math.imul(h ^ b, 0x01000193) >>> 0;
+    }
+    return h % shardCount;
+}
+
+let prerenderIndexPromise = null;
+
+/**
+ * 事前計算済みのランキングを返す。一覧に無いドメイン・取得できない場合は null
+ * (null のときは TypoRanker で生成する)
+ */
+async function lookupPrerenderedRanking(rawInput, topN = 20, baseUrl = 'rankings/') {
+    const domain = sanitizeDomainInput(rawInput);
+    try {
+        if (!prerenderIndexPromise) {
+            prerenderIndexPromise = fetch(baseUrl + 'index.json', { cache: 'no-cache' })
+                .then(response => response.ok ? response.json() : null);
+        }
+        const index = await prerenderIndexPromise;
+        if (!index || index.format !== 1) return null;
+        const name = index.shards[prerenderShardOf(domain, index.shard_count)];
+        if (!name) return null;
+        const shard = await fetchModelShard(baseUrl + name);
+        return shard[domain] ? shard[domain].slice(0, topN) : null;
+    } catch (e) {
+        console.warn("事前計算済みランキングを取得できませんでした:", e);
+        prerenderIndexPromise = null;
+        return null;
+    }
+}
@@ -1,22 +1,36 @@
+import hashlib
 import os
 import re
+import sys
 import Levenshtein
 from pyxdameraulevenshtein import damerau_levenshtein_distance
 import pandas as pd
 from difflib import SequenceMatcher
 import difflib
 from collections import defaultdict, Counter
+from itertools import islice
 import json
-from typing import Dict, Tuple, Any, List, Set
-import urllib.request
+from typing import Dict, List, Set
+from confusables import load_confusables_index
+from intermediate_io import (DOMAIN_COLUMNS, add_domain_columns, intermediate_path, read_domain_pairs,
+                             read_intermediate, resolve_format, write_intermediate)
+from keyboard_layouts import compile_adjacency_layout, get_layout, register_layout
+from tld_confusion import TldConfusionModel
+from tld_trie import TldLookup
+import tld_registry
+from model_artifact import read_model, to_web_json, write_model
+from model_delta import DELTA_DIR, DELTA_INDEX_FILE, export_delta, model_version
+from prerender_rankings import (PRERENDER_DIR, PRERENDER_DOMAINS_FILE, PRERENDER_INDEX_FILE, export_rankings, load_domain_list,
+                                rank_with_typo_ranker)
+from checkpoint import CHECKPOINT_ROWS, Checkpoint
+from profiling import PROFILER, peak_rss_mb, profiled
+from stage_cache import StageCache, file_sha256
+from typo_runtime import generate_ranked
+from web_export import MANIFEST_FILE, export_sharded
 
 # ====================================================================-
 # --------タイポドメイン抽出----------
 
-# ドメイン部抽出
-def extract_domain(email):
-    return email.split('@')[1] if '@' in email else ''
-
 # 2つの文字列間の異なる部分を抽出
 def get_mismatched_part(correct, input_):
     matcher = SequenceMatcher(None, correct, input_)
@@ -26,35 +40,70 @@ def get_mismatched_part(correct, input_):
             mismatched.append(input_[j1:j2])
     return ''.join(mismatched)
 
-def filter_domain_differences_with_mismatch(input_path, output_path, threshold=5):  # タイポデータの抽出と整形
-    df = pd.read_csv(input_path)  # CSV読み込み
-
-    # ドメイン部の抽出
-    df["correct_domain"] = df["correct_address"].astype(str).apply(extract_domain)
-    df["input_domain"] = df["input_address"].astype(str).apply(extract_domain)
-
-    # Damerau-Levenshtein距離を計算
-    df["domain_edit_distance"] = df.apply(
-        lambda row: damerau_levenshtein_distance(row["correct_domain"], row["input_domain"]),
-        axis=1
-    )
-
-    # ドメイン部が異なるもののみ抽出
-    filtered_df = df[
-        (df["domain_edit_distance"] > 0) &
-        (df["domain_edit_distance"] <= threshold)
-    ].reset_index(drop=True)
+# 取り込みに使う列（edit_distance / mismatched_part はドメイン部から計算し直すので読まない）
+INGEST_COLUMNS = ["user_id", "step_id", "correct_address", "input_address"]
+INGEST_CHUNK_ROWS = 200_000  # 一度に読み込む行数（これでメモリ使用量の上限が決まる）
+
+def domain_column(addresses):
+    """メールアドレスの列から、ドメイン部の category 列を作る（同じドメインは1つの文字列を共有する）"""
+    return addresses.astype(str).str.split('@').str[1].fillna('').astype("category")
+
+@profiled("filter_domain_differences_with_mismatch")
+def filter_domain_differences_with_mismatch(input_path, output_path, threshold=5, chunk_rows=INGEST_CHUNK_ROWS, extra_paths=()):  # タイポデータの抽出と整形
+    # extra_paths: 同じ列の追加の入力（mta_log_ingest.py の mta_events.csv 等）。無いファイルは読み飛ばす
+    input_paths = [input_path] + [p for p in extra_paths if os.path.exists(p)]
+    distance_cache = {}  # (正しいドメイン, 入力ドメイン) -> DL距離。行数ではなく異なる組の数だけ計算する
+    kept = []
+    total_rows = 0
+
+    # 必要な列だけを分割して読み込み、タイポの行だけを残す
+    chunks = (chunk for path in input_paths for chunk in pd.read_csv(path, usecols=INGEST_COLUMNS, chunksize=chunk_rows))
+    for chunk in chunks:
+        total_rows += len(chunk)
+        for col in ("user_id", "step_id"):
+            chunk[col] = pd.to_numeric(chunk[col], downcast="integer")
+
+        # ドメイン部の抽出
+        chunk["correct_domain"] = domain_column(chunk["correct_address"])
+        chunk["input_domain"] = domain_column(chunk["input_address"])
+
+        # Damerau-Levenshtein距離を計算
+        distances = []
+        for pair in zip(chunk["correct_domain"], chunk["input_domain"]):
+            if pair not in distance_cache:
+                distance_cache[pair] = damerau_levenshtein_distance(*pair)
+            distances.append(distance_cache[pair])
+        distances = pd.Series(distances, index=chunk.index, dtype="int64")
+
+        # ドメイン部が異なるもののみ抽出
+        mask = (distances > 0) & (distances <= threshold)
+        kept.append(chunk[mask].assign(edit_distance=pd.to_numeric(distances[mask], downcast="integer")))
+
+    columns = INGEST_COLUMNS + DOMAIN_COLUMNS + ["edit_distance"]
+    filtered_df = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=columns)
+    for col in DOMAIN_COLUMNS:
+        filtered_df[col] = filtered_df[col].astype("category")  # 分割ごとのカテゴリを1つにまとめる
+
+    # 差分部分の抽出（これも異なる組ごとに1回だけ）
+    mismatch_cache = {}
+    mismatched = []
+    for pair in zip(filtered_df["correct_domain"], filtered_df["input_domain"]):
+        if pair not in mismatch_cache:
+            mismatch_cache[pair] = get_mismatched_part(*pair)
+        mismatched.append(mismatch_cache[pair])
+    filtered_df["mismatched_part"] = mismatched
 
-    # 差分部分の抽出
-    filtered_df["mismatched_part"] = filtered_df.apply(
-        lambda row: get_mismatched_part(row["correct_domain"], row["input_domain"]),
-        axis=1
-    )
+    final_df = filtered_df[["user_id", "step_id", "correct_address", "input_address", "edit_distance", "mismatched_part"] + DOMAIN_COLUMNS]
 
-    filtered_df["edit_distance"] = filtered_df["domain_edit_distance"]
-    final_df = filtered_df[["user_id", "step_id", "correct_address", "input_address", "edit_distance", "mismatched_part"]]
+    write_intermediate(final_df, output_path) # 保存 (CSV にはドメイン列は含めない)
 
-    final_df.to_csv(output_path, index=False) # 保存
+    PROFILER.count("rows_read", total_rows)
+    PROFILER.count("rows_kept", len(final_df))
+    PROFILER.count("distinct_domain_pairs", len(distance_cache))
+    peak = peak_rss_mb()
+    print(f"[INFO] 取り込み: {total_rows:,}行 → タイポ {len(final_df):,}行"
+          f"（異なるドメインの組 {len(distance_cache):,}個"
+          + (f", ピークメモリ {peak:,.0f} MB）" if peak is not None else "）"))
 
 # ====================================================================
 # --------原因別分類-----------
@@ -72,8 +121,14 @@ keyboard_adjacent = { # キーボード隣接キーマップ
 symmetric_key_pairs = [('f', 'j'), ('d', 'k'), ('s', 'l'), ('a', ';')] # 対称配置キー誤打（例: f ↔ j）
 homoglyph_pairs = [('1', 'l'), ('0', 'o'), ('i', 'l'), ('rn', 'm'), ('а', 'a'), ('b', 'd')]   # # ホモグラフ, キリル文字の'a'など
 
-def keyboard_adjacent_check(c1, c2):
-    return c1.lower() in keyboard_adjacent and c2.lower() in keyboard_adjacent[c1.lower()]
+# 上の隣接キーマップ（f→j 等、物理配列と合わない組を含む）は "legacy" 配列として残す（比較・旧モデルの再現用）
+# 分類・生成は物理配列の距離行列 "us" を使う。"jis" / "phone" は keyboard_layouts.py を参照
+register_layout(compile_adjacency_layout("legacy", keyboard_adjacent))
+DEFAULT_KEYBOARD_LAYOUT = "us"
+
+def keyboard_adjacent_check(c1, c2, layout=DEFAULT_KEYBOARD_LAYOUT):
+    # キー間の距離による置換の起こりやすさが、隣接キーの範囲（配列ごとの下限）以上か
+    return get_layout(layout).is_adjacent(c1, c2)
 
 def is_symmetric_mismatch(c1, c2): #対称キーの誤打であるか(一文字ずつ判定)
     for a, b in symmetric_key_pairs:
@@ -90,37 +145,41 @@ def is_visual_homoglyph(c1, c2): #視覚類似文字（ホモグリフ）の誤
 def is_valid_tld(tld): #TLDとして妥当か(長さを2〜4文字に限定し、TLDの制約に基づいて判定)
     return len(tld) in [2, 3, 4] and tld.isalpha()
 
+# TLD取り違えモデル: tld_prices.json の全サフィックスを対象に、観測データから件数行列を学習する
+# (従来の8組は tld_confusion.SEED_TLD_PAIRS として常に有効)
+TLD_PRICES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tld_prices.json")
+
+def load_tld_costs(path=TLD_PRICES_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+# 学習前の取り違えモデル（従来の組のみ）。学習済みのモデルは learn_tld_confusions が別に作って返し、これは書き換えない
+DEFAULT_TLD_CONFUSIONS = TldConfusionModel(load_tld_costs())
+
+@profiled("learn_tld_confusions")
+def learn_tld_confusions(csv_path, base=None):
+    """正しいアドレスと入力アドレスの組から、サフィックスの取り違え件数を学習した新しいモデルを返す（base は変更しない）"""
+    model = (base or DEFAULT_TLD_CONFUSIONS).copy()
+    df = read_domain_pairs(csv_path)
+    for correct, typo in zip(df['correct_domain'], df['input_domain']):
+        model.observe(correct, typo)
+    PROFILER.count("rows", len(df))
+    return model
+
 # TLDミスの特殊パターンを識別する関数の追加
-def is_tld_mismatch(correct_domain, typo_domain):
+def is_tld_mismatch(correct_domain, typo_domain, confusions=None):
     if not ('.' in correct_domain and '.' in typo_domain):
         return False, None
-    
-    # 誤りの起こりやすいTLDペアを定義
-    tld_pairs = [
-        ('jp', 'co.jp'), ('co.jp', 'jp'), 
-        ('com', 'co.jp'), ('co.jp', 'com'), 
-        ('ne.jp', 'co.jp'), ('co.jp', 'ne.jp'),
-        ('go.jp', 'co.jp'), ('co.jp', 'go.jp')
-    ]
-
-    for c_pattern, t_pattern in tld_pairs:
-        # 1. ドメインがパターンで終わっているかチェック
-        if correct_domain.endswith(c_pattern) and typo_domain.endswith(t_pattern):
-            correct_base_part = correct_domain[:-len(c_pattern)] 
-            typo_base_part = typo_domain[:-len(t_pattern)]
-            # ベース部分が完全に一致する場合
-            if correct_base_part == typo_base_part:
-                # TLDパーツを決定 (ドットを含む)
-                correct_tld_part = correct_domain[len(correct_base_part):]
-                typo_tld_part = typo_domain[len(typo_base_part):]
-                
-                return True, f"{correct_tld_part} -> {typo_tld_part}"
 
-    return False, None
+    # 誤りの起こりやすいTLDの組は、学習済みの件数行列（サフィックストライ経由）で判定する
+    return (confusions or DEFAULT_TLD_CONFUSIONS).mismatch(correct_domain, typo_domain)
 
 # --------------原因別集計-----------------
 # 原因別分類関数
-def classify_edit_ops_japanese(correct, typo):
+def classify_edit_ops_japanese(correct, typo, layout=DEFAULT_KEYBOARD_LAYOUT, confusions=None):
     correct_parts = []
     typo_parts = []
     causes = set()
@@ -136,7 +195,7 @@ def classify_edit_ops_japanese(correct, typo):
         if tag == 'replace':
             correct_parts.append(c1)
             typo_parts.append(c2)
-            if keyboard_adjacent_check(c1, c2):
+            if keyboard_adjacent_check(c1, c2, layout):
                 causes.add("隣接キー誤打")
             elif is_symmetric_mismatch(c1, c2):
                 causes.add("左右対称キー誤打")
@@ -159,7 +218,7 @@ def classify_edit_ops_japanese(correct, typo):
                 causes.add("入力漏れ")
 
     # 3. TLDミスのチェックを最後に行う
-    is_tld_m, tld_diff_str = is_tld_mismatch(correct, typo)
+    is_tld_m, tld_diff_str = is_tld_mismatch(correct, typo, confusions)
     if is_tld_m:
         # TLDミスに関連する他の原因（スペルミス、二重入力、入力漏れ、ドット抜け）を排除
         causes_to_remove = {"スペルミス（認知ミス）", "二重入力", "入力漏れ", "ドット抜け"}
@@ -209,16 +268,33 @@ def identify_single_replacement(correct, typo):
 
     return ('', '') # 複合または非距離1ミス
 
-def calculate_positional_freqs(csv_path):
-    df = pd.read_csv(csv_path)
+def analysis_checkpoint(name, csv_path, confusions=None):
+    """分類・分析ループの途中経過。入力・このファイルのコード・学習済みのTLD取り違えが前回と同じ場合だけ再開する"""
+    confusions = json.dumps((confusions or DEFAULT_TLD_CONFUSIONS).to_json(), ensure_ascii=False, sort_keys=True)
+    return Checkpoint(name, csv_path, params={
+        "code": file_sha256(os.path.abspath(__file__)),
+        "tld_confusions": hashlib.sha256(confusions.encode('utf-8')).hexdigest(),
+    })
+
+@profiled("calculate_positional_freqs")
+def calculate_positional_freqs(csv_path, checkpoint_rows=CHECKPOINT_ROWS, confusions=None):
+    df = read_domain_pairs(csv_path, ['cause'])
     positional_data = defaultdict(lambda: defaultdict(Counter))
 
-    for _, row in df.iterrows():
-        correct = extract_domain(str(row['correct_address']))
-        typo = extract_domain(str(row['input_address']))
-        
+    # 中断されていれば、保存済みの集計から再開する
+    checkpoint = analysis_checkpoint("calculate_positional_freqs", csv_path, confusions)
+    offset, _, state = checkpoint.resume()
+    for cause, char_data in (state or {}).items():
+        positional_data[cause].update(char_data)
+
+    rows = zip(df['correct_domain'], df['input_domain'], df['cause'])
+    for i, (correct, typo, cause_field) in enumerate(islice(rows, offset, None), start=offset):
+        if i > offset and i % checkpoint_rows == 0:
+            checkpoint.save(offset, i, state={cause: dict(char_data) for cause, char_data in positional_data.items()})
+            offset = i
+
         # TLDミス、入力順序ミスは除外（別で処理）
-        if "TLDミス" in str(row['cause']) or "入力順序ミス" in str(row['cause']):
+        if "TLDミス" in str(cause_field) or "入力順序ミス" in str(cause_field):
             continue
 
         if damerau_levenshtein_distance(correct, typo) == 1 and Levenshtein.distance(correct, typo) == 1:
@@ -243,7 +319,7 @@ def calculate_positional_freqs(csv_path):
                 # 絶対位置を末尾からの相対位置に変換 L = len(correct) を使って変換する
                 pos_relative_end = L - 1 - pos_absolute
                 
-                causes_for_classify = classify_edit_ops_japanese(correct, typo)['cause'].split('・')
+                causes_for_classify = classify_edit_ops_japanese(correct, typo, confusions=confusions)['cause'].split('・')
                 cause = causes_for_classify[0] if causes_for_classify else 'その他'
                 
                 # ドット抜けの詳細処理
@@ -255,7 +331,9 @@ def calculate_positional_freqs(csv_path):
                     cause = "入力漏れ"
                     
                 positional_data[cause][char][pos_relative_end] += 1
-    
+
+    checkpoint.clear()
+    PROFILER.count("rows", len(df))
     return positional_data
 
 def generate_positional_heatmap(positional_freqs, total_events):
@@ -312,18 +390,29 @@ def generate_positional_heatmap(positional_freqs, total_events):
     print("\n凡例: ■ (高) █ (中) ░ (低) ・ (なし)")
     print("=" * 78)
 
-def analyze_for_ranking(csv_path):
+@profiled("analyze_for_ranking")
+def analyze_for_ranking(csv_path, checkpoint_rows=CHECKPOINT_ROWS, confusions=None):
     """CSVを読み込み、ランキング用の個別ミス重み (W_individual) を計算"""
-    df = pd.read_csv(csv_path)
+    df = read_domain_pairs(csv_path, ['cause'])
     
     individual_rank_weights = defaultdict(dict)
-    all_causes = []
+    cause_counts = Counter()  # 大分類の件数（出現順を保つので、全件を並べてから数えるのと同じ結果になる）
     cause_diff_counter = defaultdict(Counter)
 
-    for _, row in df.iterrows():
-        correct = extract_domain(str(row['correct_address']))
-        typo = extract_domain(str(row['input_address']))
-        cause_field = str(row['cause'])
+    # 中断されていれば、保存済みの集計から再開する
+    checkpoint = analysis_checkpoint("analyze_for_ranking", csv_path, confusions)
+    offset, _, state = checkpoint.resume()
+    if state is not None:
+        cause_counts, saved_counter = state
+        cause_diff_counter.update(saved_counter)
+
+    rows = zip(df['correct_domain'], df['input_domain'], df['cause'])
+    for i, (correct, typo, cause_field) in enumerate(islice(rows, offset, None), start=offset):
+        if i > offset and i % checkpoint_rows == 0:
+            checkpoint.save(offset, i, state=(cause_counts, dict(cause_diff_counter)))
+            offset = i
+
+        cause_field = str(cause_field)
         causes = [c.strip() for c in cause_field.split('・')]
         
         is_custom_handled = False
@@ -331,7 +420,7 @@ def analyze_for_ranking(csv_path):
 
         for cause in causes:
             if cause == "TLDミス":
-                is_tld_m, tld_diff_str = is_tld_mismatch(correct, typo)
+                is_tld_m, tld_diff_str = is_tld_mismatch(correct, typo, confusions)
                 if is_tld_m:
                     cause_diff_counter[cause][tld_diff_str] += 1
                     is_custom_handled = True
@@ -347,11 +436,11 @@ def analyze_for_ranking(csv_path):
             row_causes.append(cause)
         
         if is_custom_handled:
-            all_causes.extend(row_causes)
+            cause_counts.update(row_causes)
             continue
 
         diffs = extract_ngram_diffs(correct, typo)
-        all_causes.extend(row_causes) 
+        cause_counts.update(row_causes)
 
         for cause in causes:
             if cause in {"TLDミス", "入力順序ミス"}:
@@ -361,8 +450,10 @@ def analyze_for_ranking(csv_path):
                 cause_diff_counter[cause][(c1, c2)] += 1
 
 
+    checkpoint.clear()
+    PROFILER.count("rows", len(df))
+
     # 大分類の割合計算 (レポート用)
-    cause_counts = Counter(all_causes)
     total_major_events = sum(cause_counts.values())
     major_ratios = {k: round(v / total_major_events, 3) for k, v in cause_counts.items()}
 
@@ -378,20 +469,27 @@ def analyze_for_ranking(csv_path):
 
 #--------------------------------------------------------------------------------------
 # cause, correctの付与csvファイル出力関数
-def append_typo_causes(input_csv_path, output_csv_path):
-    df = pd.read_csv(input_csv_path)
-
-    causes = []
-    correct_parts = []
-    typo_parts = []
-
-    for _, row in df.iterrows():
-        correct = extract_domain(str(row['correct_address']))
-        typo = extract_domain(str(row['input_address']))
-        result = classify_edit_ops_japanese(correct, typo)
-        causes.append(result["cause"])
-        correct_parts.append(result["correct_part"])
-        typo_parts.append(result["mismatched_part"])
+@profiled("append_typo_causes")
+def append_typo_causes(input_csv_path, output_csv_path, checkpoint_rows=CHECKPOINT_ROWS, confusions=None):
+    df = add_domain_columns(read_intermediate(input_csv_path))
+
+    # 中断されていれば、保存済みの行の分類結果から再開する
+    checkpoint = analysis_checkpoint("append_typo_causes", input_csv_path, confusions)
+    offset, results, _ = checkpoint.resume()
+
+    pairs = list(zip(df['correct_domain'], df['input_domain']))
+    for start in range(offset, len(pairs), checkpoint_rows):
+        chunk = []
+        for correct, typo in pairs[start:start + checkpoint_rows]:
+            result = classify_edit_ops_japanese(correct, typo, confusions=confusions)
+            chunk.append((result["cause"], result["correct_part"], result["mismatched_part"]))
+        results.extend(chunk)
+        if len(results) < len(pairs):
+            checkpoint.save(start, len(results), rows=chunk)
+
+    causes = [r[0] for r in results]
+    correct_parts = [r[1] for r in results]
+    typo_parts = [r[2] for r in results]
 
     df['cause'] = causes
     df['correct_part'] = correct_parts
@@ -402,11 +500,14 @@ def append_typo_causes(input_csv_path, output_csv_path):
         'correct_address', 'input_address',
         'edit_distance',
         'correct_part', 'mismatched_part', 'cause'
-    ]
+    ] + DOMAIN_COLUMNS
 
     df = df[[col for col in desired_columns if col in df.columns]]
 
-    df.to_csv(output_csv_path, index=False, encoding="utf-8-sig")
+    write_intermediate(df, output_csv_path, encoding="utf-8-sig")
+    checkpoint.clear()
+    PROFILER.count("rows", len(df))
+    PROFILER.count("rows_resumed", offset)
 
 
 #--------------------------------------------------------------------------------------
@@ -423,17 +524,15 @@ def extract_ngram_diffs(correct, typo):
     return diffs
 
 # 原因ごとの差分集計
-def analyze_ngram_differences(csv_path):
-    df = pd.read_csv(csv_path)
+def analyze_ngram_differences(csv_path, confusions=None):
+    df = read_domain_pairs(csv_path, ['cause'])
     cause_diff_counter = defaultdict(Counter)
 
-    for _, row in df.iterrows():
-        correct = extract_domain(str(row['correct_address']))
-        typo = extract_domain(str(row['input_address']))
-        cause_field = str(row['cause'])
+    for correct, typo, cause_field in zip(df['correct_domain'], df['input_domain'], df['cause']):
+        cause_field = str(cause_field)
         causes = [c.strip() for c in cause_field.split('・')]
 
-        is_tld_m, tld_diff_str = is_tld_mismatch(correct, typo)
+        is_tld_m, tld_diff_str = is_tld_mismatch(correct, typo, confusions)
         if is_tld_m and "TLDミス" in causes:
              cause_diff_counter["TLDミス"][tld_diff_str] += 1
              continue
@@ -500,8 +599,9 @@ def analyze_ngram_differences(csv_path):
 
 
 #---------タイポ原因別集計と割合（重み）--------
+@profiled("get_cause_ratios")
 def get_cause_ratios(csv_path):
-    df = pd.read_csv(csv_path)
+    df = read_intermediate(csv_path, ['cause'])
 
     # cause列から個別原因を抽出・集計
     all_causes = []
@@ -518,22 +618,21 @@ def get_cause_ratios(csv_path):
 # ===================================================
 # --------ドメインランキング----------
 
-def typo_domain_ranking_with_reason_jp(input_path, correct_domain, max_distance=4): #####　←←←←←←←←←←←←←←←←←←←←←←←←←DL距離指定
-    df = pd.read_csv(input_path)
-    df["input_domain"] = df["input_address"].astype(str).apply(extract_domain)
+def typo_domain_ranking_with_reason_jp(input_path, correct_domain, max_distance=4, confusions=None): #####　←←←←←←←←←←←←←←←←←←←←←←←←←DL距離指定
+    df = read_domain_pairs(input_path)
 
     typo_df = df[df["input_domain"].apply(lambda d: damerau_levenshtein_distance(correct_domain, d) <= max_distance)].copy()
     typo_df["distance"] = typo_df["input_domain"].apply(lambda d: damerau_levenshtein_distance(correct_domain, d))
     typo_df = typo_df[typo_df["input_domain"] != correct_domain]
 
-    grouped = typo_df.groupby("input_domain").agg(
+    grouped = typo_df.groupby("input_domain", observed=True).agg(
         count=("input_domain", "count"),
         distance=("distance", "first")
     ).reset_index()
 
     total_typos = grouped["count"].sum()
     grouped["percentage"] = grouped["count"] / total_typos * 100
-    grouped["cause"] = grouped["input_domain"].apply(lambda typo: classify_edit_ops_japanese(correct_domain, typo))
+    grouped["cause"] = grouped["input_domain"].apply(lambda typo: classify_edit_ops_japanese(correct_domain, typo, confusions=confusions))
 
     grouped = grouped.sort_values(by=["count", "distance"], ascending=[False, True]).reset_index(drop=True)
 
@@ -546,33 +645,33 @@ def typo_domain_ranking_with_reason_jp(input_path, correct_domain, max_distance=
 # -------- TLD有効性チェック用 --------
 # ===================================================================
 
-VALID_TLDS = {
-    'com', 'net', 'org', 'edu', 'gov', 'mil', 'int', 'jp', 'co.jp', 'ne.jp',
-    'ai', 'io', 'co', 'me', 'info', 'biz', 'us', 'uk', 'ca', 'de', 'fr', 'au',
-    'ntt', 'google', 'amazon', 'shop', 'blog', 'tech', 'dev', 'app', 'xyz'
-}           
+# 組み込みのTLD（スナップショットが無い場合の最低限）。IANAの一覧は tld_registry.txt から読み込む
+VALID_TLDS = tld_registry.BUILTIN_TLDS
+
+for _tld in sorted(VALID_TLDS):  # 添字が実行ごとに変わらないよう順序を固定する
+    DEFAULT_TLD_CONFUSIONS.add_suffix(_tld)
+
+# 費用・実在チェック用のサフィックストライ（tld_prices.json + TLD一覧から一度だけ構築）
+TLD_LOOKUP = TldLookup(load_tld_costs(), VALID_TLDS | tld_registry.current_registry().tlds)
+
+def _rebuild_tld_lookup(registry):
+    # 構築し終えたトライを丸ごと差し替えるので、参照中の処理が途中の状態を見ることはない
+    global TLD_LOOKUP
+    TLD_LOOKUP = TldLookup(load_tld_costs(), VALID_TLDS | registry.tlds)
+
+tld_registry.on_update(_rebuild_tld_lookup)
 
 def load_iana_tlds():
-    """IANAの公式サイトから最新のTLDリストを取得して更新する"""
-    url = "https://data.iana.org/TLD/tlds-alpha-by-domain.txt"
-    try:
-        with urllib.request.urlopen(url, timeout=5) as response:
-            content = response.read().decode('utf-8')
-            for line in content.splitlines():
-                if not line.startswith('#') and line.strip():
-                    VALID_TLDS.add(line.strip().lower())
-        print(f"[INFO] 最新のTLDリストを取得しました（総数: {len(VALID_TLDS)}個）")
-    except Exception as e:
-        print(f"[WARN] TLDリストの取得に失敗しました。デフォルトのリストを使用します: {e}")
+    """IANAの公式サイトから最新のTLDリストをバックグラウンドで取得する（起動はスナップショットで行い、通信を待たない）"""
+    return tld_registry.refresh_in_background()
 
 def is_existing_tld(domain: str) -> bool:
     """ドメインのTLD（最後のドット以降）が実在するか判定する"""
-    parts = domain.split('.')
-    if len(parts) < 2:
-        return False
-    
-    tld = parts[-1].lower()
-    return tld in VALID_TLDS
+    return TLD_LOOKUP.lookup(domain).valid
+
+def extract_tld_and_cost(domain: str) -> str:
+    """最長一致するTLDの登録費用（表記そのまま）を返す。不明な場合は '費用不明'"""
+    return TLD_LOOKUP.lookup(domain).cost
 
 # ===================================================================
 # --------予測型タイポドメイン生成関数----------
@@ -584,228 +683,11 @@ TLD_ALTERNATIVES = {'com': ['co.jp', 'net'], 'co.jp': ['com', 'co'], 'net': ['co
 symmetric_key_pairs = [('f', 'j'), ('d', 'k'), ('s', 'l'), ('a', ';')] # 対称配置キー誤打（例: f ↔ j）
 homoglyph_pairs = [('1', 'l'), ('0', 'o'), ('i', 'l'), ('rn', 'm'), ('а', 'a'), ('b', 'd')]   # # ホモグラフ, キリル文字の'a'など
 
-def typo_generator_ranked(domain: str, individual_weights: dict, positional_freqs: dict, top_n: int = 30):
-    variants = defaultdict(lambda: [set(), 0.0]) # {typo_domain: [causes_set, score]}
-
-    # DL=1のミス全体の集計件数（位置補正ボーナスの正規化に使用）
-    total_dl1_count = sum(sum(c.values()) for char_data in positional_freqs.values() for c in char_data.values())
-    if total_dl1_count == 0: total_dl1_count = 1
-
-    L = len(domain)
-
-    # 位置ボーナスの増幅係数
-    K_POSITION_BOOST = 0.5
-    
-    # DL=1のミスは全て生成する
-    for i in range(len(domain)):
-        c = domain[i]
-        char = c.lower()
-        
-        # --- 基本的なDL=1のミス (全候補生成) ---
-        
-        # 1. 入力漏れ (Deletion)
-        typo = domain[:i] + domain[i+1:]
-        variants[typo][0].add("入力漏れ")
-
-        # 2. 二重入力 (Insertion/Repetition)
-        typo = domain[:i] + c + c + domain[i+1:]
-        variants[typo][0].add("二重入力")
-
-        # 3. 隣接キー誤打 (Substitution)
-        for adj in keyboard_adjacent.get(char, ''):
-            typo = domain[:i] + adj + domain[i+1:]
-            if keyboard_adjacent_check(c, adj):
-                variants[typo][0].add("隣接キー誤打")
-
-        # 4. ホモグリフ・視覚類似文字 (Substitution)
-        for g in HOMOGLYPHS_FOR_GENERATOR.get(char, []):
-            typo = domain[:i] + g + domain[i+1:]
-            variants[typo][0].add("ホモグリフ（視覚類似文字）")
-            
-        # 5. 左右対称キー誤打 (Substitution)
-        for a, b in symmetric_key_pairs:
-            if c == a: 
-                typo = domain[:i] + b + domain[i+1:]
-                variants[typo][0].add("左右対称キー誤打")
-            elif c == b:
-                typo = domain[:i] + a + domain[i+1:]
-                variants[typo][0].add("左右対称キー誤打")
-
-    # --- 構造的なミス（全候補生成） ---
-
-    for i in range(len(domain) - 1):
-        swapped = domain[:i] + domain[i+1] + domain[i] + domain[i+2:]
-        variants[swapped][0].add("入力順序ミス")
-
-    # 8. TLDミス (TLD Mismatch)
-    base_domain, *tlds = domain.split('.')
-    TLD_PAIRS_FOR_GENERATION = {
-        'jp': ['co.jp'], 'co.jp': ['jp', 'com', 'ne.jp', 'go.jp'],
-        'com': ['co.jp'], 'ne.jp': ['co.jp'], 'go.jp': ['co.jp']
-    }
-    current_tld = '.'.join(tlds)
-
-    if current_tld in TLD_PAIRS_FOR_GENERATION:
-        for alt_tld in TLD_PAIRS_FOR_GENERATION[current_tld]:
-            typo = f"{base_domain}.{alt_tld}"
-            variants[typo][0].add("TLDミス")
-
-
-    # --- 統合とスコア集計 ---
-    ranked_results = []
-    
-    for typo, (causes, _) in variants.items():
-        if typo == domain: continue
-        
-        final_score = 0
-        
-        c1, c2 = identify_single_replacement(domain, typo) 
-        is_dl1_error = (c1 != '' or c2 != '') # DL=1の単一操作かどうか
-
-        is_tld_m, tld_diff_str = is_tld_mismatch(domain, typo)
-        
-        # 1. 個別ミス重み (W_individual) の適用
-        for cause in causes:
-            W_individual = 0.0
-            
-            # --- TLDミス (x5倍増幅) ---
-            if cause == "TLDミス" and is_tld_m:
-                key = tld_diff_str
-                W_individual = individual_weights.get(cause, {}).get(key, 0.0)
-                final_score += W_individual * 5
-
-            # --- 入力順序ミス ---
-            elif cause == "入力順序ミス":
-                transposed_pair = get_transposed_pair(domain, typo)
-                if transposed_pair:
-                    k1, k2 = transposed_pair
-                    key = f'{k1} {k2} -> {k2} {k1}'
-                    W_individual = individual_weights.get(cause, {}).get(key, 0.0)
-                    final_score += W_individual
-            
-            # --- DL=1 ミス (位置ボーナス加算) ---
-            elif is_dl1_error:
-                if cause in {"隣接キー誤打", "ホモグリフ（視覚類似文字）", "左右対称キー誤打", "スペルミス（認知ミス）"}:
-                    key = (c1, c2)
-                    W_individual = individual_weights.get(cause, {}).get(key, 0.0)
-                    if W_individual == 0.0 and len(c1) == 1 and len(c2) == 1: 
-                        W_individual = individual_weights.get(cause, {}).get((c2, c1), 0.0)
-                
-                elif cause in {"入力漏れ", "ドット抜け"}:
-                    key = (c1, '（空）')
-                    W_individual = individual_weights.get(cause, {}).get(key, 0.0)
-                
-                elif cause == "二重入力":
-                    key = ('（空）', c2) 
-                    W_individual = individual_weights.get(cause, {}).get(key, 0.0)
-                
-                final_score += W_individual
-
-                position_bonus_value = 0.0
-
-                if is_dl1_error:
-                    sm = difflib.SequenceMatcher(None, domain, typo)
-                    ops = sm.get_opcodes()
-                    
-                    if len(ops) == 3 and ops[0][0] == 'equal' and ops[2][0] == 'equal':
-                        tag, i1, i2, j1, j2 = ops[1]
-                        i_start = i1 
-                        
-                        if tag == 'insert':
-                            pos_char = typo[j1:j2].lower() # 挿入された文字
-                            cause = "二重入力"
-                        elif tag == 'delete':
-                            pos_char = domain[i1:i2].lower() # 削除された文字
-                            cause = "入力漏れ" if domain[i1:i2] != '.' else "ドット抜け"
-                        elif tag == 'replace':
-                            pos_char = domain[i1:i2].lower() # 置換元の文字
-                            # 原因は causes から取得
-                            causes_list = causes.copy()
-                            causes_list.discard('入力順序ミス')
-                            cause = sorted(causes_list)[0] if causes_list else 'スペルミス（認知ミス）'
-                        else:
-                            i_start = -1
-                            
-                        if i_start != -1 and pos_char and len(pos_char) == 1: 
-                            L = len(domain)
-                            i_relative_end = L - 1 - i_start
-                            
-                            freq_count = positional_freqs.get(cause, {}).get(pos_char, {}).get(i_relative_end, 0)
-                            
-                            position_bonus_value = freq_count / total_dl1_count
-                            final_score += position_bonus_value * K_POSITION_BOOST
-
-        if is_tld_m:
-            causes = {"TLDミス"}
-        
-        distance = damerau_levenshtein_distance(domain, typo)
-
-        variants[typo][1] = final_score
-        
-        ranked_results.append({
-            "typo": typo,
-            "causes": '・'.join(sorted(causes)),
-            "score": round(final_score,7),
-            "distance": distance
-        })
-
-    ranked_results.sort(key=lambda x: (x['score'], -x['distance']), reverse=True)
-
-    final_ranked_results = [
-        r for r in ranked_results 
-        if ',' not in r['typo'] and '/' not in r['typo']
-    ]
-
-    return final_ranked_results[:top_n]
-
-# ===================================================================
-# -------- TLD有効性チェック用 --------
-# ===================================================================
-
-def load_iana_tlds():
-    """IANAの公式サイトから最新のTLDリストを取得して更新する"""
-    url = "https://data.iana.org/TLD/tlds-alpha-by-domain.txt"
-    try:
-        with urllib.request.urlopen(url, timeout=5) as response:
-            content = response.read().decode('utf-8')
-            for line in content.splitlines():
-                if not line.startswith('#') and line.strip():
-                    VALID_TLDS.add(line.strip().lower())
-        print(f"[INFO] 最新のTLDリストを取得しました（総数: {len(VALID_TLDS)}個）")
-    except Exception as e:
-        print(f"[WARN] TLDリストの取得に失敗しました。デフォルトのリストを使用します: {e}")
-
-def is_existing_tld(domain: str) -> bool:
-    """ドメインのTLD（最後のドット以降）が実在するか判定する"""
-    # 最後のドット以降を取得 (例: example.co.jp -> jp, hir.ai -> ai)
-    parts = domain.split('.')
-    if len(parts) < 2:
-        return False
-    
-    tld = parts[-1].lower()
-    return tld in VALID_TLDS
-
-def convert_internal_keys_to_str(individual_weights: Dict[str, Dict[Tuple[Any, Any], float]]) -> Dict[str, Dict[str, float]]:
-    """individual_rank_weights内のタプルキーをJSONフレンドリーな文字列キーに変換する。"""
-    converted_weights = {}
-    for cause, inner_dict in individual_weights.items():
-        converted_inner_dict = {}
-        for key, score in inner_dict.items():
-            if isinstance(key, tuple):
-                key_str = "".join(key) 
-            else:
-                key_str = key 
-            converted_inner_dict[key_str] = score
-        converted_weights[cause] = converted_inner_dict
-    return converted_weights
-
-def convert_positional_freqs_to_json(positional_freqs: Dict) -> Dict:
-    converted = {}
-    for cause, char_data in positional_freqs.items():
-        converted[cause] = {}
-        for char, pos_counter in char_data.items():
-            converted[cause][char] = dict(pos_counter) 
-    return converted
+def typo_generator_ranked(domain: str, individual_weights: dict, positional_freqs: dict, top_n: int = 30, confusables_index: dict = None, layout=DEFAULT_KEYBOARD_LAYOUT, confusions=None):
+    """生成とスコア計算の本体は typo_runtime.generate_ranked（model.bin だけで動く実行用モジュールと共通）"""
+    return generate_ranked(domain, individual_weights, positional_freqs, top_n, confusables_index,
+                           keyboard=get_layout(layout), confusions=confusions or DEFAULT_TLD_CONFUSIONS,
+                           homoglyphs=HOMOGLYPHS_FOR_GENERATOR, symmetric_pairs=symmetric_key_pairs)
 
 # ===================================================================
 # --------実行部分----------
@@ -815,87 +697,201 @@ if __name__ == "__main__":
     # 0. 必須ファイルパス設定
     # --------------------------------------------------------------------------
     INPUT_FILE = "filtered_address.csv"
-    DL4_FILTERED_FILE = "filtered_domain_typos_dl4.csv"
-    CAUSES_CSV_FILE = "domaintypos_dl4_causes2.csv"
+    MTA_EVENTS_FILE = "mta_events.csv"  # mta_log_ingest.py が取り込んだ事例（あれば入力に加える）
+    INTERMEDIATE_FORMAT = resolve_format("parquet" if "--parquet" in sys.argv else "csv")  # 列指向の中間ファイル (pyarrow が必要)
+    DL4_FILTERED_FILE = intermediate_path("filtered_domain_typos_dl4.csv", INTERMEDIATE_FORMAT)
+    CAUSES_CSV_FILE = intermediate_path("domaintypos_dl4_causes2.csv", INTERMEDIATE_FORMAT)
     DL_THRESHOLD = 4
     OUTPUT_JSON_FILE = "data.json"
+    OUTPUT_MODEL_FILE = "model.bin"  # Python側で読み込むバイナリ形式のモデル
+    WEB_MODEL_DIR = "web_model"      # Webページ向けの分割・圧縮済みエクスポート先 (None で出力しない)
     TLD_PRICES_FILE = "tld_prices.json"
+    STAGE_CACHE_FILE = ".stage_cache.json"  # 段階ごとのキャッシュ（入力・コードに変更の無い段階は実行しない）
+    FORCE_REBUILD = "--force" in sys.argv   # すべての段階を実行し直す
+    PROFILE_FILE = "profile.json" if "--profile" in sys.argv else None  # 段階ごとの計測結果 (JSON) の出力先
+
+    # 段階ごとのコード・ルール表（内容が変わるとその段階を実行し直す）
+    FILTER_CODE = ["typo_ranking.py", "intermediate_io.py"]
+    CLASSIFY_CODE = FILTER_CODE + ["keyboard_layouts.py", "tld_confusion.py", "tld_trie.py", "tld_registry.py"]
+    MODEL_CODE = CLASSIFY_CODE + ["confusables.py", "model_artifact.py"]
+    WEB_CODE = ["web_export.py", "model_delta.py"]
+    PRERENDER_CODE = MODEL_CODE + WEB_CODE + ["prerender_rankings.py", "prerender_rankings.js", "typo_ranking.js"]
+
+    if PROFILE_FILE:
+        PROFILER.enable()
 
     print(f"[INFO] 分析を開始します...")
+    stages = StageCache(STAGE_CACHE_FILE, force=FORCE_REBUILD)
+
+    tld_confusions_learned = []  # 分類・分析のどちらかを実行する場合に1回だけ学習する
+
+    def learn_tld_confusions_once():
+        if not tld_confusions_learned:
+            tld_confusions_learned.append(learn_tld_confusions(DL4_FILTERED_FILE))
+        return tld_confusions_learned[0]
+
+    def classify_stage():
+        # TLDの取り違えは分類の前に学習しておく
+        append_typo_causes(DL4_FILTERED_FILE, CAUSES_CSV_FILE, confusions=learn_tld_confusions_once())
 
     # --------------------------------------------------------------------------
     # 1. & 2. タイポ抽出と原因分類 (ファイル生成)
     # --------------------------------------------------------------------------
     try:
-        filter_domain_differences_with_mismatch(INPUT_FILE, DL4_FILTERED_FILE, DL_THRESHOLD)
-        append_typo_causes(DL4_FILTERED_FILE, CAUSES_CSV_FILE)
+        stages.run("filter", lambda: filter_domain_differences_with_mismatch(INPUT_FILE, DL4_FILTERED_FILE, DL_THRESHOLD,
+                                                                             extra_paths=[MTA_EVENTS_FILE]),
+                   inputs=[INPUT_FILE, MTA_EVENTS_FILE], outputs=[DL4_FILTERED_FILE], code=FILTER_CODE, params={"threshold": DL_THRESHOLD})
+        stages.run("classify", classify_stage,
+                   inputs=[DL4_FILTERED_FILE, TLD_PRICES_FILE], outputs=[CAUSES_CSV_FILE], code=CLASSIFY_CODE)
     except FileNotFoundError:
         print(f"[致命的エラー] 入力ファイル ({INPUT_FILE}) が見つかりません。")
         exit()
 
-    # --------------------------------------------------------------------------
-    # 3. 分析の実行 (内部計算のみ)
-    # --------------------------------------------------------------------------
-    # 個別ミスの重み (W_individual) と位置別頻度の計算
-    major_weights, individual_rank_weights = analyze_for_ranking(CAUSES_CSV_FILE)
-    positional_freqs = calculate_positional_freqs(CAUSES_CSV_FILE)
-    
-    # 総イベント数の取得 (正規化用)
-    _, _, total_events = get_cause_ratios(CAUSES_CSV_FILE)
-
-    # --------------------------------------------------------------------------
-    # 4. Web用データのエクスポート (JSON生成)
-    # --------------------------------------------------------------------------
-    if not individual_rank_weights:
-        print("\n[エラー] 重みデータが計算されなかったため、JSONエクスポートをスキップします。")
-    else:
-        converted_individual_weights = convert_internal_keys_to_str(individual_rank_weights)
-        converted_positional_freqs = convert_positional_freqs_to_json(positional_freqs)
+    if stages.begin("model", inputs=[DL4_FILTERED_FILE, CAUSES_CSV_FILE, TLD_PRICES_FILE, "confusables.txt"],
+                    outputs=[OUTPUT_MODEL_FILE, OUTPUT_JSON_FILE], code=MODEL_CODE):
+        tld_confusions = learn_tld_confusions_once()
+
+        # --------------------------------------------------------------------------
+        # 3. 分析の実行 (内部計算のみ)
+        # --------------------------------------------------------------------------
+        # 個別ミスの重み (W_individual) と位置別頻度の計算
+        major_weights, individual_rank_weights = analyze_for_ranking(CAUSES_CSV_FILE, confusions=tld_confusions)
+        positional_freqs = calculate_positional_freqs(CAUSES_CSV_FILE, confusions=tld_confusions)
+
+        # IDNホモグラフ生成用のconfusables索引 (文字ごとに事前コンパイル)
+        confusables_index = load_confusables_index()
+
+        # 総イベント数の取得 (正規化用)
+        _, _, total_events = get_cause_ratios(CAUSES_CSV_FILE)
+
+        # --------------------------------------------------------------------------
+        # 4. Web用データのエクスポート (JSON生成)
+        # --------------------------------------------------------------------------
+        model_error = None  # 書き出しに失敗した場合は段階の完了を記録せず、次回も実行する
+        if not individual_rank_weights:
+            print("\n[エラー] 重みデータが計算されなかったため、JSONエクスポートをスキップします。")
+            model_error = "重みデータなし"
+        else:
+            total_dl1_count = sum(sum(c.values()) for char_data in positional_freqs.values() for c in char_data.values())
+            if total_dl1_count == 0: total_dl1_count = 1
+
+            # TLD価格をロード
+            try:
+                with open(TLD_PRICES_FILE, 'r', encoding='utf-8') as f:
+                    TLD_COSTS = json.load(f)
+            except FileNotFoundError:
+                print("[WARN] tld_prices.json が見つかりません。デフォルト値を使用します。")
+                TLD_COSTS = {
+                    ".co.jp": "7,678円/年", ".jp": "3,124円/年",
+                    ".com": "1,408円/年", ".net": "1,628円/年"
+                }
+
+            # ホモグリフ定義 (Python側)
+            HOMOGLYPHS_FOR_GENERATOR = {
+                '1': ['l'], 'l': ['1', 'i'], '0': ['o'], 'o': ['0'],
+                'i': ['l'], 'r': ['m'], 'b': ['d'], 'd': ['b']
+            }
 
-        total_dl1_count = sum(sum(c.values()) for char_data in positional_freqs.values() for c in char_data.values())
-        if total_dl1_count == 0: total_dl1_count = 1
+            # 重み・位置別頻度以外の項目 (data.json と model.bin で共通)
+            model_meta = {
+                "total_dl1_count": total_dl1_count,
+                "K_POSITION_BOOST": 0.5,
+                "TLD_COSTS": TLD_COSTS,
+                "keyboard_layout": DEFAULT_KEYBOARD_LAYOUT,
+                "keyboard_adjacent": get_layout(DEFAULT_KEYBOARD_LAYOUT).adjacency_map(),
+                "keyboard_likelihood": get_layout(DEFAULT_KEYBOARD_LAYOUT).likelihood_map(),
+                "symmetric_key_pairs": [list(pair) for pair in symmetric_key_pairs],
+                "homoglyphs_for_generator": HOMOGLYPHS_FOR_GENERATOR,
+                "confusables_index": confusables_index,
+                "tld_confusions": tld_confusions.to_json()
+            }
 
-        # TLD価格をロード
+            # data.json は model.bin からの変換 (model_artifact.py to-json) と同じ並びにする
+            web_data_export = to_web_json(individual_rank_weights, positional_freqs, model_meta)
+
+            try:
+                model_size = write_model(OUTPUT_MODEL_FILE, individual_rank_weights, positional_freqs, model_meta)
+                print(f"[INFO] バイナリモデルの書き出し完了: {OUTPUT_MODEL_FILE}（{model_size:,}バイト）")
+            except Exception as e:
+                print(f"\n[ERROR] バイナリモデルの書き出し中にエラーが発生しました: {e}")
+                model_error = e
+
+            try:
+                with open(OUTPUT_JSON_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(web_data_export, f, indent=4, ensure_ascii=False)
+                print(f"[INFO] Web用データのエクスポート完了: {OUTPUT_JSON_FILE}")
+            except Exception as e:
+                print(f"\n[ERROR] JSONエクスポート中にエラーが発生しました: {e}")
+                model_error = model_error or e
+        if model_error is None:
+            stages.finish("model")
+        else:
+            stages.fail("model", model_error)
+    else:
+        # 分析に変更が無ければ、前回書き出した model.bin から読み込む（data.json と同じ内容）
+        individual_rank_weights, positional_freqs, model_meta = read_model(OUTPUT_MODEL_FILE)
+        web_data_export = to_web_json(individual_rank_weights, positional_freqs, model_meta)
+        tld_confusions = TldConfusionModel.from_json(model_meta["tld_confusions"])
+        TLD_COSTS = model_meta["TLD_COSTS"]
+        HOMOGLYPHS_FOR_GENERATOR = model_meta["homoglyphs_for_generator"]
+        confusables_index = model_meta["confusables_index"]
+
+    def export_web_stage():
+        # data.json の並びのまま分割する（シャード名は内容のハッシュなので、並びが変わると別名になる）
+        with open(OUTPUT_JSON_FILE, 'r', encoding='utf-8') as f:
+            web_data = json.load(f)
         try:
-            with open(TLD_PRICES_FILE, 'r', encoding='utf-8') as f:
-                TLD_COSTS = json.load(f)
-        except FileNotFoundError:
-            print("[WARN] tld_prices.json が見つかりません。デフォルト値を使用します。")
-            TLD_COSTS = {
-                ".co.jp": "7,678円/年", ".jp": "3,124円/年",
-                ".com": "1,408円/年", ".net": "1,628円/年"
-            }
-        
-        # ホモグリフ定義 (Python側)
-        HOMOGLYPHS_FOR_GENERATOR = {
-            '1': ['l'], 'l': ['1', 'i'], '0': ['o'], 'o': ['0'], 
-            'i': ['l'], 'r': ['m'], 'b': ['d'], 'd': ['b']
-        } 
-        
-        web_data_export = {
-            "individual_weights": converted_individual_weights, 
-            "positional_freqs": converted_positional_freqs,
-            "total_dl1_count": total_dl1_count,
-            "K_POSITION_BOOST": 0.5,
-            "TLD_COSTS": TLD_COSTS,
-            "keyboard_adjacent": keyboard_adjacent,
-            "symmetric_key_pairs": [list(pair) for pair in symmetric_key_pairs],
-            "homoglyphs_for_generator": HOMOGLYPHS_FOR_GENERATOR
-        }
-        
+            # 前回の版は既存の分割エクスポートから読むため、上書きする前に差分を作る
+            patch = export_delta(web_data, WEB_MODEL_DIR)
+            if patch:
+                print(f"[INFO] 差分パッチを作成しました: {patch['base']} -> {patch['target']}（{len(patch['ops'])}件の変更）")
+        except Exception as e:
+            print(f"\n[ERROR] 差分パッチの作成中にエラーが発生しました: {e}")
+            raise  # 分割エクスポートも前の版のまま残し、次回まとめて作り直す
+        try:
+            manifest = export_sharded(web_data, WEB_MODEL_DIR)
+            print(f"[INFO] Web用の分割エクスポート完了: {WEB_MODEL_DIR}/ (version {manifest['version']})")
+        except Exception as e:
+            print(f"\n[ERROR] 分割エクスポート中にエラーが発生しました: {e}")
+            raise
+
+    def prerender_stage():
         try:
-            with open(OUTPUT_JSON_FILE, 'w', encoding='utf-8') as f:
-                json.dump(web_data_export, f, indent=4, ensure_ascii=False)
-            print(f"[INFO] Web用データのエクスポート完了: {OUTPUT_JSON_FILE}")
+            # 一覧に無いドメインと同じ結果になるよう、ページの TypoRanker (typo_ranking.js) で生成する
+            rankings = rank_with_typo_ranker(load_domain_list(PRERENDER_DOMAINS_FILE), web_data_export)
+            index = export_rankings(rankings, PRERENDER_DIR, model_version=model_version(web_data_export))
+            print(f"[INFO] ランキングの事前計算完了: {PRERENDER_DIR}/（{index['domains']}件）")
         except Exception as e:
-            print(f"\n[ERROR] JSONエクスポート中にエラーが発生しました: {e}")
+            print(f"\n[ERROR] ランキングの事前計算中にエラーが発生しました: {e}")
+            raise
+
+    def run_stage(name, func, **kwargs):
+        # 失敗した段階はエラーを表示済みなので、記録を残さず（次回も実行する）残りの段階へ進む
+        try:
+            stages.run(name, func, **kwargs)
+        except Exception:
+            pass
+
+    if individual_rank_weights:
+        if WEB_MODEL_DIR:
+            run_stage("web", export_web_stage, inputs=[OUTPUT_JSON_FILE],
+                      outputs=[os.path.join(WEB_MODEL_DIR, MANIFEST_FILE), os.path.join(WEB_MODEL_DIR, DELTA_DIR, DELTA_INDEX_FILE)],
+                      code=WEB_CODE)
+
+        # 登録済みドメインのランキングを事前計算する（一覧ファイルがある場合のみ）
+        if os.path.exists(PRERENDER_DOMAINS_FILE):
+            run_stage("prerender", prerender_stage,
+                      inputs=[OUTPUT_MODEL_FILE, PRERENDER_DOMAINS_FILE],
+                      outputs=[os.path.join(PRERENDER_DIR, PRERENDER_INDEX_FILE)], code=PRERENDER_CODE)
+
+    stages.print_report()
 
     # --------------------------------------------------------------------------
     # 5. ドメインランキング生成の実行 (ユーザーへの出力)
     # --------------------------------------------------------------------------
     correct_domain = input("\n入力されたドメインのタイポドメイン候補を生成する（例: treasurefactory.co.jp）: ").strip()
     
-    if major_weights and individual_rank_weights and correct_domain:
+    if individual_rank_weights and correct_domain:
         print("\n" + "=" * 78)
         print(f"'{correct_domain}' に対する予測タイポドメインランキング:\n")
         
@@ -903,21 +899,23 @@ if __name__ == "__main__":
             domain=correct_domain,
             individual_weights=individual_rank_weights,
             positional_freqs=positional_freqs,
-            top_n=20
+            top_n=20,
+            confusables_index=confusables_index,
+            confusions=tld_confusions
         )
 
-        sorted_tlds = sorted(TLD_COSTS.keys(), key=len, reverse=True)
+        tld_lookup = TldLookup(TLD_COSTS, VALID_TLDS | tld_registry.current_registry().tlds)
 
         for i, r in enumerate(predicted_typos):
-            cost_estimate = "費用不明"
-            for tld in sorted_tlds:
-                if r['typo'].endswith(tld):
-                    cost_estimate = TLD_COSTS[tld]
-                    break
+            cost_estimate = tld_lookup.lookup(r['typo']).cost
             
-            print(f"{i+1:2}位 {r['typo']:<30} (スコア: {r['score']:.7f}, 距離: {r['distance']}, 費用: {cost_estimate}, 原因: {r['causes']})")
+            typo_label = f"{r['typo']} ({r['idn']})" if 'idn' in r else r['typo']
+            print(f"{i+1:2}位 {typo_label:<30} (スコア: {r['score']:.7f}, 距離: {r['distance']}, 費用: {cost_estimate}, 原因: {r['causes']})")
             
         print("=" * 78 + "\n")
 
     else:
-        print("\n[終了] 重みデータがないか、ドメインが入力されませんでした。")
\ No newline at end of file
+        print("\n[終了] 重みデータがないか、ドメインが入力されませんでした。")
+
+    if PROFILE_FILE:
+        PROFILER.write_json(PROFILE_FILE, pipeline=stages.report)
@@ -0,0 +1,430 @@
+import difflib
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import tld_registry
+from confusables import generate_idn_homographs
+from keyboard_layouts import KeyboardLayout, compile_adjacency_layout, get_layout
+from model_artifact import read_model
+from profiling import PROFILER, profiled
+from tld_confusion import TldConfusionModel
+from tld_trie import TldInfo, TldLookup
+
+# ===================================================================
+# -------- 実行用ランタイム（標準ライブラリ + model.bin のみ）----------
+# ===================================================================
+#
+# typo_ranking.py は学習（pandas / Levenshtein 等）と生成を1ファイルで行うため、import だけで数秒かかる。
+# 生成・スコア計算・費用の参照はこのモジュールにまとめ、学習済みの model.bin だけで動かす。
+# typo_ranking.typo_generator_ranked もここの generate_ranked を呼ぶ（結果は同一）
+#
+#   rt = TypoRuntime.load()            # model.bin を読む（数ミリ秒）
+#   rt.generate("example.co.jp", 20)   # ランキング
+#   rt.score_candidate("example.co.jp", "exmaple.co.jp")
+#   rt.generate("example.co.jp", 20, layout="jis")   # 利用者ごとのキーボード配列で生成する (keyboard_layouts.py)
+#   rt.cost("exmaple.co.jp")
+#   rt = TypoRuntime.mapped()          # マルチプロセス用: model.bin を mmap して共有する (model_mmap.py)
+
+DEFAULT_MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model.bin")
+
+K_POSITION_BOOST = 0.5  # 位置ボーナスの増幅係数
+DOMAIN_CHARS = re.compile(r"[a-z0-9.-]+")  # 候補として残す文字（キー配列の記号キーへの誤打は登録できないので除く）
+EMPTY = '（空）'
+
+HOMOGLYPHS_FOR_GENERATOR = {'1': ['l'], '0': ['o'], 'i': ['l'], 'l': ['i'], 'r': ['m'], 'b': ['d'], 'd': ['b']}
+SYMMETRIC_KEY_PAIRS = [('f', 'j'), ('d', 'k'), ('s', 'l'), ('a', ';')]
+
+# -------------------------------------------------------------------
+# 距離・差分の判定（pyxdameraulevenshtein / Levenshtein を使わない版）
+# -------------------------------------------------------------------
+
+def damerau_levenshtein_distance(a: str, b: str) -> int:
+    """隣接文字の入れ替えを1回と数える編集距離（OSA。pyxdameraulevenshtein と同じ値）"""
+    if a == b:
+        return 0
+    # 共通の先頭・末尾は距離に影響しないので除く（候補は数文字しか違わないため、表はほぼ数マスになる）
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return len(a) + len(b)
+
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i-1] == b[j-1] else 1
+            cur[j] = min(prev[j] + 1, cur[j-1] + 1, prev[j-1] + cost)
+            if i > 1 and j > 1 and a[i-1] == b[j-2] and a[i-2] == b[j-1]:
+                cur[j] = min(cur[j], prev2[j-2] + 1)
+        prev2, prev = prev, cur
+    return prev[len(b)]
+
+def get_transposed_pair(correct: str, typo: str) -> Optional[Tuple[str, str]]:
+    """隣接2文字の入れ替えだけで typo になる場合、入れ替わった文字ペアを返す（例: 'ab' -> 'ba'）"""
+    if correct == typo or len(correct) != len(typo):
+        return None
+    for i in range(len(correct) - 1):
+        if correct[i] == typo[i+1] and correct[i+1] == typo[i] and correct[:i] == typo[:i] and correct[i+2:] == typo[i+2:]:
+            return (correct[i], correct[i+1])
+    return None
+
+def identify_single_replacement(correct: str, typo: str, ops: Optional[list] = None) -> Tuple[str, str]:
+    """1文字の置換・挿入・削除なら (正しい文字, 入力された文字) を返す（挿入・削除側は '（空）'）。それ以外は ('', '')"""
+    if ops is None:
+        ops = difflib.SequenceMatcher(None, correct, typo).get_opcodes()
+
+    replacements = [(correct[i1:i2], typo[j1:j2]) for tag, i1, i2, j1, j2 in ops if tag == 'replace']
+    inserts = [(typo[j1:j2]) for tag, i1, i2, j1, j2 in ops if tag == 'insert']
+    deletes = [(correct[i1:i2]) for tag, i1, i2, j1, j2 in ops if tag == 'delete']
+
+    if len(replacements) == 1 and not inserts and not deletes:
+        c1, c2 = replacements[0]
+        if len(c1) == 1 and len(c2) == 1:
+            return (c1, c2)  # 置換
+    if len(inserts) == 1 and not replacements and not deletes:
+        return (EMPTY, inserts[0][0])  # 挿入 (二重入力)
+    if len(deletes) == 1 and not replacements and not inserts:
+        return (deletes[0][0], EMPTY)  # 削除 (入力漏れ/ドット抜け)
+    return ('', '')  # 複合または非距離1ミス
+
+# -------------------------------------------------------------------
+# 候補生成とスコア計算
+# -------------------------------------------------------------------
+
+def collect_variants(domain: str, keyboard: KeyboardLayout, confusions: TldConfusionModel,
+                     homoglyphs: Dict[str, List[str]] = HOMOGLYPHS_FOR_GENERATOR,
+                     symmetric_pairs: List[Tuple[str, str]] = SYMMETRIC_KEY_PAIRS) -> Dict[str, Set[str]]:
+    """{タイポ候補: 原因の集合} を生成順に返す（生成順 = 同点時の順位）"""
+    variants: Dict[str, Set[str]] = {}
+
+    def add(typo, cause):
+        variants.setdefault(typo, set()).add(cause)
+
+    # DL=1のミスは全て生成する
+    for i in range(len(domain)):
+        c = domain[i]
+        char = c.lower()
+
+        add(domain[:i] + domain[i+1:], "入力漏れ")
+        add(domain[:i] + c + c + domain[i+1:], "二重入力")
+        for adj in keyboard.neighbors(char):
+            add(domain[:i] + adj + domain[i+1:], "隣接キー誤打")
+        for g in homoglyphs.get(char, []):
+            add(domain[:i] + g + domain[i+1:], "ホモグリフ（視覚類似文字）")
+        for a, b in symmetric_pairs:
+            if c == a:
+                add(domain[:i] + b + domain[i+1:], "左右対称キー誤打")
+            elif c == b:
+                add(domain[:i] + a + domain[i+1:], "左右対称キー誤打")
+
+    for i in range(len(domain) - 1):
+        add(domain[:i] + domain[i+1] + domain[i] + domain[i+2:], "入力順序ミス")
+
+    # TLDミス: 分類と同じ件数行列から取り違え先を引く
+    base_domain, current_tld = confusions.split(domain)
+    for alt_tld in confusions.alternatives(current_tld):
+        add(f"{base_domain}.{alt_tld}", "TLDミス")
+
+    return variants
+
+def variant_causes(domain: str, typo: str, keyboard: KeyboardLayout, confusions: TldConfusionModel,
+                   homoglyphs: Dict[str, List[str]] = HOMOGLYPHS_FOR_GENERATOR,
+                   symmetric_pairs: List[Tuple[str, str]] = SYMMETRIC_KEY_PAIRS) -> Optional[Set[str]]:
+    """collect_variants(domain).get(typo) と同じ値を、全候補を生成せずに求める（生成されない候補は None）"""
+    causes: Set[str] = set()
+    n, m = len(domain), len(typo)
+    p = 0  # 最初に異なる位置
+    while p < n and p < m and domain[p] == typo[p]:
+        p += 1
+
+    if m == n - 1 and domain[p+1:] == typo[p:]:
+        causes.add("入力漏れ")
+    elif m == n + 1 and typo[p+1:] == domain[p:] and p > 0 and typo[p] == domain[p-1]:
+        causes.add("二重入力")  # 同じ文字の連続のどこを重ねても同じ文字列になる
+    elif m == n and p < n:
+        c, g = domain[p], typo[p]
+        if domain[p+1:] == typo[p+1:]:
+            char = c.lower()
+            if g in keyboard.neighbors(char):
+                causes.add("隣接キー誤打")
+            if g in homoglyphs.get(char, []):
+                causes.add("ホモグリフ（視覚類似文字）")
+            for a, b in symmetric_pairs:
+                if (c == a and g == b) or (c != a and c == b and g == a):
+                    causes.add("左右対称キー誤打")
+        elif p + 1 < n and c == typo[p+1] and domain[p+1] == g and domain[p+2:] == typo[p+2:]:
+            causes.add("入力順序ミス")
+
+    base_domain, current_tld = confusions.split(domain)
+    if typo.startswith(base_domain + ".") and typo[len(base_domain) + 1:] in confusions.alternatives(current_tld):
+        causes.add("TLDミス")
+    return causes or None
+
+def total_dl1_events(positional_freqs: Dict) -> int:
+    """DL=1のミス全体の集計件数（位置補正ボーナスの正規化に使用）。0件なら1"""
+    total = sum(sum(c.values()) for char_data in positional_freqs.values() for c in char_data.values())
+    return total or 1
+
+def score_variant(domain: str, typo: str, causes: Set[str], individual_weights: Dict, positional_freqs: Dict,
+                  total_dl1_count: int, confusions: TldConfusionModel, keyboard: Optional[KeyboardLayout] = None) -> Dict[str, Any]:
+    """
+    1つの候補のスコアを計算し、ランキングの1行 {typo, causes, score, distance} を返す
+    隣接キー誤打の重みと位置ボーナスは、キー間の距離による起こりやすさ (keyboard.likelihood, 隣のキーで1) を掛ける
+    """
+    final_score = 0
+
+    ops = difflib.SequenceMatcher(None, domain, typo).get_opcodes()
+    c1, c2 = identify_single_replacement(domain, typo, ops)
+    is_dl1_error = (c1 != '' or c2 != '')  # DL=1の単一操作かどうか
+    key_likelihood = keyboard.likelihood(c1, c2) if keyboard is not None and len(c1) == 1 and len(c2) == 1 else 1.0
+
+    if '.' in domain and '.' in typo:
+        is_tld_m, tld_diff_str = confusions.mismatch(domain, typo)
+    else:
+        is_tld_m, tld_diff_str = False, None
+
+    # 1. 個別ミス重み (W_individual) の適用
+    for cause in causes:
+        W_individual = 0.0
+
+        # --- TLDミス (x5倍増幅) ---
+        if cause == "TLDミス" and is_tld_m:
+            W_individual = individual_weights.get(cause, {}).get(tld_diff_str, 0.0)
+            final_score += W_individual * 5
+
+        # --- 入力順序ミス ---
+        elif cause == "入力順序ミス":
+            transposed_pair = get_transposed_pair(domain, typo)
+            if transposed_pair:
+                k1, k2 = transposed_pair
+                W_individual = individual_weights.get(cause, {}).get(f'{k1} {k2} -> {k2} {k1}', 0.0)
+                final_score += W_individual
+
+        # --- DL=1 ミス (位置ボーナス加算) ---
+        elif is_dl1_error:
+            if cause in {"隣接キー誤打", "ホモグリフ（視覚類似文字）", "左右対称キー誤打", "スペルミス（認知ミス）"}:
+                W_individual = individual_weights.get(cause, {}).get((c1, c2), 0.0)
+                if W_individual == 0.0 and len(c1) == 1 and len(c2) == 1:
+                    W_individual = individual_weights.get(cause, {}).get((c2, c1), 0.0)
+                if cause == "隣接キー誤打":
+                    W_individual *= key_likelihood
+            elif cause in {"入力漏れ", "ドット抜け"}:
+                W_individual = individual_weights.get(cause, {}).get((c1, EMPTY), 0.0)
+            elif cause == "二重入力":
+                W_individual = individual_weights.get(cause, {}).get((EMPTY, c2), 0.0)
+
+            final_score += W_individual
+
+            if len(ops) == 3 and ops[0][0] == 'equal' and ops[2][0] == 'equal':
+                tag, i1, i2, j1, j2 = ops[1]
+                i_start = i1
+
+                if tag == 'insert':
+                    pos_char = typo[j1:j2].lower()  # 挿入された文字
+                    pos_cause = "二重入力"
+                elif tag == 'delete':
+                    pos_char = domain[i1:i2].lower()  # 削除された文字
+                    pos_cause = "入力漏れ" if domain[i1:i2] != '.' else "ドット抜け"
+                elif tag == 'replace':
+                    pos_char = domain[i1:i2].lower()  # 置換元の文字
+                    causes_list = causes.copy()
+                    causes_list.discard('入力順序ミス')
+                    pos_cause = sorted(causes_list)[0] if causes_list else 'スペルミス（認知ミス）'
+                else:
+                    i_start = -1
+
+                if i_start != -1 and pos_char and len(pos_char) == 1:
+                    i_relative_end = len(domain) - 1 - i_start
+                    freq_count = positional_freqs.get(pos_cause, {}).get(pos_char, {}).get(i_relative_end, 0)
+                    bonus = freq_count / total_dl1_count * K_POSITION_BOOST
+                    final_score += bonus * key_likelihood if pos_cause == "隣接キー誤打" else bonus
+
+    if is_tld_m:
+        causes = {"TLDミス"}
+
+    return {
+        "typo": typo,
+        "causes": '・'.join(sorted(causes)),
+        "score": round(final_score, 7),
+        "distance": damerau_levenshtein_distance(domain, typo)
+    }
+
+def score_idn_variants(domain: str, individual_weights: Dict, positional_freqs: Dict, total_dl1_count: int,
+                       confusables_index: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """IDNホモグラフ (confusables索引による1文字置換、punycode表記) の候補とスコア"""
+    # 観測データにUnicode文字が混入した場合はホモグリフとして (正しい文字, 置換後の文字) で集計されるため、同じ重みを参照する
+    homoglyph_weights = individual_weights.get("ホモグリフ（視覚類似文字）", {})
+    homoglyph_positions = positional_freqs.get("ホモグリフ（視覚類似文字）", {})
+
+    results = []
+    for ascii_typo, unicode_typo, i, c, g in generate_idn_homographs(domain, confusables_index):
+        W_individual = homoglyph_weights.get((c, g), 0.0)
+        freq_count = homoglyph_positions.get(c, {}).get(len(domain) - 1 - i, 0)
+        results.append({
+            "typo": ascii_typo,
+            "idn": unicode_typo,
+            "causes": "IDNホモグラフ",
+            "score": round(W_individual + freq_count / total_dl1_count * K_POSITION_BOOST, 7),
+            "distance": 1
+        })
+    return results
+
+def normalize_domain(domain: str) -> str:
+    """大文字・前後の空白・末尾のドットをそろえる（typo_ranking.js の sanitizeInput と同じく候補は小文字で作る）"""
+    return domain.strip().lower().rstrip('.')
+
+@profiled("generate_ranked")
+def generate_ranked(domain: str, individual_weights: Dict, positional_freqs: Dict, top_n: int, confusables_index: Optional[Dict],
+                    keyboard: KeyboardLayout, confusions: TldConfusionModel,
+                    homoglyphs: Dict[str, List[str]] = HOMOGLYPHS_FOR_GENERATOR,
+                    symmetric_pairs: List[Tuple[str, str]] = SYMMETRIC_KEY_PAIRS,
+                    total_dl1_count: Optional[int] = None) -> List[Dict[str, Any]]:
+    domain = normalize_domain(domain)
+    if total_dl1_count is None:
+        total_dl1_count = total_dl1_events(positional_freqs)
+
+    with PROFILER.phase("generate"):
+        variants = collect_variants(domain, keyboard, confusions, homoglyphs, symmetric_pairs)
+
+    ranked_results = []
+    with PROFILER.phase("score"):
+        for typo, causes in variants.items():
+            if typo == domain:
+                continue
+            ranked_results.append(score_variant(domain, typo, causes, individual_weights, positional_freqs, total_dl1_count,
+                                                confusions, keyboard))
+
+    if confusables_index:
+        with PROFILER.phase("idn"):
+            ranked_results.extend(score_idn_variants(domain, individual_weights, positional_freqs, total_dl1_count, confusables_index))
+
+    with PROFILER.phase("sort"):
+        ranked_results.sort(key=lambda x: (x['score'], -x['distance']), reverse=True)
+
+    final_ranked_results = [r for r in ranked_results if DOMAIN_CHARS.fullmatch(r['typo'])]
+    PROFILER.count("candidates_generated", len(variants))
+    PROFILER.count("candidates_scored", len(ranked_results))
+    PROFILER.count("candidates_pruned", len(ranked_results) - min(len(final_ranked_results), top_n))
+    return final_ranked_results[:top_n]
+
+# ===================================================================
+# -------- 学習済みモデルを読み込んだランタイム ----------
+# ===================================================================
+
+class TypoRuntime:
+    """model.bin の内容だけで生成・スコア計算・費用参照を行う"""
+
+    def __init__(self, individual_weights: Dict, positional_freqs: Dict, meta: Dict[str, Any], layout: Optional[str] = None):
+        self.individual_weights = individual_weights
+        self.positional_freqs = positional_freqs
+        self.meta = meta
+        # 学習時の集計件数がメタ情報にあればそれを使う（mmap のビューを全件走査しない）
+        self.total_dl1_count = meta.get("total_dl1_count") or total_dl1_events(positional_freqs)
+        self.keyboard = self.keyboard_layout(layout)
+        self.confusions = TldConfusionModel.from_json(meta["tld_confusions"])
+        self.confusables_index = meta.get("confusables_index")
+        self.homoglyphs = meta.get("homoglyphs_for_generator", HOMOGLYPHS_FOR_GENERATOR)
+        self.symmetric_pairs = [tuple(pair) for pair in meta.get("symmetric_key_pairs", SYMMETRIC_KEY_PAIRS)]
+        self._tld_lookup = None
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_FILE, layout: Optional[str] = None) -> "TypoRuntime":
+        return cls(*read_model(path), layout=layout)
+
+    @classmethod
+    def mapped(cls, path: str = DEFAULT_MODEL_FILE, layout: Optional[str] = None) -> "TypoRuntime":
+        """model.bin を mmap したまま使う（複数プロセスでページを共有し、辞書は作らない。結果は load と同じ）"""
+        from model_mmap import MappedModel
+        model = MappedModel(path)
+        return cls(model.individual_weights, model.positional_freqs, model.meta, layout=layout)
+
+    def keyboard_layout(self, layout: Optional[str] = None) -> KeyboardLayout:
+        """
+        layout の配列（"us" / "jis" / "phone" 等）。省略時は学習に使った配列 (meta の keyboard_layout) で、
+        組み込みに無い配列（学習時に登録した "legacy" 等）はモデルに保存された隣接キーマップから作る
+        """
+        if layout is not None:
+            return get_layout(layout)
+        try:
+            return get_layout(self.meta.get("keyboard_layout", ""))
+        except ValueError:
+            return compile_adjacency_layout("model", self.meta.get("keyboard_adjacent", {}))
+
+    @property
+    def tld_lookup(self) -> TldLookup:
+        # 費用を参照するまでトライは作らない（生成だけの呼び出しでは不要）
+        if self._tld_lookup is None:
+            self._tld_lookup = TldLookup(self.meta.get("TLD_COSTS", {}), tld_registry.BUILTIN_TLDS | tld_registry.current_registry().tlds)
+        return self._tld_lookup
+
+    def generate(self, domain: str, top_n: int = 30, idn: bool = True, layout: Optional[str] = None) -> List[Dict[str, Any]]:
+        """domain のタイポ候補の上位 top_n 件。layout で利用者のキーボード配列を指定できる（省略時は学習時の配列）"""
+        keyboard = self.keyboard if layout is None else get_layout(layout)
+        return generate_ranked(domain, self.individual_weights, self.positional_freqs, top_n,
+                               self.confusables_index if idn else None, keyboard, self.confusions,
+                               self.homoglyphs, self.symmetric_pairs, self.total_dl1_count)
+
+    def score_candidate(self, domain: str, typo: str, layout: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """domain に対する typo の順位表の1行。モデルが生成しない候補（DL=2以上など）は None"""
+        domain, typo = normalize_domain(domain), normalize_domain(typo)
+        if typo == domain:
+            return None
+        keyboard = self.keyboard if layout is None else get_layout(layout)
+        causes = variant_causes(domain, typo, keyboard, self.confusions, self.homoglyphs, self.symmetric_pairs)
+        if causes is not None:
+            return score_variant(domain, typo, causes, self.individual_weights, self.positional_freqs,
+                                 self.total_dl1_count, self.confusions, keyboard)
+        if self.confusables_index and (typo.startswith("xn--") or ".xn--" in typo):
+            for r in score_idn_variants(domain, self.individual_weights, self.positional_freqs,
+                                        self.total_dl1_count, self.confusables_index):
+                if r["typo"] == typo:
+                    return r
+        return None
+
+    def lookup(self, domain: str) -> TldInfo:
+        return self.tld_lookup.lookup(domain)
+
+    def cost(self, domain: str) -> str:
+        return self.tld_lookup.cost(domain)
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="学習済みモデル (model.bin) によるタイポドメインのランキング")
+    parser.add_argument("domain")
+    parser.add_argument("typo", nargs="?", help="指定した場合はこの候補のスコアだけを表示")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--model", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--mmap", action="store_true", help="model.bin を読み込まず mmap して使う")
+    parser.add_argument("--layout", help="キーボード配列 (us / jis / phone)。省略時は学習時の配列")
+    parser.add_argument("--profile", metavar="PATH", help="段階ごとの計測結果を JSON で書き出す")
+    args = parser.parse_args()
+    if args.profile:
+        PROFILER.enable()
+
+    try:
+        runtime = TypoRuntime.mapped(args.model, args.layout) if args.mmap else TypoRuntime.load(args.model, args.layout)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] モデルを読み込めませんでした: {e}")
+        sys.exit(1)
+
+    results = [runtime.score_candidate(args.domain, args.typo)] if args.typo else runtime.generate(args.domain, args.top)
+    for i, r in enumerate(results):
+        if r is None:
+            print(f"'{args.typo}' はモデルの生成対象外です（スコア: 0）")
+            continue
+        typo_label = f"{r['typo']} ({r['idn']})" if 'idn' in r else r['typo']
+        print(f"{i+1:2}位 {typo_label:<30} (スコア: {r['score']:.7f}, 距離: {r['distance']}, 費用: {runtime.cost(r['typo'])}, 原因: {r['causes']})")
+
+    if args.profile:
+        PROFILER.write_json(args.profile)
@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import sys
+from decimal import Decimal
+from typing import Any, Dict
+
+try:
+    import brotli  # 任意。無ければ .br は作らない
+except ImportError:
+    brotli = None
+
+# ===================================================================
+# -------- Webページ向け分割エクスポート (web_model/) ----------
+# ===================================================================
+#
+#   manifest.json          : 小さな共通部分 (TLD費用・キー配列など) と、原因ごとのシャードのファイル名
+#   w-<hash>.json(.gz/.br) : 原因ごとの individual_weights
+#   p-<hash>.json(.gz/.br) : 原因ごとの positional_freqs
+#
+# シャード名は内容のハッシュなので、モデル更新で変わらなかった原因はブラウザのキャッシュがそのまま使える
+# マニフェストの version はモデル全体の内容ハッシュ (model_version) で、差分パッチ (model_delta.py) の版と同じ。
+# typo_ranking.js の modelVersion も同じ値を計算するので、ブラウザはパッチを当てた結果を確かめられる
+
+WEB_MODEL_DIR = "web_model"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = 1
+
+SHARDED_FIELDS = {"individual_weights": "w", "positional_freqs": "p"}
+
+
+def minify(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), sort_keys=False).encode('utf-8')
+
+def _js_number(x: float) -> str:
+    """JavaScript の String(x) と同じ表記（最短の桁数。指数表記にする範囲だけが repr と異なる）"""
+    if not math.isfinite(x):
+        return "null"
+    if x == 0:
+        return "0"
+    sign, digits, exponent = Decimal(repr(abs(x))).as_tuple()
+    digits = list(digits)
+    while len(digits) > 1 and digits[-1] == 0:
+        digits.pop()
+        exponent += 1
+    s = ''.join(map(str, digits))
+    k, n = len(s), exponent + len(s)  # x = 0.s × 10^n
+    if k <= n <= 21:
+        text = s + '0' * (n - k)
+    elif 0 < n <= 21:
+        text = s[:n] + '.' + s[n:]
+    elif -6 < n <= 0:
+        text = '0.' + '0' * -n + s
+    else:
+        e = f"{'+' if n - 1 >= 0 else '-'}{abs(n - 1)}"
+        text = f"{s}e{e}" if k == 1 else f"{s[0]}.{s[1:]}e{e}"
+    return ('-' if x < 0 else '') + text
+
+def canonical_json(obj: Any) -> str:
+    """版のハッシュに使う正規形（キーはコードポイント順、数値は JavaScript と同じ表記。typo_ranking.js の canonicalJson と同じ文字列）"""
+    if isinstance(obj, dict):
+        return '{' + ','.join(json.dumps(str(k), ensure_ascii=False) + ':' + canonical_json(obj[k]) for k in sorted(obj, key=str)) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '[' + ','.join(canonical_json(v) for v in obj) + ']'
+    if isinstance(obj, bool) or obj is None:
+        return json.dumps(obj)
+    if isinstance(obj, (int, float)):
+        return _js_number(float(obj)) if isinstance(obj, float) or abs(obj) >= 10 ** 21 else str(obj)
+    return json.dumps(obj, ensure_ascii=False)
+
+def normalize(web_data: Dict[str, Any]) -> Dict[str, Any]:
+    """JSONに書き出して読み直した形にそろえる（位置別頻度の int キーを文字列にする等）"""
+    return json.loads(minify(web_data))
+
+def model_version(web_data: Dict[str, Any]) -> str:
+    """モデルの内容ハッシュ（キー順に依らない）"""
+    return hashlib.sha256(canonical_json(normalize(web_data)).encode('utf-8')).hexdigest()[:16]
+
+def _write_if_changed(path: str, data: bytes) -> bool:
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+def write_precompressed(out_dir: str, name: str, data: bytes) -> None:
+    """無圧縮・gzip・brotli を並べて書き出す（gzip は mtime=0 にして内容が同じなら同じバイト列にする）"""
+    _write_if_changed(os.path.join(out_dir, name), data)
+    _write_if_changed(os.path.join(out_dir, name + ".gz"), gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_if_changed(os.path.join(out_dir, name + ".br"), brotli.compress(data, quality=11))
+
+def export_sharded(web_data: Dict[str, Any], out_dir: str = WEB_MODEL_DIR, prune: bool = True) -> Dict[str, Any]:
+    """data.json と同じ構造のデータを、マニフェスト + 原因別シャードに分けて書き出す"""
+    os.makedirs(out_dir, exist_ok=True)
+
+    shards: Dict[str, Dict[str, str]] = {}
+    written = set()
+    for field, prefix in SHARDED_FIELDS.items():
+        shards[field] = {}
+        for cause, table in web_data.get(field, {}).items():
+            data = minify(table)
+            name = f"{prefix}-{hashlib.sha256(data).hexdigest()[:16]}.json"
+            write_precompressed(out_dir, name, data)
+            shards[field][cause] = name
+            written.add(name)
+
+    core = {k: v for k, v in web_data.items() if k not in SHARDED_FIELDS}
+    version = model_version(web_data)
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "version": version,
+        "encodings": ["gzip", "br"] if brotli is not None else ["gzip"],
+        "shards": shards,
+        "core": core,
+    }
+    write_precompressed(out_dir, MANIFEST_FILE, minify(manifest))
+
+    if prune:
+        # 今回参照されなかった古いシャードを削除する
+        keep = {MANIFEST_FILE} | written
+        for fname in os.listdir(out_dir):
+            base = fname[:-3] if fname.endswith((".gz", ".br")) else fname
+            if base not in keep and (base.startswith(tuple(f"{p}-" for p in SHARDED_FIELDS.values()))):
+                os.remove(os.path.join(out_dir, fname))
+
+    return manifest
+
+def load_sharded(out_dir: str = WEB_MODEL_DIR) -> Dict[str, Any]:
+    """分割エクスポートを data.json と同じ構造に戻す（確認用）"""
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    web_data = {}
+    for field, causes in manifest["shards"].items():
+        web_data[field] = {}
+        for cause, name in causes.items():
+            with open(os.path.join(out_dir, name), 'r', encoding='utf-8') as f:
+                web_data[field][cause] = json.load(f)
+    web_data.update(manifest["core"])
+    return web_data
+
+# ===================================================================
+# --------実行部分----------
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "data.json"
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else WEB_MODEL_DIR
+
+    with open(src, 'r', encoding='utf-8') as f:
+        web_data = json.load(f)
+    manifest = export_sharded(web_data, out_dir)
+    n_shards = sum(len(v) for v in manifest["shards"].values())
+    print(f"[INFO] {src} を {out_dir}/ に分割しました（シャード {n_shards}個, version {manifest['version']}）")